@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_playlist_vibe"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("playlists", sa.Column("vibe", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("playlists", "vibe")
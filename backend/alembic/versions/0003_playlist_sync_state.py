@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_playlist_sync_state"
+down_revision = "0002_playlist_vibe"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("playlists", sa.Column("snapshot_id", sa.String(length=255), nullable=True))
+    op.add_column("playlists", sa.Column("synced_track_uris", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("playlists", "synced_track_uris")
+    op.drop_column("playlists", "snapshot_id")
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004_playlist_sync_outbox"
+down_revision = "0003_playlist_sync_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "playlist_sync_outbox",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "playlist_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("playlists.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("track_uris", sa.JSON(), nullable=False),
+        sa.Column("description", sa.String(length=1024), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("last_error", sa.Text(), nullable=True),
+    )
+    op.create_index(
+        "ix_playlist_sync_outbox_next_attempt",
+        "playlist_sync_outbox",
+        ["next_attempt_at", "created_at"],
+    )
+    op.create_index("ix_playlist_sync_outbox_playlist", "playlist_sync_outbox", ["playlist_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_playlist_sync_outbox_playlist", table_name="playlist_sync_outbox")
+    op.drop_index("ix_playlist_sync_outbox_next_attempt", table_name="playlist_sync_outbox")
+    op.drop_table("playlist_sync_outbox")
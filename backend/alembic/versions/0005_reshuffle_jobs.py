@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005_reshuffle_jobs"
+down_revision = "0004_playlist_sync_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reshuffle_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("status", sa.String(length=32), nullable=False, server_default="queued"),
+        sa.Column("mode", sa.String(length=32), nullable=False),
+        sa.Column("account_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("seed", sa.String(length=255), nullable=True),
+        sa.Column("minimize_overlap", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_reshuffle_jobs_status_created", "reshuffle_jobs", ["status", "created_at"])
+
+    op.create_table(
+        "reshuffle_job_items",
+        sa.Column(
+            "job_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("reshuffle_jobs.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("playlist_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("account_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("done_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_reshuffle_job_items_pending",
+        "reshuffle_job_items",
+        ["job_id", "account_id", "playlist_id"],
+        postgresql_where=sa.text("done_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reshuffle_job_items_pending", table_name="reshuffle_job_items")
+    op.drop_table("reshuffle_job_items")
+    op.drop_index("ix_reshuffle_jobs_status_created", table_name="reshuffle_jobs")
+    op.drop_table("reshuffle_jobs")
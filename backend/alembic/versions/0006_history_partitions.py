@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006_history_partitions"
+down_revision = "0005_reshuffle_jobs"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "track_usage_summary",
+        sa.Column(
+            "track_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("tracks.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("placements", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("first_added_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_added_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    # Rebuild history as a table range-partitioned by month on added_at.
+    op.execute("ALTER TABLE playlist_entries_history RENAME TO playlist_entries_history_legacy")
+    op.execute(
+        "ALTER INDEX ix_playlist_entries_history_playlist_added "
+        "RENAME TO ix_playlist_entries_history_legacy_playlist_added"
+    )
+    op.execute(
+        """
+        CREATE TABLE playlist_entries_history (
+            id uuid NOT NULL,
+            playlist_id uuid NOT NULL REFERENCES playlists (id) ON DELETE CASCADE,
+            track_id uuid NOT NULL REFERENCES tracks (id) ON DELETE CASCADE,
+            added_at timestamp with time zone NOT NULL DEFAULT now(),
+            batch_tag varchar(64) NOT NULL,
+            PRIMARY KEY (id, added_at)
+        ) PARTITION BY RANGE (added_at)
+        """
+    )
+    op.create_index(
+        "ix_playlist_entries_history_playlist_added",
+        "playlist_entries_history",
+        ["playlist_id", "added_at"],
+    )
+    op.execute("CREATE TABLE playlist_entries_history_default PARTITION OF playlist_entries_history DEFAULT")
+
+    oldest = bind.execute(sa.text("SELECT min(added_at) FROM playlist_entries_history_legacy")).scalar()
+    today = date.today()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        upper = _next_month(month)
+        op.execute(
+            f"CREATE TABLE playlist_entries_history_p{month.year:04d}_{month.month:02d} "
+            f"PARTITION OF playlist_entries_history FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+
+    op.execute(
+        "INSERT INTO playlist_entries_history (id, playlist_id, track_id, added_at, batch_tag) "
+        "SELECT id, playlist_id, track_id, added_at, batch_tag FROM playlist_entries_history_legacy"
+    )
+    op.execute("DROP TABLE playlist_entries_history_legacy")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("ALTER TABLE playlist_entries_history RENAME TO playlist_entries_history_partitioned")
+        op.execute(
+            "ALTER INDEX ix_playlist_entries_history_playlist_added "
+            "RENAME TO ix_playlist_entries_history_partitioned_playlist_added"
+        )
+        op.create_table(
+            "playlist_entries_history",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column(
+                "playlist_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("playlists.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column(
+                "track_id",
+                postgresql.UUID(as_uuid=True),
+                sa.ForeignKey("tracks.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("added_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column("batch_tag", sa.String(length=64), nullable=False),
+        )
+        op.create_index(
+            "ix_playlist_entries_history_playlist_added",
+            "playlist_entries_history",
+            ["playlist_id", "added_at"],
+        )
+        op.execute(
+            "INSERT INTO playlist_entries_history (id, playlist_id, track_id, added_at, batch_tag) "
+            "SELECT id, playlist_id, track_id, added_at, batch_tag FROM playlist_entries_history_partitioned"
+        )
+        op.execute("DROP TABLE playlist_entries_history_partitioned")
+    op.drop_table("track_usage_summary")
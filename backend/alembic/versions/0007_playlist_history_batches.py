@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007_playlist_history_batches"
+down_revision = "0006_history_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "playlist_history_batches",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "playlist_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("playlists.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("added_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("batch_tag", sa.String(length=64), nullable=False),
+        sa.Column("track_count", sa.Integer(), nullable=False),
+        sa.Column("track_ids", sa.LargeBinary(), nullable=False),
+    )
+    op.create_index(
+        "ix_playlist_history_batches_playlist_added",
+        "playlist_history_batches",
+        ["playlist_id", "added_at"],
+    )
+    op.create_index("ix_playlist_history_batches_added", "playlist_history_batches", ["added_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_playlist_history_batches_added", table_name="playlist_history_batches")
+    op.drop_index("ix_playlist_history_batches_playlist_added", table_name="playlist_history_batches")
+    op.drop_table("playlist_history_batches")
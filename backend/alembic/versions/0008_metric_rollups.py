@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0008_metric_rollups"
+down_revision = "0007_playlist_history_batches"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "metric_rollups",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("granularity", sa.String(length=16), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("accounts_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("playlists_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("tracks_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reshuffles_last_24h", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint("granularity", "bucket_start", name="uq_metric_rollups_bucket"),
+    )
+    op.create_index("ix_metric_snapshots_created_at", "metric_snapshots", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_metric_snapshots_created_at", table_name="metric_snapshots")
+    op.drop_table("metric_rollups")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_reshuffle_job_retries"
+down_revision = "0008_metric_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("reshuffle_jobs", sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("reshuffle_jobs", sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("reshuffle_jobs", sa.Column("failed", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("reshuffle_job_items", sa.Column("failed_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("reshuffle_job_items", sa.Column("error", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("reshuffle_job_items", "error")
+    op.drop_column("reshuffle_job_items", "failed_at")
+    op.drop_column("reshuffle_jobs", "failed")
+    op.drop_column("reshuffle_jobs", "next_attempt_at")
+    op.drop_column("reshuffle_jobs", "attempts")
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.security import DashboardSession, require_dashboard_session
-from app.db.session import get_db
+from app.db.session import get_async_db, get_async_read_db, get_db
 
 
 def get_db_session() -> Generator[Session, None, None]:
@@ -13,5 +14,15 @@ def get_db_session() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_db() as session:
+        yield session
+
+
+async def get_async_read_db_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_read_db() as session:
+        yield session
+
+
 def require_session() -> DashboardSession:
     return require_dashboard_session()
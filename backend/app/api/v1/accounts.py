@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Optional, Sequence
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session, require_session
+from app.api.deps import get_async_db_session, get_async_read_db_session, require_session
 from app.api.v1.schemas.accounts import (
     AccountConnectResponse,
     AccountListResponse,
@@ -20,6 +21,7 @@ from app.api.v1.schemas.accounts import (
 from app.core.security import DashboardSession, session_store
 from app.db.models import SpotifyAccount
 from app.services.spotify_service import spotify_service
+from app.services.token_service import token_service
 from app.utils.naming_utils import sanitize_prefix
 
 router = APIRouter(prefix="/api/v1/accounts", tags=["accounts"])
@@ -36,7 +38,7 @@ def _active_uuid(session: DashboardSession) -> Optional[UUID]:
         return None
 
 
-def _serialize_accounts(accounts: List[SpotifyAccount], session: DashboardSession) -> AccountListResponse:
+def _serialize_accounts(accounts: Sequence[SpotifyAccount], session: DashboardSession) -> AccountListResponse:
     return AccountListResponse(
         accounts=[AccountRead.from_orm(account) for account in accounts],
         active_account_id=_active_uuid(session),
@@ -46,9 +48,9 @@ def _serialize_accounts(accounts: List[SpotifyAccount], session: DashboardSessio
 @router.get("/list", response_model=AccountListResponse)
 async def list_accounts(
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
 ) -> AccountListResponse:
-    accounts = db.query(SpotifyAccount).order_by(SpotifyAccount.created_at.desc()).all()
+    accounts = (await db.scalars(select(SpotifyAccount).order_by(SpotifyAccount.created_at.desc()))).all()
     return _serialize_accounts(accounts, session)
 
 
@@ -56,16 +58,16 @@ async def list_accounts(
 async def set_active_account(
     payload: AccountSetActiveRequest,
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> AccountListResponse:
     if payload.account_id is None:
         session_store.set_active_account(session.session_id, None)
     else:
-        account = db.query(SpotifyAccount).filter(SpotifyAccount.id == payload.account_id).one_or_none()
+        account = await db.get(SpotifyAccount, payload.account_id)
         if not account:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account not found")
         session_store.set_active_account(session.session_id, str(account.id))
-    accounts = db.query(SpotifyAccount).order_by(SpotifyAccount.created_at.desc()).all()
+    accounts = (await db.scalars(select(SpotifyAccount).order_by(SpotifyAccount.created_at.desc()))).all()
     return _serialize_accounts(accounts, session)
 
 
@@ -73,15 +75,14 @@ async def set_active_account(
 async def update_prefix(
     payload: AccountPrefixUpdateRequest,
     _: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> AccountPrefixUpdateResponse:
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.id == payload.account_id).one_or_none()
+    account = await db.get(SpotifyAccount, payload.account_id)
     if not account:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account not found")
     account.prefix = sanitize_prefix(payload.prefix)
     db.add(account)
-    db.commit()
-    db.refresh(account)
+    await db.commit()
     return AccountPrefixUpdateResponse(id=account.id, prefix=account.prefix)
 
 
@@ -89,14 +90,14 @@ async def update_prefix(
 async def remove_account(
     account_id: UUID,
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> AccountRemoveResponse:
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.id == account_id).one_or_none()
+    account = await db.get(SpotifyAccount, account_id)
     if not account:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account not found")
     account.status = "inactive"
     db.add(account)
-    db.commit()
+    await db.commit()
     if session.active_account_id == str(account.id):
         session_store.set_active_account(session.session_id, None)
     return AccountRemoveResponse(id=account.id, status=account.status)
@@ -106,18 +107,12 @@ async def remove_account(
 async def refresh_account(
     account_id: UUID,
     _: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> AccountRead:
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.id == account_id).one_or_none()
+    account = await db.get(SpotifyAccount, account_id)
     if not account:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account not found")
-    refreshed = await spotify_service.refresh_token(account.refresh_token)
-    account.access_token = refreshed.get("access_token", account.access_token)
-    account.refresh_token = refreshed.get("refresh_token", account.refresh_token)
-    account.expires_at = refreshed.get("expires_at", account.expires_at)
-    db.add(account)
-    db.commit()
-    db.refresh(account)
+    await token_service.refresh(db, account, force=True)
     return AccountRead.from_orm(account)
 
 
@@ -1,16 +1,19 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Any, Dict, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session, require_session
+from app.api.deps import get_async_db_session, require_session
 from app.api.v1.accounts import _active_uuid
 from app.api.v1.schemas.library import LibraryIngestRequest, LibraryIngestResponse
 from app.core.security import DashboardSession
 from app.db.models import Album, SpotifyAccount, Track
+from app.services.catalog_service import CatalogTrack, catalog_service
 from app.services.spotify_service import spotify_service
+from app.services.token_service import token_service
 
 router = APIRouter(prefix="/api/v1/library", tags=["library"])
 
@@ -22,59 +25,78 @@ def _album_id_from_url(url: str) -> str | None:
     return segment.split("?")[0]
 
 
+def _artist_names(item: Dict[str, Any]) -> str:
+    return ", ".join(artist.get("name") for artist in item.get("artists", []) if artist.get("name"))
+
+
 @router.post("/ingest", response_model=LibraryIngestResponse)
 async def ingest_albums(
     payload: LibraryIngestRequest,
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> LibraryIngestResponse:
     account_id = _active_uuid(session)
     if not account_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Select an active account")
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.id == account_id).one_or_none()
+    account = await db.get(SpotifyAccount, account_id)
     if not account:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Active account missing")
+    await token_service.ensure_fresh(db, account)
+
+    album_ids = list(dict.fromkeys(filter(None, (_album_id_from_url(str(url)) for url in payload.album_urls))))
+    if album_ids:
+        existing = set(await db.scalars(select(Album.spotify_id).where(Album.spotify_id.in_(album_ids))))
+        album_ids = [album_id for album_id in album_ids if album_id not in existing]
+    albums = await spotify_service.get_albums(account.access_token, album_ids) if album_ids else {}
 
     queued = 0
-    for url in payload.album_urls:
-        album_id = _album_id_from_url(str(url))
-        if not album_id:
-            continue
-        existing = db.query(Album).filter(Album.spotify_id == album_id).one_or_none()
-        if existing:
-            continue
-        tracks = await spotify_service.get_album_tracks(account.access_token, album_id)
+    ingested: List[Track] = []
+    seen_tracks: set[str] = set()
+    for album_id in album_ids:
+        remote = albums.get(album_id)
+        tracks = (remote or {}).get("tracks", {}).get("items", [])
         if not tracks:
             continue
         album = Album(
             spotify_id=album_id,
-            name=tracks[0].get("album", {}).get("name", "Unknown Album"),
-            artist=", ".join(
-                artist.get("name") for artist in tracks[0].get("artists", []) if artist.get("name")
-            ),
+            name=remote.get("name") or "Unknown Album",
+            artist=_artist_names(remote) or _artist_names(tracks[0]),
             track_count=len(tracks),
         )
-        db.add(album)
-        db.flush()
-        track_ids: List[str] = []
         for track in tracks:
             track_id = track.get("id")
-            if not track_id:
+            if not track_id or track_id in seen_tracks:
                 continue
-            track_ids.append(track_id)
-            db.add(
+            seen_tracks.add(track_id)
+            ingested.append(
                 Track(
                     spotify_id=track_id,
                     name=track.get("name", ""),
-                    artist=", ".join(artist.get("name") for artist in track.get("artists", []) if artist.get("name")),
+                    artist=_artist_names(track),
                     popularity=track.get("popularity"),
-                    album_id=album.id,
+                    album=album,
                 )
             )
-        audio_features = await spotify_service.get_audio_features(account.access_token, track_ids)
-        for track in db.query(Track).filter(Track.album_id == album.id).all():
-            if track.spotify_id in audio_features:
-                track.audio_features = audio_features[track.spotify_id]
+        db.add(album)
         queued += 1
-    db.commit()
+
+    audio_features = await spotify_service.get_audio_features(
+        account.access_token, [track.spotify_id for track in ingested]
+    )
+    for track in ingested:
+        if track.spotify_id in audio_features:
+            track.audio_features = audio_features[track.spotify_id]
+    await db.flush()
+    fresh = [
+        CatalogTrack(
+            id=track.id,
+            spotify_id=track.spotify_id,
+            artist=track.artist,
+            popularity=track.popularity,
+            created_at=track.created_at,
+        )
+        for track in ingested
+    ]
+    await db.commit()
+    catalog_service.add_tracks(fresh)
     return LibraryIngestResponse(queued=queued)
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session, require_session
-from app.api.v1.schemas.metrics import MetricOverview, MetricsHistoryResponse
+from app.api.deps import get_async_read_db_session, require_session
+from app.api.v1.schemas.metrics import HttpPoolStats, MetricOverview, MetricsHistoryResponse
 from app.core.security import DashboardSession
 from app.services.metrics_service import metrics_service
+from app.services.spotify_service import spotify_service
 
 router = APIRouter(prefix="/api/v1/metrics", tags=["metrics"])
 
@@ -14,14 +15,24 @@ router = APIRouter(prefix="/api/v1/metrics", tags=["metrics"])
 @router.get("/overview", response_model=MetricOverview)
 async def metrics_overview(
     _: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
 ) -> MetricOverview:
-    return metrics_service.get_overview(db)
+    return await metrics_service.get_overview_async(db)
 
 
 @router.get("/history", response_model=MetricsHistoryResponse)
 async def metrics_history(
+    days: int = Query(7, ge=1, le=3650),
+    granularity: str = Query("hour", regex="^(hour|day|week)$"),
     _: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
 ) -> MetricsHistoryResponse:
-    return MetricsHistoryResponse(history=metrics_service.get_history(db))
+    return MetricsHistoryResponse(
+        granularity=granularity,
+        history=await metrics_service.get_history_async(db, days, granularity),
+    )
+
+
+@router.get("/spotify-pool", response_model=HttpPoolStats)
+async def spotify_pool(_: DashboardSession = Depends(require_session)) -> HttpPoolStats:
+    return HttpPoolStats(**spotify_service.pool_stats())
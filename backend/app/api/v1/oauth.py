@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session, require_session
+from app.api.deps import get_async_db_session, require_session
 from app.api.v1.accounts import pop_state
 from app.core.config import get_settings
 from app.core.security import DashboardSession, session_store
@@ -18,7 +19,7 @@ async def spotify_callback(
     code: str = Query(...),
     state: str = Query(...),
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> dict[str, str]:
     if not pop_state(state):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid state")
@@ -34,7 +35,7 @@ async def spotify_callback(
     if not spotify_user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing Spotify user id")
 
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.spotify_user_id == spotify_user_id).one_or_none()
+    account = await db.scalar(select(SpotifyAccount).where(SpotifyAccount.spotify_user_id == spotify_user_id))
     if account:
         account.access_token = access_token
         account.refresh_token = refresh_token
@@ -51,7 +52,6 @@ async def spotify_callback(
             prefix=get_settings().default_prefix,
         )
         db.add(account)
-    db.commit()
-    db.refresh(account)
+    await db.commit()
     session_store.set_active_account(session.session_id, str(account.id))
     return {"status": "connected"}
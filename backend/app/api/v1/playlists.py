@@ -1,24 +1,28 @@
 from __future__ import annotations
 
-from typing import List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session, require_session
+from app.api.deps import get_async_db_session, get_async_read_db_session, require_session
 from app.api.v1.schemas.playlists import (
     PlaylistBulkReshuffleRequest,
+    PlaylistCreateFailure,
     PlaylistCreateRequest,
     PlaylistCreateResponse,
     PlaylistListResponse,
     PlaylistRead,
     PlaylistReshuffleResponse,
+    ReshuffleJobRead,
 )
 from app.core.config import get_settings
 from app.core.security import DashboardSession
-from app.db.models import Playlist, SpotifyAccount
+from app.db.models import Playlist, ReshuffleJob, SpotifyAccount
 from app.services.playlist_service import PlaylistCapacityError, playlist_service
+from app.services.reshuffle_job_service import reshuffle_job_service
+from app.services.sampler_service import sampler_service
 
 router = APIRouter(prefix="/api/v1/playlists", tags=["playlists"])
 
@@ -26,9 +30,9 @@ router = APIRouter(prefix="/api/v1/playlists", tags=["playlists"])
 @router.get("/list", response_model=PlaylistListResponse)
 async def list_playlists(
     _: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
 ) -> PlaylistListResponse:
-    playlists = db.query(Playlist).order_by(Playlist.created_at.desc()).all()
+    playlists = (await db.scalars(select(Playlist).order_by(Playlist.created_at.desc()))).all()
     return PlaylistListResponse(playlists=[PlaylistRead.from_orm(playlist) for playlist in playlists])
 
 
@@ -36,38 +40,60 @@ async def list_playlists(
 async def create_playlists(
     payload: PlaylistCreateRequest,
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> PlaylistCreateResponse:
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.id == payload.account_id).one_or_none()
+    account = await db.get(SpotifyAccount, payload.account_id)
     if not account:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account not found")
     settings = get_settings()
+    vibe = None
+    if payload.seed_track_id or payload.target_features:
+        vibe = {
+            "seed_track_id": str(payload.seed_track_id) if payload.seed_track_id else None,
+            "target": payload.target_features,
+        }
+        try:
+            await sampler_service.check_vibe_async(db, vibe)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    args = (
+        db,
+        account,
+        payload.count,
+        payload.prefix,
+        payload.size or settings.playlist_size,
+        payload.interval_days or settings.reshuffle_interval_days,
+        settings.cooldown_days,
+        settings.artist_cap,
+    )
     try:
-        created = await playlist_service.create_playlists(
-            db,
-            account,
-            payload.count,
-            payload.prefix,
-            payload.size or settings.playlist_size,
-            payload.interval_days or settings.reshuffle_interval_days,
-            settings.cooldown_days,
-            settings.artist_cap,
-        )
+        if payload.pipelined:
+            created, failures = await playlist_service.create_playlists_pipelined(
+                *args, vibe=vibe, minimize_overlap=payload.minimize_overlap
+            )
+        else:
+            created = await playlist_service.create_playlists(
+                *args, vibe=vibe, minimize_overlap=payload.minimize_overlap
+            )
+            failures = []
     except PlaylistCapacityError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-    return PlaylistCreateResponse(created_playlist_ids=[playlist.id for playlist in created])
+    return PlaylistCreateResponse(
+        created_playlist_ids=[playlist.id for playlist in created],
+        failed=[PlaylistCreateFailure(**failure._asdict()) for failure in failures],
+    )
 
 
 @router.post("/{playlist_id}/reshuffle", response_model=PlaylistReshuffleResponse)
 async def reshuffle_playlist(
     playlist_id: UUID,
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
 ) -> PlaylistReshuffleResponse:
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).one_or_none()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Playlist not found")
-    account = db.query(SpotifyAccount).filter(SpotifyAccount.id == playlist.account_id).one_or_none()
+    account = await db.get(SpotifyAccount, playlist.account_id)
     if not account:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account missing")
     settings = get_settings()
@@ -80,40 +106,31 @@ async def reshuffle_playlist(
         settings.artist_cap,
         settings.reshuffle_interval_days,
     )
-    return PlaylistReshuffleResponse(id=playlist.id, status="reshuffled")
+    return PlaylistReshuffleResponse(
+        id=playlist.id,
+        status="queued" if settings.playlist_sync_outbox and playlist.spotify_playlist_id else "reshuffled",
+    )
 
 
-@router.post("/reshuffle-bulk", response_model=PlaylistCreateResponse)
+@router.post("/reshuffle-bulk", response_model=ReshuffleJobRead, status_code=status.HTTP_202_ACCEPTED)
 async def reshuffle_bulk(
     payload: PlaylistBulkReshuffleRequest,
     session: DashboardSession = Depends(require_session),
-    db: Session = Depends(get_db_session),
-) -> PlaylistCreateResponse:
-    settings = get_settings()
-    playlists: List[Playlist]
-    if payload.mode == "all":
-        playlists = db.query(Playlist).all()
-    elif payload.mode == "account":
-        if not payload.account_id:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="account_id required")
-        playlists = db.query(Playlist).filter(Playlist.account_id == payload.account_id).all()
-    else:
-        ids = payload.playlist_ids or []
-        playlists = db.query(Playlist).filter(Playlist.id.in_(ids)).all()
+    db: AsyncSession = Depends(get_async_db_session),
+) -> ReshuffleJobRead:
+    if payload.mode == "account" and not payload.account_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="account_id required")
+    job = await reshuffle_job_service.enqueue(db, payload)
+    return reshuffle_job_service.describe(job)
 
-    reshuffled_ids: List[UUID] = []
-    for playlist in playlists:
-        account = db.query(SpotifyAccount).filter(SpotifyAccount.id == playlist.account_id).one_or_none()
-        if not account:
-            continue
-        await playlist_service.reshuffle_playlist(
-            db,
-            playlist,
-            account,
-            playlist.size or settings.playlist_size,
-            settings.cooldown_days,
-            settings.artist_cap,
-            settings.reshuffle_interval_days,
-        )
-        reshuffled_ids.append(playlist.id)
-    return PlaylistCreateResponse(created_playlist_ids=reshuffled_ids)
+
+@router.get("/reshuffle-jobs/{job_id}", response_model=ReshuffleJobRead)
+async def reshuffle_job_status(
+    job_id: UUID,
+    _: DashboardSession = Depends(require_session),
+    db: AsyncSession = Depends(get_async_db_session),
+) -> ReshuffleJobRead:
+    job = await db.get(ReshuffleJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reshuffle job not found")
+    return reshuffle_job_service.describe(job)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -22,4 +22,18 @@ class MetricsHistoryPoint(BaseModel):
 
 
 class MetricsHistoryResponse(BaseModel):
+    granularity: str = "hour"
     history: List[MetricsHistoryPoint]
+
+
+class HttpPoolStats(BaseModel):
+    requests: int
+    connections_opened: int
+    tls_handshakes: int
+    http2_requests: int
+    clients_created: int
+    reused_requests: int
+    reuse_ratio: Optional[float]
+    open: bool
+    rate_limiter: Dict[str, float]
+    response_cache: Dict[str, Optional[float]]
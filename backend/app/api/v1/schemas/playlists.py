@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -16,6 +16,7 @@ class PlaylistRead(BaseModel):
     last_reshuffled_at: Optional[datetime]
     next_reshuffle_at: Optional[datetime]
     external_url: Optional[str]
+    vibe: Optional[Dict[str, object]]
 
     class Config:
         orm_mode = True
@@ -31,10 +32,21 @@ class PlaylistCreateRequest(BaseModel):
     prefix: Optional[str]
     size: Optional[int]
     interval_days: Optional[int]
+    seed_track_id: Optional[UUID]
+    target_features: Optional[Dict[str, float]]
+    minimize_overlap: bool = False
+    pipelined: bool = False
+
+
+class PlaylistCreateFailure(BaseModel):
+    name: str
+    playlist_id: Optional[UUID]
+    error: str
 
 
 class PlaylistCreateResponse(BaseModel):
     created_playlist_ids: List[UUID]
+    failed: List[PlaylistCreateFailure] = []
 
 
 class PlaylistReshuffleResponse(BaseModel):
@@ -46,3 +58,22 @@ class PlaylistBulkReshuffleRequest(BaseModel):
     mode: str = Field(..., regex="^(all|account|selected)$")
     account_id: Optional[UUID]
     playlist_ids: Optional[List[UUID]]
+    seed: Optional[str]
+    minimize_overlap: bool = False
+
+
+class ReshuffleJobRead(BaseModel):
+    id: UUID
+    status: str
+    mode: str
+    total: int
+    completed: int
+    failed: int = 0
+    error: Optional[str]
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    playlists_per_minute: Optional[float]
+    eta_seconds: Optional[int]
@@ -15,6 +15,12 @@ class Settings(BaseSettings):
     dashboard_password: str = Field("admin", env="DASHBOARD_PASSWORD")
 
     database_url: str = Field(..., env="DATABASE_URL")
+    async_database_url: Optional[str] = Field(None, env="ASYNC_DATABASE_URL")
+    async_db_pool_size: int = Field(10, env="ASYNC_DB_POOL_SIZE")
+    async_db_max_overflow: int = Field(20, env="ASYNC_DB_MAX_OVERFLOW")
+    database_replica_urls: List[str] | str | None = Field(None, env="DATABASE_REPLICA_URLS")
+    replica_max_lag_seconds: float = Field(10.0, env="REPLICA_MAX_LAG_SECONDS")
+    replica_check_seconds: float = Field(5.0, env="REPLICA_CHECK_SECONDS")
     redis_url: str = Field(..., env="REDIS_URL")
 
     spotify_client_id: str = Field(..., env="SPOTIFY_CLIENT_ID")
@@ -23,6 +29,8 @@ class Settings(BaseSettings):
         "http://127.0.0.1:8000/api/v1/oauth/spotify/callback",
         env="SPOTIFY_REDIRECT_URI",
     )
+    spotify_api_base: str = Field("https://api.spotify.com/v1", env="SPOTIFY_API_BASE")
+    spotify_auth_base: str = Field("https://accounts.spotify.com", env="SPOTIFY_AUTH_BASE")
 
     default_prefix: str = Field("Vibe Collection", env="DEFAULT_PREFIX")
     playlist_size: int = Field(50, env="TRACKS_PER_PLAYLIST")
@@ -30,6 +38,56 @@ class Settings(BaseSettings):
     cooldown_days: int = Field(5, env="MIN_REPEAT_GAP_DAYS")
     max_playlists_per_account: int = Field(200, env="MAX_PLAYLISTS_PER_ACCOUNT")
     artist_cap: int = Field(2, env="ARTIST_CAP")
+    popularity_exponent: float = Field(0.0, env="POPULARITY_EXPONENT")
+    recency_half_life_days: float = Field(0.0, env="RECENCY_HALF_LIFE_DAYS")
+
+    catalog_refresh_seconds: int = Field(300, env="CATALOG_REFRESH_SECONDS")
+    cooldown_index_refresh_seconds: int = Field(300, env="COOLDOWN_INDEX_REFRESH_SECONDS")
+    sampler_workers: int = Field(0, env="SAMPLER_WORKERS")
+    sampler_parallel_threshold: int = Field(200, env="SAMPLER_PARALLEL_THRESHOLD")
+    playlist_diff_sync: bool = Field(True, env="PLAYLIST_DIFF_SYNC")
+    playlist_diff_keep_order: bool = Field(False, env="PLAYLIST_DIFF_KEEP_ORDER")
+    playlist_create_concurrency: int = Field(8, env="PLAYLIST_CREATE_CONCURRENCY")
+    playlist_sync_outbox: bool = Field(True, env="PLAYLIST_SYNC_OUTBOX")
+    playlist_outbox_interval_seconds: int = Field(15, env="PLAYLIST_OUTBOX_INTERVAL_SECONDS")
+    playlist_outbox_batch: int = Field(500, env="PLAYLIST_OUTBOX_BATCH")
+    playlist_outbox_concurrency: int = Field(4, env="PLAYLIST_OUTBOX_CONCURRENCY")
+    playlist_outbox_lease_seconds: int = Field(600, env="PLAYLIST_OUTBOX_LEASE_SECONDS")
+    playlist_outbox_retry_seconds: int = Field(60, env="PLAYLIST_OUTBOX_RETRY_SECONDS")
+    playlist_outbox_max_attempts: int = Field(8, env="PLAYLIST_OUTBOX_MAX_ATTEMPTS")
+    history_write_mode: str = Field("executemany", env="HISTORY_WRITE_MODE")
+    history_commit_playlists: int = Field(100, env="HISTORY_COMMIT_PLAYLISTS")
+    history_retention_days: int = Field(365, env="HISTORY_RETENTION_DAYS")
+    history_partition_months_ahead: int = Field(3, env="HISTORY_PARTITION_MONTHS_AHEAD")
+    metric_snapshot_retention_days: int = Field(30, env="METRIC_SNAPSHOT_RETENTION_DAYS")
+    reshuffle_job_interval_seconds: int = Field(10, env="RESHUFFLE_JOB_INTERVAL_SECONDS")
+    reshuffle_job_lease_seconds: int = Field(300, env="RESHUFFLE_JOB_LEASE_SECONDS")
+    reshuffle_job_retry_seconds: int = Field(60, env="RESHUFFLE_JOB_RETRY_SECONDS")
+    reshuffle_job_max_attempts: int = Field(5, env="RESHUFFLE_JOB_MAX_ATTEMPTS")
+
+    spotify_http2: bool = Field(True, env="SPOTIFY_HTTP2")
+    spotify_max_connections: int = Field(100, env="SPOTIFY_MAX_CONNECTIONS")
+    spotify_max_keepalive_connections: int = Field(20, env="SPOTIFY_MAX_KEEPALIVE_CONNECTIONS")
+    spotify_keepalive_expiry_seconds: float = Field(30.0, env="SPOTIFY_KEEPALIVE_EXPIRY_SECONDS")
+    spotify_timeout_seconds: float = Field(30.0, env="SPOTIFY_TIMEOUT_SECONDS")
+    spotify_app_rate_per_second: float = Field(10.0, env="SPOTIFY_APP_RATE_PER_SECOND")
+    spotify_app_burst: int = Field(20, env="SPOTIFY_APP_BURST")
+    spotify_account_rate_per_second: float = Field(3.0, env="SPOTIFY_ACCOUNT_RATE_PER_SECOND")
+    spotify_account_burst: int = Field(6, env="SPOTIFY_ACCOUNT_BURST")
+    spotify_max_concurrency: int = Field(16, env="SPOTIFY_MAX_CONCURRENCY")
+    spotify_min_concurrency: int = Field(1, env="SPOTIFY_MIN_CONCURRENCY")
+    spotify_rate_increase_step: float = Field(0.02, env="SPOTIFY_RATE_INCREASE_STEP")
+    spotify_min_rate_scale: float = Field(0.1, env="SPOTIFY_MIN_RATE_SCALE")
+    spotify_max_retries: int = Field(5, env="SPOTIFY_MAX_RETRIES")
+    spotify_max_retry_after_seconds: float = Field(120.0, env="SPOTIFY_MAX_RETRY_AFTER_SECONDS")
+    spotify_ingest_concurrency: int = Field(8, env="SPOTIFY_INGEST_CONCURRENCY")
+    token_refresh_lead_seconds: int = Field(600, env="TOKEN_REFRESH_LEAD_SECONDS")
+    token_refresh_interval_seconds: int = Field(300, env="TOKEN_REFRESH_INTERVAL_SECONDS")
+    token_refresh_concurrency: int = Field(8, env="TOKEN_REFRESH_CONCURRENCY")
+    spotify_cache_enabled: bool = Field(True, env="SPOTIFY_CACHE_ENABLED")
+    spotify_cache_path: str = Field(".cache/spotify_responses.sqlite3", env="SPOTIFY_CACHE_PATH")
+    spotify_cache_ttl_seconds: int = Field(60 * 60 * 24 * 7, env="SPOTIFY_CACHE_TTL_SECONDS")
+    spotify_cache_max_entries: int = Field(200_000, env="SPOTIFY_CACHE_MAX_ENTRIES")
 
     allowed_origins: List[AnyHttpUrl] | str | None = Field(
         "http://127.0.0.1:3000",
@@ -53,6 +111,14 @@ class Settings(BaseSettings):
             return value
         return [origin.strip() for origin in value.split(",") if origin.strip()]
 
+    @validator("database_replica_urls", pre=True)
+    def split_replica_urls(cls, value: List[str] | str | None) -> Optional[List[str]]:
+        if not value:
+            return None
+        if isinstance(value, list):
+            return value
+        return [url.strip() for url in value.split(",") if url.strip()]
+
 
 @lru_cache
 def get_settings() -> Settings:
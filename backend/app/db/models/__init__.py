@@ -1,8 +1,10 @@
 from app.db.models.account import SpotifyAccount
 from app.db.models.album import Album
-from app.db.models.history import PlaylistEntryHistory
-from app.db.models.metric import MetricSnapshot
+from app.db.models.history import PlaylistEntryHistory, PlaylistHistoryBatch, TrackUsageSummary
+from app.db.models.metric import MetricRollup, MetricSnapshot
+from app.db.models.outbox import PlaylistSyncOutbox
 from app.db.models.playlist import Playlist
+from app.db.models.reshuffle_job import ReshuffleJob, ReshuffleJobItem
 from app.db.models.setting import Setting
 from app.db.models.track import Track
 
@@ -10,8 +12,14 @@ __all__ = [
     "SpotifyAccount",
     "Album",
     "PlaylistEntryHistory",
+    "PlaylistHistoryBatch",
+    "MetricRollup",
     "MetricSnapshot",
     "Playlist",
+    "PlaylistSyncOutbox",
+    "ReshuffleJob",
+    "ReshuffleJobItem",
     "Setting",
     "Track",
+    "TrackUsageSummary",
 ]
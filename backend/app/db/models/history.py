@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, LargeBinary, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,11 +13,42 @@ from app.db.session import Base
 class PlaylistEntryHistory(Base):
     __tablename__ = "playlist_entries_history"
 
+    # On PostgreSQL the table is range-partitioned by month on added_at, which must be part of the key.
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     playlist_id = Column(UUID(as_uuid=True), ForeignKey("playlists.id"), nullable=False)
     track_id = Column(UUID(as_uuid=True), ForeignKey("tracks.id"), nullable=False)
-    added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    added_at = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
     batch_tag = Column(String, nullable=False)
 
     playlist = relationship("Playlist", back_populates="entries")
     track = relationship("Track", back_populates="history_entries")
+
+
+class PlaylistHistoryBatch(Base):
+    """One reshuffle of one playlist, written instead of per-track rows when ``HISTORY_WRITE_MODE=packed``.
+
+    ``track_ids`` holds the placed track UUIDs in playlist order, 16 bytes each.
+    """
+
+    __tablename__ = "playlist_history_batches"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    playlist_id = Column(UUID(as_uuid=True), ForeignKey("playlists.id"), nullable=False)
+    added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    batch_tag = Column(String, nullable=False)
+    track_count = Column(Integer, nullable=False)
+    track_ids = Column(LargeBinary, nullable=False)
+
+    playlist = relationship("Playlist", back_populates="history_batches")
+
+
+class TrackUsageSummary(Base):
+    """Placements per track folded out of history rows past ``HISTORY_RETENTION_DAYS``."""
+
+    __tablename__ = "track_usage_summary"
+
+    track_id = Column(UUID(as_uuid=True), ForeignKey("tracks.id"), primary_key=True)
+    placements = Column(BigInteger, nullable=False, default=0)
+    first_added_at = Column(DateTime, nullable=False)
+    last_added_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, Integer
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.db.session import Base
@@ -19,3 +19,20 @@ class MetricSnapshot(Base):
     tracks_count = Column(Integer, nullable=False, default=0)
     reshuffles_last_24h = Column(Integer, nullable=False, default=0)
     avg_tracks_per_playlist = Column(Integer, nullable=False, default=0)
+
+
+class MetricRollup(Base):
+    """Snapshots folded into one hour, day or week bucket for the dashboard chart."""
+
+    __tablename__ = "metric_rollups"
+    __table_args__ = (UniqueConstraint("granularity", "bucket_start", name="uq_metric_rollups_bucket"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    granularity = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    accounts_count = Column(Integer, nullable=False, default=0)
+    playlists_count = Column(Integer, nullable=False, default=0)
+    tracks_count = Column(Integer, nullable=False, default=0)
+    reshuffles_last_24h = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
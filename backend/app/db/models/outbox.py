@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.db.session import Base
+
+
+class PlaylistSyncOutbox(Base):
+    """A track list committed by a reshuffle and not yet pushed to Spotify."""
+
+    __tablename__ = "playlist_sync_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    playlist_id = Column(UUID(as_uuid=True), ForeignKey("playlists.id"), nullable=False)
+    track_uris = Column(JSON, nullable=False)
+    description = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    playlist = relationship("Playlist", back_populates="pending_syncs")
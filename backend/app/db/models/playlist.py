@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -22,8 +22,13 @@ class Playlist(Base):
     last_reshuffled_at = Column(DateTime, nullable=True)
     next_reshuffle_at = Column(DateTime, nullable=True)
     external_url = Column(String, nullable=True)
+    vibe = Column(JSON, nullable=True)
+    snapshot_id = Column(String, nullable=True)
+    synced_track_uris = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     account = relationship("SpotifyAccount", back_populates="playlists")
     entries = relationship("PlaylistEntryHistory", back_populates="playlist", cascade="all, delete-orphan")
+    history_batches = relationship("PlaylistHistoryBatch", back_populates="playlist", cascade="all, delete-orphan")
+    pending_syncs = relationship("PlaylistSyncOutbox", back_populates="playlist", cascade="all, delete-orphan")
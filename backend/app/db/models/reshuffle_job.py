@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.db.session import Base
+
+
+class ReshuffleJob(Base):
+    __tablename__ = "reshuffle_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    status = Column(String, nullable=False, default="queued")
+    mode = Column(String, nullable=False)
+    account_id = Column(UUID(as_uuid=True), nullable=True)
+    seed = Column(String, nullable=True)
+    minimize_overlap = Column(Boolean, nullable=False, default=False)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("ReshuffleJobItem", back_populates="job", cascade="all, delete-orphan")
+
+
+class ReshuffleJobItem(Base):
+    """One playlist of a job; ``done_at`` is set in the commit that wrote its history or recorded its failure."""
+
+    __tablename__ = "reshuffle_job_items"
+
+    job_id = Column(UUID(as_uuid=True), ForeignKey("reshuffle_jobs.id"), primary_key=True)
+    playlist_id = Column(UUID(as_uuid=True), primary_key=True)
+    account_id = Column(UUID(as_uuid=True), nullable=False)
+    done_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+
+    job = relationship("ReshuffleJob", back_populates="items")
@@ -1,16 +1,149 @@
 from __future__ import annotations
 
-from contextlib import contextmanager
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, TypeVar, Union
 
-from sqlalchemy import create_engine
+from sqlalchemy import Select, create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.core.config import get_settings
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+DbSession = Union[Session, AsyncSession]
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+READ_ONLY = "read_only"
+# Seconds the replica is behind; 0 when it has replayed everything it received.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def async_database_url(url: str) -> str:
+    """``url`` with its driver swapped for the asyncio one (``psycopg2`` -> ``asyncpg``)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _async_pool(url: str) -> Dict[str, int]:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {"pool_size": settings.async_db_pool_size, "max_overflow": settings.async_db_max_overflow}
+
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.url = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine(url, pool_pre_ping=True)
+        replica_async_url = async_database_url(url)
+        self.async_engine = create_async_engine(replica_async_url, pool_pre_ping=True, **_async_pool(replica_async_url))
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checked_at = float("-inf")
+
+
+class ReplicaSet:
+    """Read replicas, used round-robin while their replication lag is within bounds.
+
+    Each replica's lag is measured at most every ``REPLICA_CHECK_SECONDS``.
+    One that is more than ``REPLICA_MAX_LAG_SECONDS`` behind, or cannot be
+    reached, is skipped until a later check passes. With none usable, reads
+    fall back to the primary.
+    """
+
+    def __init__(self, urls: Sequence[str], max_lag_seconds: float, check_seconds: float) -> None:
+        self.replicas = [Replica(url) for url in urls]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self._next = 0
+
+    def pick(self, use_async: bool) -> Optional[Engine]:
+        """A usable replica engine, the sync face of its async engine when ``use_async``."""
+        count = len(self.replicas)
+        for offset in range(count):
+            index = (self._next + offset) % count
+            replica = self.replicas[index]
+            bind = replica.async_engine.sync_engine if use_async else replica.engine
+            if self._usable(replica, bind):
+                self._next = (index + 1) % count
+                return bind
+        return None
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [{"url": replica.url, "healthy": replica.healthy, "lag_seconds": replica.lag} for replica in self.replicas]
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def _usable(self, replica: Replica, bind: Engine) -> bool:
+        now = time.monotonic()
+        if now - replica.checked_at < self.check_seconds:
+            return replica.healthy
+        replica.checked_at = now
+        try:
+            with bind.connect() as connection:
+                lag = connection.execute(REPLICA_LAG_QUERY).scalar() if bind.dialect.name == "postgresql" else 0
+        except SQLAlchemyError as exc:
+            replica.healthy, replica.lag = False, None
+            logger.warning("Read replica %s unreachable, reading from the primary: %s", replica.url, exc)
+            return False
+        replica.lag = float(lag or 0)
+        replica.healthy = replica.lag <= self.max_lag_seconds
+        if not replica.healthy:
+            logger.warning("Read replica %s is %.1fs behind, skipping it", replica.url, replica.lag)
+        return replica.healthy
+
+
+class RoutingSession(Session):
+    """Sends reads to a replica when ``DATABASE_REPLICA_URLS`` is set.
+
+    Routed are every ``SELECT`` of a session opened with
+    ``info={"read_only": True}`` (``get_read_db`` / ``get_async_read_db``)
+    and statements marked ``execution_options(replica=True)`` on any
+    session. Writes and flushes always go to the primary. A session keeps
+    the replica it first picked, so its reads see one consistent server.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if replicas is None or self._flushing or not isinstance(clause, Select):
+            return primary
+        if not (self.info.get(READ_ONLY) or clause.get_execution_options().get("replica")):
+            return primary
+        bind = self.info.get("replica_bind")
+        if bind is None:
+            bind = replicas.pick(use_async=primary is async_engine.sync_engine) or primary
+            self.info["replica_bind"] = bind
+        return bind
+
 
 settings = get_settings()
 engine = create_engine(settings.database_url, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+SessionLocal = sessionmaker(bind=engine, class_=RoutingSession, autocommit=False, autoflush=False)
+_async_url = settings.async_database_url or async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, pool_pre_ping=True, **_async_pool(_async_url))
+# Objects stay readable after commit; lazy reloads would need a greenlet the API code is not in.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+replicas: Optional[ReplicaSet] = (
+    ReplicaSet(settings.database_replica_urls, settings.replica_max_lag_seconds, settings.replica_check_seconds)
+    if settings.database_replica_urls
+    else None
+)
 Base = declarative_base()
 
 
@@ -21,3 +154,37 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def get_read_db() -> Session:
+    db = SessionLocal(info={READ_ONLY: True})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@asynccontextmanager
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal(info={READ_ONLY: True}) as db:
+        yield db
+
+
+async def run_sync(db: DbSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Call ``fn(session, *args, **kwargs)`` with a sync ``Session`` for either session type.
+
+    Services shared by the API (``AsyncSession``) and Celery (``Session``) keep
+    their ORM steps as plain functions; for an ``AsyncSession`` they run on its
+    greenlet bridge, so queries await the asyncio driver instead of blocking
+    the event loop.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
@@ -1,18 +1,32 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
 from app.core.config import get_settings
 from app.core.logging import configure_logging
+from app.db.session import async_engine, replicas
+from app.services.spotify_service import spotify_service
 
 configure_logging()
 
 
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    await spotify_service.aclose()
+    await async_engine.dispose()
+    if replicas is not None:
+        await replicas.dispose()
+
+
 def create_app() -> FastAPI:
     settings = get_settings()
-    app = FastAPI(title=settings.app_name)
+    app = FastAPI(title=settings.app_name, lifespan=lifespan)
     origins = settings.allowed_origins or ["http://127.0.0.1:3000"]
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.models import Track
+from app.utils.sampling_utils import ArtistGroups, group_by_artist
+from app.utils.time_utils import epoch_seconds
+
+NO_POPULARITY = -1
+
+
+@dataclass(frozen=True)
+class CatalogTrack:
+    id: UUID
+    spotify_id: str
+    artist: str
+    popularity: int | None
+    created_at: datetime | None = None
+
+
+class CatalogSnapshot:
+    """Column arrays for every usable track, addressed by catalog position.
+
+    The Python-side lists (ids, Spotify ids, artist names) are append-only and
+    shared between successive snapshots of the same generation, so patching in
+    freshly ingested tracks never invalidates positions held by older readers.
+    """
+
+    def __init__(
+        self,
+        ids: List[UUID],
+        spotify_ids: List[str],
+        artists: List[str],
+        artist_index: Dict[str, int],
+        positions: Dict[UUID, int],
+        artist_codes: np.ndarray,
+        popularity: np.ndarray,
+        created_at: np.ndarray,
+        generation: int,
+        version: int,
+    ) -> None:
+        self.ids = ids
+        self.spotify_ids = spotify_ids
+        self.artists = artists
+        self.artist_index = artist_index
+        self.positions = positions
+        self.artist_codes = artist_codes
+        self.popularity = popularity
+        self.created_at = created_at
+        self.generation = generation
+        self.version = version
+        self.size = len(artist_codes)
+        self.loaded_at = time.monotonic()
+        self._cumulative_weights: Dict[Tuple[float, float], Optional[np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def artist_count(self) -> int:
+        return len(self.artists)
+
+    @cached_property
+    def artist_groups(self) -> ArtistGroups:
+        return group_by_artist(self.artist_codes, self.artist_count)
+
+    def cumulative_weights(self, popularity_exponent: float, recency_half_life_days: float) -> Optional[np.ndarray]:
+        """Running sum of per-track sampling weights, or ``None`` when sampling is unweighted.
+
+        A track weighs ``(popularity + 1) ** popularity_exponent`` (unknown
+        popularity counts as 0), halved for every ``recency_half_life_days``
+        it is older than the newest track. Ages are measured against the
+        newest track rather than the clock, so the table stays valid until the
+        catalog changes and is cached per snapshot.
+        """
+        if not popularity_exponent and recency_half_life_days <= 0:
+            return None
+        key = (float(popularity_exponent), float(recency_half_life_days))
+        if key not in self._cumulative_weights:
+            weights = np.ones(self.size, dtype=np.float64)
+            if popularity_exponent:
+                weights *= (np.maximum(self.popularity, 0).astype(np.float64) + 1.0) ** popularity_exponent
+            if recency_half_life_days > 0 and self.size:
+                age_days = (self.created_at.max() - self.created_at) / 86_400
+                weights *= np.exp2(-age_days / recency_half_life_days)
+            self._cumulative_weights[key] = np.cumsum(weights)
+        return self._cumulative_weights[key]
+
+    def track(self, position: int) -> CatalogTrack:
+        popularity = int(self.popularity[position])
+        return CatalogTrack(
+            id=self.ids[position],
+            spotify_id=self.spotify_ids[position],
+            artist=self.artists[self.artist_codes[position]],
+            popularity=None if popularity == NO_POPULARITY else popularity,
+        )
+
+    def tracks(self, positions: Iterable[int]) -> List[CatalogTrack]:
+        return [self.track(int(position)) for position in positions]
+
+    def positions_for(self, track_ids: Iterable[UUID]) -> np.ndarray:
+        found = []
+        for track_id in track_ids:
+            position = self.positions.get(track_id)
+            if position is not None and position < self.size:
+                found.append(position)
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+
+@dataclass(frozen=True)
+class _Columns:
+    ids: List[UUID]
+    spotify_ids: List[str]
+    artists: List[str]
+    artist_index: Dict[str, int]
+    artist_codes: np.ndarray
+    popularity: np.ndarray
+    created_at: np.ndarray
+
+
+class CatalogService:
+    """Process-wide snapshot of the usable track catalog.
+
+    The snapshot is loaded once with a column-only query and then patched in
+    place by the ingest endpoint. Other processes (Celery workers) pick up new
+    tracks when the snapshot ages past ``catalog_refresh_seconds``. A reload
+    that finds the same tracks in the same order keeps the generation, so
+    indexes keyed on catalog positions survive it; it bumps the version only
+    when artist, popularity or age columns changed.
+
+    Loads query the database without holding the lock, which only guards
+    swapping the snapshot in, so concurrent cold loads may both query but
+    never block the event loop on each other.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._generation = 0
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_stale(snapshot):
+            return snapshot
+        # The query runs without the lock: under ``AsyncSession.run_sync`` it
+        # awaits on the event loop thread, and a second request blocking that
+        # thread on the lock would keep the first one from ever resuming.
+        columns = self._query(db)
+        with self._lock:
+            current = self._snapshot
+            if current is not snapshot and current is not None and not self._is_stale(current):
+                # Another caller installed a fresh snapshot while this one queried.
+                return current
+            self._snapshot = self._build(columns)
+            return self._snapshot
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def add_tracks(self, tracks: Sequence[CatalogTrack]) -> None:
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            fresh = [track for track in tracks if track.id not in snapshot.positions]
+            if not fresh:
+                return
+            codes = []
+            popularity = []
+            created_at = []
+            now = epoch_seconds(datetime.utcnow())
+            for track in fresh:
+                snapshot.positions[track.id] = len(snapshot.ids)
+                snapshot.ids.append(track.id)
+                snapshot.spotify_ids.append(track.spotify_id)
+                codes.append(self._intern(snapshot.artists, snapshot.artist_index, track.artist))
+                popularity.append(NO_POPULARITY if track.popularity is None else track.popularity)
+                created_at.append(now if track.created_at is None else epoch_seconds(track.created_at))
+            patched = CatalogSnapshot(
+                ids=snapshot.ids,
+                spotify_ids=snapshot.spotify_ids,
+                artists=snapshot.artists,
+                artist_index=snapshot.artist_index,
+                positions=snapshot.positions,
+                artist_codes=np.concatenate([snapshot.artist_codes, np.asarray(codes, dtype=np.int32)]),
+                popularity=np.concatenate([snapshot.popularity, np.asarray(popularity, dtype=np.int16)]),
+                created_at=np.concatenate([snapshot.created_at, np.asarray(created_at, dtype=np.float64)]),
+                generation=snapshot.generation,
+                version=snapshot.version + 1,
+            )
+            patched.loaded_at = snapshot.loaded_at
+            self._snapshot = patched
+
+    def _is_stale(self, snapshot: CatalogSnapshot) -> bool:
+        ttl = self.settings.catalog_refresh_seconds
+        return ttl > 0 and time.monotonic() - snapshot.loaded_at > ttl
+
+    @staticmethod
+    def _intern(artists: List[str], artist_index: Dict[str, int], artist: str) -> int:
+        code = artist_index.get(artist)
+        if code is None:
+            code = len(artists)
+            artist_index[artist] = code
+            artists.append(artist)
+        return code
+
+    def _query(self, db: Session) -> _Columns:
+        rows = (
+            db.query(Track.id, Track.spotify_id, Track.artist, Track.popularity, Track.created_at)
+            .filter(Track.is_usable.is_(True))
+            .order_by(Track.popularity.desc().nulls_last())
+            # Read from a replica when one is configured and caught up.
+            .execution_options(replica=True)
+            .yield_per(10_000)
+        )
+        ids: List[UUID] = []
+        spotify_ids: List[str] = []
+        artists: List[str] = []
+        artist_index: Dict[str, int] = {}
+        codes: List[int] = []
+        popularity: List[int] = []
+        created_at: List[float] = []
+        for track_id, spotify_id, artist, track_popularity, track_created_at in rows:
+            ids.append(track_id)
+            spotify_ids.append(spotify_id)
+            codes.append(self._intern(artists, artist_index, artist))
+            popularity.append(NO_POPULARITY if track_popularity is None else track_popularity)
+            created_at.append(epoch_seconds(track_created_at))
+        return _Columns(
+            ids=ids,
+            spotify_ids=spotify_ids,
+            artists=artists,
+            artist_index=artist_index,
+            artist_codes=np.asarray(codes, dtype=np.int32),
+            popularity=np.asarray(popularity, dtype=np.int16),
+            created_at=np.asarray(created_at, dtype=np.float64),
+        )
+
+    def _build(self, columns: _Columns) -> CatalogSnapshot:
+        """Snapshot for freshly queried ``columns``; called with the lock held."""
+        current = self._snapshot
+        if current is not None and current.ids == columns.ids:
+            if (
+                current.artists == columns.artists
+                and np.array_equal(current.artist_codes, columns.artist_codes)
+                and np.array_equal(current.popularity, columns.popularity)
+                and np.array_equal(current.created_at, columns.created_at)
+            ):
+                current.loaded_at = time.monotonic()
+                return current
+            # Same positions, new column values: indexes by position stay valid.
+            return CatalogSnapshot(
+                ids=current.ids,
+                spotify_ids=current.spotify_ids,
+                artists=columns.artists,
+                artist_index=columns.artist_index,
+                positions=current.positions,
+                artist_codes=columns.artist_codes,
+                popularity=columns.popularity,
+                created_at=columns.created_at,
+                generation=current.generation,
+                version=current.version + 1,
+            )
+        self._generation += 1
+        return CatalogSnapshot(
+            ids=columns.ids,
+            spotify_ids=columns.spotify_ids,
+            artists=columns.artists,
+            artist_index=columns.artist_index,
+            positions={track_id: position for position, track_id in enumerate(columns.ids)},
+            artist_codes=columns.artist_codes,
+            popularity=columns.popularity,
+            created_at=columns.created_at,
+            generation=self._generation,
+            version=0,
+        )
+
+
+catalog_service = CatalogService()
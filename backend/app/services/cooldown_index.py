@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.models import PlaylistEntryHistory, PlaylistHistoryBatch
+from app.services.catalog_service import CatalogSnapshot
+from app.services.history_writer import unpack_track_ids
+from app.utils.time_utils import epoch_seconds
+
+EPOCH = datetime(1970, 1, 1)
+QUERY_CHUNK = 1000
+
+
+class PlaylistCooldown:
+    """Time-ordered catalog positions recently placed in one playlist."""
+
+    def __init__(self, generation: int, horizon: float, added: np.ndarray, positions: np.ndarray) -> None:
+        self.generation = generation
+        self.horizon = horizon
+        self.added = added
+        self.positions = positions
+        self.loaded_at = time.monotonic()
+
+    def since(self, cutoff: float) -> np.ndarray:
+        start = int(np.searchsorted(self.added, cutoff, side="left"))
+        if start:
+            self.added = self.added[start:]
+            self.positions = self.positions[start:]
+            self.horizon = max(self.horizon, cutoff)
+        return self.positions
+
+    def append(self, added: float, positions: np.ndarray) -> None:
+        self.added = np.concatenate([self.added, np.full(len(positions), added)])
+        self.positions = np.concatenate([self.positions, positions.astype(np.int64)])
+
+
+class CooldownIndex:
+    """Per-playlist cooldown sets keyed by catalog position.
+
+    Entries are rebuilt lazily from ``playlist_entries_history`` (served by
+    ``ix_playlist_entries_history_playlist_added``) the first time a playlist is
+    sampled, then kept current by ``record`` as new history rows are committed.
+    Positions older than the requested cooldown are trimmed on read. Entries
+    are reloaded when the catalog generation changes or after
+    ``cooldown_index_refresh_seconds`` so writes from other processes show up.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._lock = threading.Lock()
+        self._entries: Dict[UUID, PlaylistCooldown] = {}
+
+    def recent_positions(
+        self,
+        db: Session,
+        catalog: CatalogSnapshot,
+        playlist_ids: Sequence[UUID],
+        cooldown_days: int,
+    ) -> Dict[UUID, np.ndarray]:
+        cutoff = epoch_seconds(datetime.utcnow() - timedelta(days=cooldown_days))
+        with self._lock:
+            missing = [
+                playlist_id
+                for playlist_id in playlist_ids
+                if not self._is_fresh(self._entries.get(playlist_id), catalog, cutoff)
+            ]
+        if missing:
+            loaded = self._load(db, catalog, missing, cutoff)
+            with self._lock:
+                self._entries.update(loaded)
+        with self._lock:
+            return {playlist_id: self._entries[playlist_id].since(cutoff) for playlist_id in playlist_ids}
+
+    def record(
+        self,
+        catalog: CatalogSnapshot,
+        playlist_id: UUID,
+        track_ids: Iterable[UUID],
+        added_at: datetime,
+    ) -> None:
+        with self._lock:
+            entry = self._entries.get(playlist_id)
+            if entry is None or entry.generation != catalog.generation:
+                return
+            entry.append(epoch_seconds(added_at), catalog.positions_for(track_ids))
+
+    def forget(self, playlist_id: UUID) -> None:
+        with self._lock:
+            self._entries.pop(playlist_id, None)
+
+    def _is_fresh(self, entry: PlaylistCooldown | None, catalog: CatalogSnapshot, cutoff: float) -> bool:
+        if entry is None or entry.generation != catalog.generation or entry.horizon > cutoff:
+            return False
+        ttl = self.settings.cooldown_index_refresh_seconds
+        return ttl <= 0 or time.monotonic() - entry.loaded_at <= ttl
+
+    @staticmethod
+    def _load(
+        db: Session, catalog: CatalogSnapshot, playlist_ids: List[UUID], cutoff: float
+    ) -> Dict[UUID, PlaylistCooldown]:
+        since = EPOCH + timedelta(seconds=cutoff)
+        rows: Dict[UUID, List[Tuple[float, UUID]]] = {playlist_id: [] for playlist_id in playlist_ids}
+        for offset in range(0, len(playlist_ids), QUERY_CHUNK):
+            chunk = playlist_ids[offset : offset + QUERY_CHUNK]
+            query = (
+                db.query(
+                    PlaylistEntryHistory.playlist_id,
+                    PlaylistEntryHistory.added_at,
+                    PlaylistEntryHistory.track_id,
+                )
+                .filter(PlaylistEntryHistory.playlist_id.in_(chunk))
+                .filter(PlaylistEntryHistory.added_at >= since)
+            )
+            for playlist_id, added_at, track_id in query:
+                rows[playlist_id].append((epoch_seconds(added_at), track_id))
+            # Packed history: only batches inside the window are unpacked.
+            batches = (
+                db.query(
+                    PlaylistHistoryBatch.playlist_id,
+                    PlaylistHistoryBatch.added_at,
+                    PlaylistHistoryBatch.track_ids,
+                )
+                .filter(PlaylistHistoryBatch.playlist_id.in_(chunk))
+                .filter(PlaylistHistoryBatch.added_at >= since)
+            )
+            for playlist_id, added_at, packed in batches:
+                timestamp = epoch_seconds(added_at)
+                rows[playlist_id].extend((timestamp, track_id) for track_id in unpack_track_ids(packed))
+
+        entries: Dict[UUID, PlaylistCooldown] = {}
+        for playlist_id, history in rows.items():
+            history.sort(key=lambda row: row[0])
+            added: List[float] = []
+            positions: List[int] = []
+            for timestamp, track_id in history:
+                position = catalog.positions.get(track_id)
+                if position is not None and position < len(catalog):
+                    added.append(timestamp)
+                    positions.append(position)
+            entries[playlist_id] = PlaylistCooldown(
+                generation=catalog.generation,
+                horizon=cutoff,
+                added=np.asarray(added, dtype=np.float64),
+                positions=np.asarray(positions, dtype=np.int64),
+            )
+        return entries
+
+
+cooldown_index = CooldownIndex()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.models import Track
+from app.services.catalog_service import CatalogSnapshot
+
+AUDIO_FEATURES = (
+    "danceability",
+    "energy",
+    "valence",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+    "tempo",
+    "loudness",
+)
+QUERY_CHUNK = 1000
+
+
+class FeatureMatrix:
+    """Standardised audio features as a dense float32 matrix, one row per catalog position.
+
+    Tracks without audio features keep a NaN-free zero row but are flagged in
+    ``present`` and never returned as neighbours.
+    """
+
+    def __init__(self, generation: int, values: np.ndarray, present: np.ndarray) -> None:
+        self.generation = generation
+        self.mean = np.zeros(len(AUDIO_FEATURES), dtype=np.float32)
+        self.scale = np.ones(len(AUDIO_FEATURES), dtype=np.float32)
+        if present.any():
+            self.mean = values[present].mean(axis=0)
+            std = values[present].std(axis=0)
+            self.scale = np.where(std > 0, std, 1.0).astype(np.float32)
+        self.present = present
+        self.matrix = self._standardise(values, present)
+        self.squares = self.matrix * self.matrix
+        self.norms = self.squares.sum(axis=1)
+        self.complete = bool(present.all())
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+    def extend(self, values: np.ndarray, present: np.ndarray) -> None:
+        rows = self._standardise(values, present)
+        self.present = np.concatenate([self.present, present])
+        self.matrix = np.concatenate([self.matrix, rows])
+        self.squares = np.concatenate([self.squares, rows * rows])
+        self.norms = np.concatenate([self.norms, (rows * rows).sum(axis=1)])
+        self.complete = self.complete and bool(present.all())
+
+    def vector_for(self, target: Mapping[str, float]) -> tuple[np.ndarray, np.ndarray]:
+        unknown = set(target) - set(AUDIO_FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown audio features: {', '.join(sorted(unknown))}")
+        raw = np.array([float(target.get(name, 0.0)) for name in AUDIO_FEATURES], dtype=np.float32)
+        weights = np.array([1.0 if name in target else 0.0 for name in AUDIO_FEATURES], dtype=np.float32)
+        return (raw - self.mean) / self.scale * weights, weights
+
+    def distances(self, query: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Squared weighted Euclidean distance from ``query`` to every row."""
+        if weights.all():
+            distances = self.matrix @ (-2.0 * query)
+            distances += self.norms
+        else:
+            distances = self.matrix @ (-2.0 * query * weights)
+            distances += self.squares @ weights
+        distances += float(np.dot(query * query, weights))
+        if not self.complete:
+            distances[~self.present] = np.inf
+        return distances
+
+    def _standardise(self, values: np.ndarray, present: np.ndarray) -> np.ndarray:
+        rows = (values - self.mean) / self.scale
+        rows[~present] = 0.0
+        return rows.astype(np.float32, copy=False)
+
+
+def _feature_row(features: Optional[Dict[str, Any]]) -> Optional[List[float]]:
+    if not features:
+        return None
+    try:
+        return [float(features[name]) for name in AUDIO_FEATURES]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class FeatureIndex:
+    """Brute-force nearest-neighbour lookups over catalog audio features.
+
+    The matrix follows the catalog snapshot: a new generation triggers a full
+    load, a patched snapshot only fetches features for the appended positions.
+    The lock only guards installing or extending the matrix, never a query.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._matrix: Optional[FeatureMatrix] = None
+
+    def get(self, db: Session, catalog: CatalogSnapshot) -> FeatureMatrix:
+        # Queries run outside the lock, as in ``CatalogService.get``: under
+        # ``AsyncSession.run_sync`` they await on the event loop thread.
+        with self._lock:
+            matrix = self._matrix
+        if matrix is None or matrix.generation != catalog.generation:
+            matrix = FeatureMatrix(catalog.generation, *self._load_all(db, catalog))
+            with self._lock:
+                self._matrix = matrix
+            return matrix
+        start = len(matrix)
+        if start < len(catalog):
+            values, present = self._load(db, catalog.ids[start : len(catalog)])
+            with self._lock:
+                # Skip the rows another caller appended while this one queried.
+                skip = len(matrix) - start
+                if skip < len(present):
+                    matrix.extend(values[skip:], present[skip:])
+        return matrix
+
+    def nearest(
+        self,
+        db: Session,
+        catalog: CatalogSnapshot,
+        limit: int,
+        seed_track_id: Optional[UUID] = None,
+        target: Optional[Mapping[str, float]] = None,
+    ) -> np.ndarray:
+        """Up to ``limit`` catalog positions, nearest first, to the seed track or target vector."""
+        matrix = self.get(db, catalog)
+        if seed_track_id is not None:
+            position = catalog.positions.get(seed_track_id)
+            if position is None or position >= len(catalog) or not matrix.present[position]:
+                raise ValueError("Seed track has no audio features in the catalog")
+            query = matrix.matrix[position]
+            weights = np.ones(len(AUDIO_FEATURES), dtype=np.float32)
+        elif target:
+            query, weights = matrix.vector_for(target)
+        else:
+            raise ValueError("A seed track or target features are required")
+        distances = matrix.distances(query, weights)[: len(catalog)]
+        limit = min(limit, int(np.isfinite(distances).sum()))
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        if limit < len(distances):
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+        else:
+            nearest = np.arange(len(distances))
+        return nearest[np.argsort(distances[nearest], kind="stable")][:limit]
+
+    @staticmethod
+    def _load_all(db: Session, catalog: CatalogSnapshot) -> tuple[np.ndarray, np.ndarray]:
+        values = np.zeros((len(catalog), len(AUDIO_FEATURES)), dtype=np.float32)
+        present = np.zeros(len(catalog), dtype=bool)
+        rows = (
+            db.query(Track.id, Track.audio_features)
+            .filter(Track.is_usable.is_(True))
+            .filter(Track.audio_features.isnot(None))
+            .yield_per(10_000)
+        )
+        for track_id, features in rows:
+            position = catalog.positions.get(track_id)
+            row = _feature_row(features)
+            if position is not None and position < len(catalog) and row is not None:
+                values[position] = row
+                present[position] = True
+        return values, present
+
+    @staticmethod
+    def _load(db: Session, track_ids: Sequence[UUID]) -> tuple[np.ndarray, np.ndarray]:
+        offsets = {track_id: offset for offset, track_id in enumerate(track_ids)}
+        values = np.zeros((len(track_ids), len(AUDIO_FEATURES)), dtype=np.float32)
+        present = np.zeros(len(track_ids), dtype=bool)
+        ids = list(track_ids)
+        for start in range(0, len(ids), QUERY_CHUNK):
+            chunk = ids[start : start + QUERY_CHUNK]
+            for track_id, features in db.query(Track.id, Track.audio_features).filter(Track.id.in_(chunk)):
+                row = _feature_row(features)
+                if row is not None:
+                    offset = offsets[track_id]
+                    values[offset] = row
+                    present[offset] = True
+        return values, present
+
+
+feature_index = FeatureIndex()
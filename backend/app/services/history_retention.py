@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import DateTime, bindparam, delete, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.config import get_settings
+from app.db.models import PlaylistEntryHistory, PlaylistHistoryBatch, TrackUsageSummary
+from app.services.history_writer import unpack_track_ids
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = PlaylistEntryHistory.__tablename__
+DELETE_CHUNK = 1000
+COMPACT_BATCH_CHUNK = 200
+PARTITION_NAME = re.compile(rf"^{HISTORY_TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+_UPSERT_SUMMARY = f"""
+INSERT INTO {TrackUsageSummary.__tablename__} (track_id, placements, first_added_at, last_added_at, updated_at)
+SELECT track_id, count(*), min(added_at), max(added_at), CURRENT_TIMESTAMP FROM {{source}}
+WHERE added_at < :cutoff GROUP BY track_id
+ON CONFLICT (track_id) DO UPDATE SET
+    placements = {TrackUsageSummary.__tablename__}.placements + EXCLUDED.placements,
+    first_added_at = {{least}}({TrackUsageSummary.__tablename__}.first_added_at, EXCLUDED.first_added_at),
+    last_added_at = {{greatest}}({TrackUsageSummary.__tablename__}.last_added_at, EXCLUDED.last_added_at),
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def upsert_summary(db: Session, source: str) -> TextClause:
+    """Fold the rows of ``source`` added before ``:cutoff`` into ``track_usage_summary`` inside the database."""
+    # SQLite spells LEAST/GREATEST as the two-argument min/max.
+    least, greatest = ("min", "max") if db.get_bind().dialect.name == "sqlite" else ("LEAST", "GREATEST")
+    return text(_UPSERT_SUMMARY.format(source=source, least=least, greatest=greatest)).bindparams(
+        bindparam("cutoff", type_=DateTime)
+    )
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{HISTORY_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+class HistoryRetentionService:
+    """Keeps ``playlist_entries_history`` bounded.
+
+    On PostgreSQL the table is range-partitioned by month on ``added_at``
+    (migration ``0006``). ``maintain`` creates the partitions for the coming
+    ``HISTORY_PARTITION_MONTHS_AHEAD`` months, so inserts never land in the
+    default partition, and folds every partition that ended before the
+    retention cutoff into ``track_usage_summary`` before dropping it, in one
+    transaction. Expired rows that still reached the default partition are
+    folded and deleted the same way. Cooldown lookups filter on ``added_at``
+    and only touch the newest partitions. On an unpartitioned table (SQLite
+    in development) the cutoff is applied to the whole table with the same
+    ``INSERT ... SELECT ... GROUP BY`` upsert and a ``DELETE``, so no history
+    rows are loaded into Python.
+
+    Packed ``playlist_history_batches`` rows can only be unpacked in Python.
+    They are compacted ``COMPACT_BATCH_CHUNK`` at a time, each chunk merged
+    and deleted in its own commit, so memory stays bounded and an
+    interrupted run never counts a batch twice.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+
+    def cutoff(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Rows added before this are compacted; ``None`` when retention is disabled."""
+        if self.settings.history_retention_days <= 0:
+            return None
+        # The sampler still needs the cooldown window, whatever the retention says.
+        days = max(self.settings.history_retention_days, self.settings.cooldown_days + 1)
+        return (now or datetime.utcnow()) - timedelta(days=days)
+
+    def maintain(self, db: Session, now: Optional[datetime] = None) -> Dict[str, object]:
+        now = now or datetime.utcnow()
+        cutoff = self.cutoff(now)
+        compacted_batches = self._compact_batches(db, cutoff)
+        if not self._is_partitioned(db):
+            return {
+                "partitioned": False,
+                "compacted_rows": self._compact_rows(db, cutoff, HISTORY_TABLE),
+                "compacted_batches": compacted_batches,
+            }
+        created = self.ensure_partitions(db, now.date())
+        dropped = self.drop_expired(db, cutoff)
+        return {
+            "partitioned": True,
+            "created": created,
+            "dropped": dropped,
+            "compacted_rows": self._compact_rows(db, cutoff, f"{HISTORY_TABLE}_default"),
+            "compacted_batches": compacted_batches,
+        }
+
+    def ensure_partitions(self, db: Session, today: date) -> List[str]:
+        existing = {name for name, _ in self._partitions(db)}
+        month = month_start(today)
+        created: List[str] = []
+        for _ in range(max(self.settings.history_partition_months_ahead, 0) + 1):
+            name = partition_name(month)
+            if name not in existing:
+                self._create_partition(db, month)
+                created.append(name)
+            month = next_month(month)
+        return created
+
+    def drop_expired(self, db: Session, cutoff: Optional[datetime]) -> List[str]:
+        if cutoff is None:
+            return []
+        dropped: List[str] = []
+        for name, month in sorted(self._partitions(db), key=lambda item: item[1]):
+            if datetime.combine(next_month(month), datetime.min.time()) > cutoff:
+                break
+            # Summary, detach and drop commit together, so a partition is never counted twice.
+            # Every row of the partition is older than its upper bound, so the cutoff filter keeps them all.
+            db.execute(upsert_summary(db, name), {"cutoff": cutoff})
+            db.execute(text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            dropped.append(name)
+            logger.info("Compacted history partition %s into %s", name, TrackUsageSummary.__tablename__)
+        return dropped
+
+    @staticmethod
+    def _create_partition(db: Session, month: date) -> None:
+        # Built detached and then attached, so rows that reached the default
+        # partition for this month move over instead of blocking the attach.
+        name = partition_name(month)
+        lower, upper = month.isoformat(), next_month(month).isoformat()
+        db.execute(text(f"CREATE TABLE {name} (LIKE {HISTORY_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        db.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {HISTORY_TABLE}_default "
+                f"WHERE added_at >= '{lower}' AND added_at < '{upper}' RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            )
+        )
+        db.execute(
+            text(f"ALTER TABLE {HISTORY_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+        )
+        db.commit()
+
+    @staticmethod
+    def _is_partitioned(db: Session) -> bool:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        return bool(
+            db.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {"name": HISTORY_TABLE},
+            ).first()
+        )
+
+    @staticmethod
+    def _partitions(db: Session) -> List[Tuple[str, date]]:
+        names = db.scalars(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :name"
+            ),
+            {"name": HISTORY_TABLE},
+        )
+        partitions: List[Tuple[str, date]] = []
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match:
+                partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+        return partitions
+
+    @staticmethod
+    def _compact_rows(db: Session, cutoff: Optional[datetime], source: str) -> int:
+        """Fold and delete the rows of ``source`` older than ``cutoff`` in one transaction."""
+        if cutoff is None:
+            return 0
+        db.execute(upsert_summary(db, source), {"cutoff": cutoff})
+        removed = db.execute(
+            text(f"DELETE FROM {source} WHERE added_at < :cutoff").bindparams(bindparam("cutoff", type_=DateTime)),
+            {"cutoff": cutoff},
+        ).rowcount
+        db.commit()
+        return removed
+
+    @classmethod
+    def _compact_batches(cls, db: Session, cutoff: Optional[datetime]) -> int:
+        """Fold packed batches older than ``cutoff`` into the summary; they are unpacked here, not in SQL."""
+        if cutoff is None:
+            return 0
+        compacted = 0
+        while True:
+            # Each chunk is deleted in the commit that merges it, so the next query starts past it.
+            chunk = db.execute(
+                select(PlaylistHistoryBatch.id, PlaylistHistoryBatch.added_at, PlaylistHistoryBatch.track_ids)
+                .where(PlaylistHistoryBatch.added_at < cutoff)
+                .limit(COMPACT_BATCH_CHUNK)
+            ).all()
+            if not chunk:
+                return compacted
+            usage: Dict[UUID, List] = {}
+            for _, added_at, packed in chunk:
+                for track_id in unpack_track_ids(packed):
+                    entry = usage.get(track_id)
+                    if entry is None:
+                        usage[track_id] = [1, added_at, added_at]
+                    else:
+                        entry[0] += 1
+                        entry[1] = min(entry[1], added_at)
+                        entry[2] = max(entry[2], added_at)
+            cls._merge_usage(db, usage)
+            db.execute(
+                delete(PlaylistHistoryBatch.__table__).where(PlaylistHistoryBatch.id.in_([row[0] for row in chunk]))
+            )
+            db.commit()
+            compacted += len(chunk)
+
+    @staticmethod
+    def _merge_usage(db: Session, usage: Dict[UUID, Sequence]) -> None:
+        """Add ``{track_id: (placements, first_added_at, last_added_at)}`` to the summaries of those tracks only."""
+        track_ids = list(usage)
+        summaries: Dict[UUID, TrackUsageSummary] = {}
+        for offset in range(0, len(track_ids), DELETE_CHUNK):
+            for summary in db.scalars(
+                select(TrackUsageSummary).where(
+                    TrackUsageSummary.track_id.in_(track_ids[offset : offset + DELETE_CHUNK])
+                )
+            ):
+                summaries[summary.track_id] = summary
+        for track_id, (placements, first_added_at, last_added_at) in usage.items():
+            summary = summaries.get(track_id)
+            if summary is None:
+                db.add(
+                    TrackUsageSummary(
+                        track_id=track_id,
+                        placements=placements,
+                        first_added_at=first_added_at,
+                        last_added_at=last_added_at,
+                    )
+                )
+                continue
+            summary.placements += placements
+            summary.first_added_at = min(summary.first_added_at, first_added_at)
+            summary.last_added_at = max(summary.last_added_at, last_added_at)
+
+
+history_retention = HistoryRetentionService()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, List, Sequence, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.models import PlaylistEntryHistory, PlaylistHistoryBatch
+
+HISTORY_COLUMNS = ("id", "playlist_id", "track_id", "added_at", "batch_tag")
+WRITE_MODES = ("executemany", "copy", "packed")
+
+HistoryBatch = Tuple[UUID, Sequence[UUID]]
+
+
+def pack_track_ids(track_ids: Sequence[UUID]) -> bytes:
+    return b"".join(track_id.bytes for track_id in track_ids)
+
+
+def unpack_track_ids(packed: bytes) -> List[UUID]:
+    return [UUID(bytes=bytes(packed[offset : offset + 16])) for offset in range(0, len(packed), 16)]
+
+
+class HistoryWriter:
+    """Writes ``playlist_entries_history`` rows without building ORM objects.
+
+    ``write`` takes ``(playlist_id, track_ids)`` pairs and sends every row in
+    the caller's transaction, either as one Core ``insert`` executemany
+    (batched into multi-row ``VALUES`` by the psycopg2 dialect) or, with
+    ``HISTORY_WRITE_MODE=copy`` on PostgreSQL, as one ``COPY ... FROM STDIN``.
+    COPY needs psycopg2's ``copy_expert``; on other drivers (asyncpg API
+    sessions, SQLite) it falls back to executemany. ``HISTORY_WRITE_MODE=packed``
+    writes one ``playlist_history_batches`` row per playlist instead, its
+    track ids packed into one ``bytea``; readers query both tables, so the
+    mode can be switched at any time. Nothing is committed here, so callers
+    decide how many playlists share one commit.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+
+    def write(
+        self,
+        db: Session,
+        batches: Iterable[HistoryBatch],
+        added_at: datetime,
+        batch_tag: str,
+        mode: str | None = None,
+    ) -> int:
+        """Write the batches and return the number of track placements recorded."""
+        mode = mode or self.settings.history_write_mode
+        if mode == "packed":
+            return self._write_packed(db, batches, added_at, batch_tag)
+        rows = [
+            (uuid4(), playlist_id, track_id, added_at, batch_tag)
+            for playlist_id, track_ids in batches
+            for track_id in track_ids
+        ]
+        if not rows:
+            return 0
+        if mode == "copy" and db.get_bind().dialect.driver == "psycopg2":
+            self._copy(db, rows)
+        else:
+            db.execute(insert(PlaylistEntryHistory.__table__), [dict(zip(HISTORY_COLUMNS, row)) for row in rows])
+        return len(rows)
+
+    @staticmethod
+    def _write_packed(db: Session, batches: Iterable[HistoryBatch], added_at: datetime, batch_tag: str) -> int:
+        rows = [
+            {
+                "id": uuid4(),
+                "playlist_id": playlist_id,
+                "added_at": added_at,
+                "batch_tag": batch_tag,
+                "track_count": len(track_ids),
+                "track_ids": pack_track_ids(track_ids),
+            }
+            for playlist_id, track_ids in batches
+            if track_ids
+        ]
+        if rows:
+            db.execute(insert(PlaylistHistoryBatch.__table__), rows)
+        return sum(row["track_count"] for row in rows)
+
+    @staticmethod
+    def _copy(db: Session, rows: List[tuple]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row_id, playlist_id, track_id, added_at, batch_tag in rows:
+            writer.writerow((row_id, playlist_id, track_id, added_at.isoformat(sep=" "), batch_tag))
+        buffer.seek(0)
+        # The session's own DBAPI connection, so COPY joins the open transaction.
+        cursor = db.connection().connection.cursor()
+        columns = ", ".join(HISTORY_COLUMNS)
+        try:
+            cursor.copy_expert(
+                f"COPY {PlaylistEntryHistory.__tablename__} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
+
+
+history_writer = HistoryWriter()
@@ -1,61 +1,160 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import Select, and_, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api.v1.schemas.metrics import MetricOverview, MetricsHistoryPoint
-from app.db.models import MetricSnapshot, Playlist, PlaylistEntryHistory, SpotifyAccount, Track
-from app.utils.time_utils import utc_now
+from app.core.config import get_settings
+from app.db.models import (
+    MetricRollup,
+    MetricSnapshot,
+    Playlist,
+    PlaylistEntryHistory,
+    PlaylistHistoryBatch,
+    SpotifyAccount,
+    Track,
+)
+from app.utils.time_utils import bucket_start, utc_now
+
+ROLLUP_GRANULARITIES = ("hour", "day", "week")
 
 
 class MetricsService:
-    def get_overview(self, db: Session) -> MetricOverview:
-        accounts = db.query(func.count(SpotifyAccount.id)).scalar() or 0
-        playlists = db.query(func.count(Playlist.id)).scalar() or 0
-        tracks = db.query(func.count(Track.id)).scalar() or 0
-        today = utc_now().date()
+    """Dashboard counts, and the snapshots and rollups behind the history chart.
+
+    ``record_snapshot`` (the hourly ``metrics_snapshot`` task) stores one
+    ``metric_snapshots`` row and folds it into its hour, day and week
+    ``metric_rollups`` buckets in the same commit: counts keep the latest
+    sample, ``reshuffles_last_24h`` the bucket's peak. ``/metrics/history``
+    reads a window of one granularity through the unique
+    ``(granularity, bucket_start)`` index, so the chart costs the same
+    whatever ``METRIC_SNAPSHOT_RETENTION_DAYS`` keeps of the raw rows.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+
+    @staticmethod
+    def _overview_query() -> Select:
+        # One round trip: every figure is a scalar subquery of the same SELECT.
+        today = datetime.combine(utc_now().date(), datetime.min.time())
         tomorrow = today + timedelta(days=1)
-        reshuffles_today = (
-            db.query(func.count(PlaylistEntryHistory.id))
-            .filter(PlaylistEntryHistory.added_at >= datetime.combine(today, datetime.min.time()))
-            .filter(PlaylistEntryHistory.added_at < datetime.combine(tomorrow, datetime.min.time()))
-            .scalar()
-            or 0
-        )
-        next_reshuffle = (
-            db.query(func.min(Playlist.next_reshuffle_at))
-            .filter(Playlist.next_reshuffle_at.isnot(None))
-            .scalar()
+        return select(
+            select(func.count(SpotifyAccount.id)).scalar_subquery(),
+            select(func.count(Playlist.id)).scalar_subquery(),
+            select(func.count(Track.id)).scalar_subquery(),
+            select(func.count(PlaylistEntryHistory.id))
+            .where(PlaylistEntryHistory.added_at >= today, PlaylistEntryHistory.added_at < tomorrow)
+            .scalar_subquery(),
+            select(func.sum(PlaylistHistoryBatch.track_count))
+            .where(PlaylistHistoryBatch.added_at >= today, PlaylistHistoryBatch.added_at < tomorrow)
+            .scalar_subquery(),
+            select(func.min(Playlist.next_reshuffle_at))
+            .where(Playlist.next_reshuffle_at.isnot(None))
+            .scalar_subquery(),
         )
+
+    @staticmethod
+    def _overview(row) -> MetricOverview:
+        accounts, playlists, tracks, placed_rows, placed_packed, next_reshuffle = row
+        reshuffles_today = (placed_rows or 0) + (placed_packed or 0)
         health = "stable" if reshuffles_today >= 0 else "unknown"
         return MetricOverview(
-            accounts=accounts,
-            playlists=playlists,
-            tracks=tracks,
+            accounts=accounts or 0,
+            playlists=playlists or 0,
+            tracks=tracks or 0,
             reshuffles_scheduled_today=reshuffles_today,
             next_reshuffle_at=next_reshuffle,
             system_health=health,
         )
 
-    def get_history(self, db: Session, days: int = 7) -> List[MetricsHistoryPoint]:
-        cutoff = utc_now() - timedelta(days=days)
-        snapshots = (
-            db.query(MetricSnapshot)
-            .filter(MetricSnapshot.created_at >= cutoff)
-            .order_by(MetricSnapshot.created_at.asc())
-            .all()
+    @staticmethod
+    def _history_query(days: int, granularity: str) -> Select:
+        cutoff = bucket_start(datetime.utcnow() - timedelta(days=days), granularity)
+        return (
+            select(MetricRollup.bucket_start, MetricRollup.playlists_count, MetricRollup.reshuffles_last_24h)
+            .where(MetricRollup.granularity == granularity, MetricRollup.bucket_start >= cutoff)
+            .order_by(MetricRollup.bucket_start.asc())
         )
+
+    @staticmethod
+    def _history(rows) -> List[MetricsHistoryPoint]:
         return [
-            MetricsHistoryPoint(
-                timestamp=snapshot.created_at,
-                playlists=snapshot.playlists_count,
-                reshuffles=snapshot.reshuffles_last_24h,
-            )
-            for snapshot in snapshots
+            MetricsHistoryPoint(timestamp=created_at, playlists=playlists, reshuffles=reshuffles)
+            for created_at, playlists, reshuffles in rows
         ]
 
+    def get_overview(self, db: Session) -> MetricOverview:
+        return self._overview(db.execute(self._overview_query()).one())
+
+    async def get_overview_async(self, db: AsyncSession) -> MetricOverview:
+        return self._overview((await db.execute(self._overview_query())).one())
+
+    def get_history(self, db: Session, days: int = 7, granularity: str = "hour") -> List[MetricsHistoryPoint]:
+        return self._history(db.execute(self._history_query(days, granularity)))
+
+    async def get_history_async(
+        self, db: AsyncSession, days: int = 7, granularity: str = "hour"
+    ) -> List[MetricsHistoryPoint]:
+        return self._history(await db.execute(self._history_query(days, granularity)))
+
+    def record_snapshot(self, db: Session, now: Optional[datetime] = None) -> MetricSnapshot:
+        now = now or datetime.utcnow()
+        overview = self.get_overview(db)
+        reshuffled, average_size = db.execute(
+            select(
+                select(func.count(Playlist.id))
+                .where(Playlist.last_reshuffled_at >= now - timedelta(hours=24))
+                .scalar_subquery(),
+                select(func.avg(Playlist.size)).scalar_subquery(),
+            )
+        ).one()
+        snapshot = MetricSnapshot(
+            created_at=now,
+            accounts_count=overview.accounts,
+            playlists_count=overview.playlists,
+            tracks_count=overview.tracks,
+            reshuffles_last_24h=reshuffled or 0,
+            avg_tracks_per_playlist=int(round(average_size or 0)),
+        )
+        db.add(snapshot)
+        self._roll_up(db, snapshot)
+        if self.settings.metric_snapshot_retention_days > 0:
+            cutoff = now - timedelta(days=self.settings.metric_snapshot_retention_days)
+            db.execute(delete(MetricSnapshot.__table__).where(MetricSnapshot.created_at < cutoff))
+        db.commit()
+        return snapshot
+
+    @staticmethod
+    def _roll_up(db: Session, snapshot: MetricSnapshot) -> None:
+        buckets = {granularity: bucket_start(snapshot.created_at, granularity) for granularity in ROLLUP_GRANULARITIES}
+        existing = {
+            rollup.granularity: rollup
+            for rollup in db.scalars(
+                select(MetricRollup).where(
+                    or_(
+                        *(
+                            and_(MetricRollup.granularity == granularity, MetricRollup.bucket_start == start)
+                            for granularity, start in buckets.items()
+                        )
+                    )
+                )
+            )
+        }
+        for granularity, start in buckets.items():
+            rollup = existing.get(granularity)
+            if rollup is None:
+                rollup = MetricRollup(granularity=granularity, bucket_start=start, samples=0, reshuffles_last_24h=0)
+                db.add(rollup)
+            rollup.samples += 1
+            rollup.accounts_count = snapshot.accounts_count
+            rollup.playlists_count = snapshot.playlists_count
+            rollup.tracks_count = snapshot.tracks_count
+            rollup.reshuffles_last_24h = max(rollup.reshuffles_last_24h, snapshot.reshuffles_last_24h)
+
 
 metrics_service = MetricsService()
@@ -1,23 +1,43 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from uuid import UUID, uuid4
 
+import httpx
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.db.models import Playlist, PlaylistEntryHistory, SpotifyAccount
+from app.db.models import Playlist, PlaylistSyncOutbox, SpotifyAccount
+from app.db.session import DbSession, run_sync
+from app.services.catalog_service import CatalogTrack, catalog_service
+from app.services.cooldown_index import cooldown_index
+from app.services.history_writer import HistoryBatch, history_writer
 from app.services.sampler_service import sampler_service
 from app.services.spotify_service import spotify_service
+from app.services.token_service import SpotifyRefreshError, token_service
 from app.utils.naming_utils import build_playlist_name, pick_description, sanitize_prefix
+from app.utils.playlist_diff import align_to_previous, full_replace_requests, plan_sync
 from app.utils.time_utils import add_days, utc_now
 
+logger = logging.getLogger(__name__)
+
 
 class PlaylistCapacityError(Exception):
     pass
 
 
+class PlaylistCreateFailure(NamedTuple):
+    """A playlist the pipelined create could not finish; ``playlist_id`` is set when it exists on Spotify."""
+
+    name: str
+    playlist_id: Optional[UUID]
+    error: str
+
+
 class PlaylistService:
     def __init__(self) -> None:
         self.settings = get_settings()
@@ -34,9 +54,72 @@ class PlaylistService:
         )
         return existing or 0
 
+    @staticmethod
+    def _commit_history(db: Session, batches: Iterable[HistoryBatch], added_at: datetime, batch_tag: str) -> None:
+        # Playlists must be flushed before their history rows reference them.
+        db.flush()
+        history_writer.write(db, batches, added_at, batch_tag)
+        db.commit()
+
+    @staticmethod
+    def _remember_history(playlist: Playlist, tracks: List[CatalogTrack], added_at: datetime) -> None:
+        catalog = catalog_service.current()
+        if catalog is not None:
+            cooldown_index.record(catalog, playlist.id, [track.id for track in tracks], added_at)
+
+    async def _push_tracks(
+        self,
+        account: SpotifyAccount,
+        playlist: Playlist,
+        track_uris: List[str],
+        description: Optional[str] = None,
+    ) -> None:
+        """Bring the Spotify playlist to ``track_uris`` and remember what was pushed.
+
+        When the playlist was last synced by us, the remote ``snapshot_id``
+        still matches and a diff takes fewer calls than a full replace, only
+        the removed, reordered and added items are sent; the playlist ends up
+        in exactly the sampled order. With ``PLAYLIST_DIFF_KEEP_ORDER`` the
+        kept tracks instead hold their previous relative order with the new
+        ones appended, which needs no reorders. Any other case, or a failed
+        diff, falls back to replacing every item.
+        """
+        token, remote_id = account.access_token, playlist.spotify_playlist_id
+        previous = playlist.synced_track_uris if playlist.snapshot_id else None
+        plan = None
+        if previous is not None and self.settings.playlist_diff_sync:
+            if self.settings.playlist_diff_keep_order:
+                track_uris = align_to_previous(previous, track_uris)
+            plan = plan_sync(previous, track_uris)
+            # One extra GET checks the remote snapshot before the diff is trusted.
+            if plan is not None and plan.requests + 1 >= full_replace_requests(len(track_uris)):
+                plan = None
+            if plan is not None:
+                remote_snapshot = await spotify_service.get_playlist_snapshot(token, remote_id)
+                if remote_snapshot != playlist.snapshot_id:
+                    logger.info("Playlist %s changed on Spotify; replacing all items", playlist.id)
+                    plan = None
+
+        if description is not None:
+            await spotify_service.update_playlist_details(token, remote_id, playlist.name, description)
+
+        snapshot_id = None
+        if plan is not None:
+            try:
+                snapshot_id = await spotify_service.apply_playlist_plan(token, remote_id, plan)
+            except httpx.HTTPStatusError as exc:
+                logger.warning("Diff sync of playlist %s failed (%s); replacing all items", playlist.id, exc)
+                plan = None
+        if plan is None:
+            if not track_uris:
+                return
+            snapshot_id = await spotify_service.replace_playlist_items(token, remote_id, track_uris)
+        playlist.snapshot_id = snapshot_id
+        playlist.synced_track_uris = list(track_uris)
+
     async def create_playlists(
         self,
-        db: Session,
+        db: DbSession,
         account: SpotifyAccount,
         count: int,
         prefix: str | None,
@@ -44,96 +127,410 @@ class PlaylistService:
         interval_days: int,
         cooldown_days: int,
         artist_cap: int,
+        vibe: Optional[Dict[str, Any]] = None,
+        minimize_overlap: bool = False,
     ) -> List[Playlist]:
         self._ensure_capacity(account, count)
+        await token_service.ensure_fresh(db, account)
         effective_prefix = sanitize_prefix(prefix or account.prefix or self.settings.default_prefix)
         created: List[Playlist] = []
-        start_index = self._next_index(db, account)
+        selections: List[List[CatalogTrack]] = []
+        start_index = await run_sync(db, self._next_index, account)
         now = utc_now()
+        pending: List[Tuple[Playlist, str]] = []
         for idx in range(count):
             display_index = start_index + idx + 1
-            name = build_playlist_name(effective_prefix, display_index)
-            description = pick_description(display_index)
             playlist = Playlist(
-                name=name,
+                name=build_playlist_name(effective_prefix, display_index),
                 prefix=effective_prefix,
                 account_id=account.id,
                 size=size,
                 last_reshuffled_at=now,
                 next_reshuffle_at=add_days(now, interval_days),
+                vibe=vibe,
             )
             db.add(playlist)
-            db.flush()
+            pending.append((playlist, pick_description(display_index)))
+        await run_sync(db, Session.flush)
 
-            tracks = sampler_service.select_tracks(db, playlist, size, cooldown_days, artist_cap)
+        dealt: Dict[UUID, List[CatalogTrack]] = {}
+        if minimize_overlap:
+            dealt = await sampler_service.select_tracks_many_async(
+                db,
+                [playlist for playlist, _ in pending],
+                size,
+                cooldown_days,
+                artist_cap,
+                minimize_overlap=True,
+            )
+        for playlist, description in pending:
+            if minimize_overlap:
+                tracks = dealt[playlist.id]
+            else:
+                tracks = await sampler_service.select_tracks_async(db, playlist, size, cooldown_days, artist_cap)
             track_uris = [f"spotify:track:{track.spotify_id}" for track in tracks]
             spotify_payload = await spotify_service.create_playlist(
-                account.access_token, account.spotify_user_id, name, description
+                account.access_token, account.spotify_user_id, playlist.name, description
             )
             playlist.spotify_playlist_id = spotify_payload.get("id")
             playlist.external_url = spotify_payload.get("external_urls", {}).get("spotify")
 
-            if playlist.spotify_playlist_id and track_uris:
-                await spotify_service.replace_playlist_items(
-                    account.access_token, playlist.spotify_playlist_id, track_uris
-                )
-
-            for track in tracks:
-                history = PlaylistEntryHistory(
-                    playlist_id=playlist.id,
-                    track_id=track.id,
-                    batch_tag=now.strftime("%Y-%m-%d"),
-                    added_at=datetime.utcnow(),
-                )
-                db.add(history)
+            if playlist.spotify_playlist_id:
+                await self._push_tracks(account, playlist, track_uris)
 
             created.append(playlist)
+            selections.append(tracks)
 
+        added_at = datetime.utcnow()
         account.playlists_count += len(created)
-        db.commit()
-        for playlist in created:
-            db.refresh(playlist)
+        await run_sync(
+            db,
+            self._commit_history,
+            [(playlist.id, [track.id for track in tracks]) for playlist, tracks in zip(created, selections)],
+            added_at,
+            now.strftime("%Y-%m-%d"),
+        )
+        for playlist, tracks in zip(created, selections):
+            self._remember_history(playlist, tracks, added_at)
         return created
 
+    async def create_playlists_pipelined(
+        self,
+        db: DbSession,
+        account: SpotifyAccount,
+        count: int,
+        prefix: str | None,
+        size: int,
+        interval_days: int,
+        cooldown_days: int,
+        artist_cap: int,
+        vibe: Optional[Dict[str, Any]] = None,
+        minimize_overlap: bool = False,
+    ) -> Tuple[List[Playlist], List[PlaylistCreateFailure]]:
+        """Create ``count`` playlists with their Spotify calls overlapped.
+
+        Every playlist is sampled up front in one ``select_tracks_many`` pass,
+        then each runs create + fill on Spotify, ``PLAYLIST_CREATE_CONCURRENCY``
+        at a time. Rows and history for all of them are written in one commit
+        at the end. A playlist whose create fails is left out and reported; one
+        that was created but could not be filled is kept (it exists on Spotify,
+        a reshuffle fills it) and reported too. Any error a task raises is
+        turned into such a report, so playlists the other tasks already
+        created on Spotify are always recorded.
+        """
+        self._ensure_capacity(account, count)
+        await token_service.ensure_fresh(db, account)
+        effective_prefix = sanitize_prefix(prefix or account.prefix or self.settings.default_prefix)
+        start_index = await run_sync(db, self._next_index, account)
+        now = utc_now()
+        pending: List[Tuple[Playlist, str]] = []
+        for idx in range(count):
+            display_index = start_index + idx + 1
+            playlist = Playlist(
+                id=uuid4(),
+                name=build_playlist_name(effective_prefix, display_index),
+                prefix=effective_prefix,
+                account_id=account.id,
+                size=size,
+                last_reshuffled_at=now,
+                next_reshuffle_at=add_days(now, interval_days),
+                vibe=vibe,
+            )
+            pending.append((playlist, pick_description(display_index)))
+        selections = await sampler_service.select_tracks_many_async(
+            db,
+            [playlist for playlist, _ in pending],
+            size,
+            cooldown_days,
+            artist_cap,
+            minimize_overlap=minimize_overlap,
+        )
+
+        limit = asyncio.Semaphore(max(self.settings.playlist_create_concurrency, 1))
+
+        async def build(playlist: Playlist, description: str) -> Optional[PlaylistCreateFailure]:
+            async with limit:
+                try:
+                    spotify_payload = await spotify_service.create_playlist(
+                        account.access_token, account.spotify_user_id, playlist.name, description
+                    )
+                except Exception as exc:
+                    logger.warning(
+                        "Creating playlist %s on Spotify failed: %s",
+                        playlist.name,
+                        exc,
+                        exc_info=not isinstance(exc, httpx.HTTPError),
+                    )
+                    return PlaylistCreateFailure(playlist.name, None, str(exc))
+                playlist.spotify_playlist_id = spotify_payload.get("id")
+                playlist.external_url = spotify_payload.get("external_urls", {}).get("spotify")
+                if not playlist.spotify_playlist_id:
+                    return None
+                track_uris = [f"spotify:track:{track.spotify_id}" for track in selections[playlist.id]]
+                try:
+                    await self._push_tracks(account, playlist, track_uris)
+                except Exception as exc:
+                    logger.warning(
+                        "Filling playlist %s on Spotify failed: %s",
+                        playlist.id,
+                        exc,
+                        exc_info=not isinstance(exc, httpx.HTTPError),
+                    )
+                    return PlaylistCreateFailure(playlist.name, playlist.id, str(exc))
+                return None
+
+        outcomes = await asyncio.gather(
+            *(build(playlist, description) for playlist, description in pending), return_exceptions=True
+        )
+
+        created: List[Playlist] = []
+        failures: List[PlaylistCreateFailure] = []
+        filled: List[Playlist] = []
+        added_at = datetime.utcnow()
+        for (playlist, _), failure in zip(pending, outcomes):
+            if isinstance(failure, BaseException):
+                # Raised outside build's handlers (e.g. a cancelled task); keep it if Spotify has it.
+                created_remotely = playlist.spotify_playlist_id is not None
+                failure = PlaylistCreateFailure(
+                    playlist.name, playlist.id if created_remotely else None, repr(failure)
+                )
+            if failure is not None:
+                failures.append(failure)
+                if failure.playlist_id is None:
+                    continue
+            else:
+                filled.append(playlist)
+            db.add(playlist)
+            created.append(playlist)
+        account.playlists_count += len(created)
+        await run_sync(
+            db,
+            self._commit_history,
+            [(playlist.id, [track.id for track in selections[playlist.id]]) for playlist in filled],
+            added_at,
+            now.strftime("%Y-%m-%d"),
+        )
+        for playlist in filled:
+            self._remember_history(playlist, selections[playlist.id], added_at)
+        return created, failures
+
     async def reshuffle_playlist(
         self,
-        db: Session,
+        db: DbSession,
         playlist: Playlist,
         account: SpotifyAccount,
         size: int,
         cooldown_days: int,
         artist_cap: int,
         interval_days: int,
+        tracks: Optional[List[CatalogTrack]] = None,
     ) -> Playlist:
-        tracks = sampler_service.select_tracks(db, playlist, size, cooldown_days, artist_cap)
-        track_uris = [f"spotify:track:{track.spotify_id}" for track in tracks]
+        if tracks is None:
+            tracks = await sampler_service.select_tracks_async(db, playlist, size, cooldown_days, artist_cap)
+        await self._reshuffle_remote(db, playlist, account, tracks, interval_days)
+        await self._commit_reshuffles(db, [(playlist, tracks)])
+        await run_sync(db, Session.refresh, playlist)
+        return playlist
+
+    async def reshuffle_many(
+        self,
+        db: DbSession,
+        playlists: List[Playlist],
+        accounts: Dict[UUID, SpotifyAccount],
+        selections: Dict[UUID, List[CatalogTrack]],
+        interval_days: int,
+        checkpoint: Optional[Callable[[Session, List[UUID]], None]] = None,
+        on_error: Optional[Callable[[Playlist, Exception], bool]] = None,
+    ) -> List[UUID]:
+        """Reshuffle ``playlists`` with pre-sampled tracks, committing every ``HISTORY_COMMIT_PLAYLISTS``.
+
+        History for each group goes out in one ``history_writer`` call, so a
+        bulk run issues one insert and one commit per group instead of one
+        per playlist. Returns the ids in the order they were committed; if an
+        inline Spotify call fails, the group reshuffled so far is committed
+        before the error propagates. ``checkpoint(session, ids)`` runs inside
+        each group's transaction, so progress it records commits with that
+        group's history. When ``on_error(playlist, exc)`` returns true for a
+        failed playlist, it is left out and the rest carry on.
+        """
+        done: List[UUID] = []
+        group: List[Tuple[Playlist, List[CatalogTrack]]] = []
+        step = max(self.settings.history_commit_playlists, 1)
+        try:
+            for playlist in playlists:
+                tracks = selections[playlist.id]
+                try:
+                    await self._reshuffle_remote(db, playlist, accounts[playlist.account_id], tracks, interval_days)
+                except Exception as exc:
+                    if on_error is None or not on_error(playlist, exc):
+                        raise
+                    continue
+                group.append((playlist, tracks))
+                if len(group) >= step:
+                    done.extend(await self._commit_reshuffles(db, group, checkpoint))
+                    group = []
+        finally:
+            # Playlists already pushed to Spotify keep their history even if a later one fails.
+            if group:
+                done.extend(await self._commit_reshuffles(db, group, checkpoint))
+        return done
+
+    async def _reshuffle_remote(
+        self,
+        db: DbSession,
+        playlist: Playlist,
+        account: SpotifyAccount,
+        tracks: List[CatalogTrack],
+        interval_days: int,
+    ) -> None:
         if playlist.spotify_playlist_id:
-            if track_uris:
-                await spotify_service.replace_playlist_items(
-                    account.access_token, playlist.spotify_playlist_id, track_uris
-                )
-            await spotify_service.update_playlist_details(
-                account.access_token,
-                playlist.spotify_playlist_id,
-                playlist.name,
-                pick_description(utc_now().day),
-            )
+            track_uris = [f"spotify:track:{track.spotify_id}" for track in tracks]
+            description = pick_description(utc_now().day)
+            if self.settings.playlist_sync_outbox:
+                # Committed with the history rows; drain_outbox pushes it.
+                db.add(PlaylistSyncOutbox(playlist_id=playlist.id, track_uris=track_uris, description=description))
+            else:
+                await token_service.ensure_fresh(db, account)
+                await self._push_tracks(account, playlist, track_uris, description)
         now = utc_now()
         playlist.last_reshuffled_at = now
         playlist.next_reshuffle_at = add_days(now, interval_days)
-        for track in tracks:
-            db.add(
-                PlaylistEntryHistory(
-                    playlist_id=playlist.id,
-                    track_id=track.id,
-                    batch_tag=now.strftime("%Y-%m-%d"),
-                    added_at=datetime.utcnow(),
-                )
-            )
         db.add(playlist)
+
+    async def _commit_reshuffles(
+        self,
+        db: DbSession,
+        group: List[Tuple[Playlist, List[CatalogTrack]]],
+        checkpoint: Optional[Callable[[Session, List[UUID]], None]] = None,
+    ) -> List[UUID]:
+        added_at = datetime.utcnow()
+        ids = [playlist.id for playlist, _ in group]
+        if checkpoint is not None:
+            await run_sync(db, checkpoint, ids)
+        await run_sync(
+            db,
+            self._commit_history,
+            [(playlist.id, [track.id for track in tracks]) for playlist, tracks in group],
+            added_at,
+            utc_now().strftime("%Y-%m-%d"),
+        )
+        for playlist, tracks in group:
+            self._remember_history(playlist, tracks, added_at)
+        return ids
+
+    async def drain_outbox(self, db: Session) -> Dict[str, int]:
+        """Push queued reshuffles to Spotify, only the newest track list per playlist.
+
+        Up to ``PLAYLIST_OUTBOX_BATCH`` due rows are claimed by moving their
+        ``next_attempt_at`` one lease ahead and committing, so overlapping
+        drains skip them and a crashed drain's rows come back after the lease.
+        Rows of one playlist collapse into the newest; a playlist that already
+        has a newer row still below the attempt limit is skipped, that row
+        supersedes it. A parked newer row never supersedes, since it will not
+        be pushed. Rows whose playlist or account is gone, or whose playlist
+        has no Spotify id, are dropped and counted as ``skipped``. Pushes run
+        ``PLAYLIST_OUTBOX_CONCURRENCY`` at a time. A push that
+        fails keeps its newest row with exponential backoff until
+        ``PLAYLIST_OUTBOX_MAX_ATTEMPTS``, after which it stays parked with its
+        ``last_error`` for an operator.
+        """
+        claimed = self._claim_outbox(db)
+        latest: Dict[UUID, PlaylistSyncOutbox] = {}
+        for row in claimed:
+            latest[row.playlist_id] = row
+        if not latest:
+            return {"claimed": 0, "pushed": 0, "superseded": 0, "skipped": 0, "failed": 0}
+
+        newest = dict(
+            db.query(PlaylistSyncOutbox.playlist_id, func.max(PlaylistSyncOutbox.created_at))
+            .filter(
+                PlaylistSyncOutbox.playlist_id.in_(latest),
+                PlaylistSyncOutbox.attempts < self.settings.playlist_outbox_max_attempts,
+            )
+            .group_by(PlaylistSyncOutbox.playlist_id)
+            .all()
+        )
+        superseded = {
+            playlist_id for playlist_id, row in latest.items() if newest.get(playlist_id, row.created_at) > row.created_at
+        }
+        playlists = {
+            playlist.id: playlist
+            for playlist in db.query(Playlist).filter(Playlist.id.in_(set(latest) - superseded)).all()
+        }
+        accounts = {
+            account.id: account
+            for account in db.query(SpotifyAccount).filter(
+                SpotifyAccount.id.in_({playlist.account_id for playlist in playlists.values()})
+            )
+        }
+        limit = asyncio.Semaphore(max(self.settings.playlist_outbox_concurrency, 1))
+
+        due: List[PlaylistSyncOutbox] = []
+        skipped = 0
+        for playlist_id, row in latest.items():
+            if playlist_id in superseded:
+                continue
+            playlist = playlists.get(playlist_id)
+            if playlist is None or playlist.account_id not in accounts or not playlist.spotify_playlist_id:
+                # Nothing on Spotify to update; the row is deleted below.
+                skipped += 1
+                continue
+            due.append(row)
+
+        async def push(row: PlaylistSyncOutbox) -> Optional[str]:
+            playlist = playlists[row.playlist_id]
+            account = accounts[playlist.account_id]
+            async with limit:
+                try:
+                    await token_service.ensure_fresh(db, account)
+                    await self._push_tracks(account, playlist, row.track_uris, row.description)
+                except (httpx.HTTPError, SpotifyRefreshError) as exc:
+                    logger.warning("Outbox push of playlist %s failed: %s", playlist.id, exc)
+                    return str(exc)
+            return None
+
+        errors = dict(zip((row.id for row in due), await asyncio.gather(*(push(row) for row in due))))
+
+        now = datetime.utcnow()
+        failed = 0
+        for row in claimed:
+            error = errors.get(row.id)
+            if error is None:
+                db.delete(row)
+                continue
+            failed += 1
+            row.attempts += 1
+            row.last_error = error
+            row.next_attempt_at = now + timedelta(
+                seconds=self.settings.playlist_outbox_retry_seconds * 2 ** (row.attempts - 1)
+            )
         db.commit()
-        db.refresh(playlist)
-        return playlist
+        return {
+            "claimed": len(claimed),
+            "pushed": len(due) - failed,
+            "superseded": len(claimed) - len(due) - skipped,
+            "skipped": skipped,
+            "failed": failed,
+        }
+
+    def _claim_outbox(self, db: Session) -> List[PlaylistSyncOutbox]:
+        now = datetime.utcnow()
+        rows = (
+            db.query(PlaylistSyncOutbox)
+            .filter(
+                PlaylistSyncOutbox.next_attempt_at <= now,
+                PlaylistSyncOutbox.attempts < self.settings.playlist_outbox_max_attempts,
+            )
+            .order_by(PlaylistSyncOutbox.created_at)
+            .limit(max(self.settings.playlist_outbox_batch, 1))
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        lease = now + timedelta(seconds=self.settings.playlist_outbox_lease_seconds)
+        for row in rows:
+            row.next_attempt_at = lease
+        db.commit()
+        return rows
 
 
 playlist_service = PlaylistService()
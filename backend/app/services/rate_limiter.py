@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.utils.async_utils import close_on_loop
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "spotify:rl"
+REDIS_RETRY_SECONDS = 30.0
+
+# KEYS: block, scale, app bucket[, account bucket]
+# ARGV: app rate/s, app burst, [account rate/s, account burst,] additive increase
+# Returns 0 when a token was taken from every bucket, else milliseconds to wait.
+ACQUIRE_SCRIPT = """
+local blocked = redis.call('PTTL', KEYS[1])
+if blocked > 0 then return blocked end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local scale = tonumber(redis.call('GET', KEYS[2]) or '1')
+local buckets = #KEYS - 2
+local tokens = {}
+local rates = {}
+local wait = 0
+for i = 1, buckets do
+  local rate = tonumber(ARGV[2 * i - 1]) / 1000
+  local burst = tonumber(ARGV[2 * i])
+  if i == 1 then rate = rate * scale end
+  local state = redis.call('HMGET', KEYS[i + 2], 'tokens', 'ts')
+  local level = tonumber(state[1]) or burst
+  local ts = tonumber(state[2]) or now
+  level = math.min(burst, level + math.max(now - ts, 0) * rate)
+  tokens[i] = level
+  rates[i] = rate
+  if level < 1 then wait = math.max(wait, math.ceil((1 - level) / rate)) end
+end
+for i = 1, buckets do
+  local level = tokens[i]
+  if wait == 0 then level = level - 1 end
+  redis.call('HSET', KEYS[i + 2], 'tokens', level, 'ts', now)
+  redis.call('PEXPIRE', KEYS[i + 2], math.ceil(tonumber(ARGV[2 * i]) / rates[i]) + 1000)
+end
+if wait == 0 and scale < 1 then
+  local step = tonumber(ARGV[2 * buckets + 1])
+  redis.call('SET', KEYS[2], math.min(1, scale + step))
+end
+return wait
+"""
+
+# KEYS: block, scale; ARGV: block ms, min scale
+THROTTLE_SCRIPT = """
+local ms = tonumber(ARGV[1])
+if ms > redis.call('PTTL', KEYS[1]) then redis.call('SET', KEYS[1], 1, 'PX', ms) end
+local scale = tonumber(redis.call('GET', KEYS[2]) or '1')
+local lowered = math.max(tonumber(ARGV[2]), scale / 2)
+redis.call('SET', KEYS[2], lowered)
+return tostring(lowered)
+"""
+
+
+class RateLimiter:
+    """Spotify request admission shared across API and Celery processes.
+
+    Each request takes one token from an app-wide bucket and, when the caller
+    is acting for an account, from that account's bucket. Buckets live in
+    Redis and are updated by one Lua script, so every process draws from the
+    same budget. A 429 blocks all processes for ``Retry-After`` and halves the
+    app refill rate; each admitted request then adds back a small step (AIMD).
+    In-process concurrency follows the same rule: the window shrinks by half
+    on throttling and grows by ``1 / window`` per success.
+
+    If Redis is unreachable the limiter fails open to the in-process window
+    and ``Retry-After`` block until Redis answers again.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._redis: Optional[aioredis.Redis] = None
+        self._scripts: Dict[str, Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._in_flight = 0
+        self._window = float(self.settings.spotify_max_concurrency)
+        self._blocked_until = 0.0
+        self._redis_down_until = 0.0
+        self.stats = {"admitted": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    @asynccontextmanager
+    async def slot(self, account_key: Optional[str] = None) -> AsyncIterator[None]:
+        condition = self._bind()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < max(int(self._window), 1))
+            self._in_flight += 1
+        try:
+            await self._acquire(account_key)
+            self.stats["admitted"] += 1
+            yield
+        finally:
+            async with condition:
+                self._in_flight -= 1
+                condition.notify_all()
+
+    def record_success(self) -> None:
+        self._window = min(float(self.settings.spotify_max_concurrency), self._window + 1.0 / self._window)
+
+    async def record_throttle(self, retry_after: float) -> None:
+        self.stats["throttled"] += 1
+        self._window = max(float(self.settings.spotify_min_concurrency), self._window / 2)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        redis = self._client()
+        if redis is None:
+            return
+        try:
+            await self._scripts["throttle"](
+                keys=[f"{KEY_PREFIX}:block", f"{KEY_PREFIX}:scale"],
+                args=[max(int(retry_after * 1000), 1), self.settings.spotify_min_rate_scale],
+            )
+        except RedisError as exc:
+            self._redis_failed(exc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "waited_seconds": round(self.stats["waited_seconds"], 3),
+            "concurrency_window": round(self._window, 2),
+            "in_flight": self._in_flight,
+        }
+
+    async def aclose(self) -> None:
+        redis, loop = self._redis, self._loop
+        self._redis = None
+        if redis is not None and loop is asyncio.get_running_loop():
+            await redis.aclose()
+
+    async def _acquire(self, account_key: Optional[str]) -> None:
+        while True:
+            wait = self._blocked_until - time.monotonic()
+            if wait <= 0:
+                wait = await self._take_tokens(account_key)
+            if wait <= 0:
+                return
+            # Jitter keeps processes released by the same block from bursting together.
+            wait *= 1 + random.random() * 0.1
+            self.stats["waited_seconds"] += wait
+            await asyncio.sleep(wait)
+
+    async def _take_tokens(self, account_key: Optional[str]) -> float:
+        redis = self._client()
+        if redis is None:
+            return 0.0
+        keys: List[str] = [f"{KEY_PREFIX}:block", f"{KEY_PREFIX}:scale", f"{KEY_PREFIX}:app"]
+        args: List[Any] = [self.settings.spotify_app_rate_per_second, self.settings.spotify_app_burst]
+        if account_key:
+            keys.append(f"{KEY_PREFIX}:account:{account_key}")
+            args += [self.settings.spotify_account_rate_per_second, self.settings.spotify_account_burst]
+        args.append(self.settings.spotify_rate_increase_step)
+        try:
+            wait_ms = await self._scripts["acquire"](keys=keys, args=args)
+        except RedisError as exc:
+            self._redis_failed(exc)
+            return 0.0
+        return int(wait_ms) / 1000
+
+    def _bind(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop or self._pid != os.getpid():
+            if self._redis is not None and self._pid == os.getpid():
+                close_on_loop(self._loop, self._redis.aclose)
+            self._condition = asyncio.Condition()
+            self._in_flight = 0
+            self._redis = None
+            self._loop = loop
+            self._pid = os.getpid()
+        return self._condition
+
+    def _client(self) -> Optional[aioredis.Redis]:
+        if time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.Redis.from_url(
+                self.settings.redis_url, socket_timeout=1.0, socket_connect_timeout=1.0
+            )
+            self._scripts = {
+                "acquire": self._redis.register_script(ACQUIRE_SCRIPT),
+                "throttle": self._redis.register_script(THROTTLE_SCRIPT),
+            }
+        return self._redis
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning("Spotify rate limiter cannot reach Redis, limiting in-process only: %s", exc)
+        self._redis = None
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import UUID
+
+import httpx
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.api.v1.schemas.playlists import PlaylistBulkReshuffleRequest, ReshuffleJobRead
+from app.core.config import get_settings
+from app.db.models import Playlist, ReshuffleJob, ReshuffleJobItem, SpotifyAccount
+from app.db.session import SessionLocal
+from app.services.playlist_service import playlist_service
+from app.services.sampler_service import sampler_service
+from app.services.token_service import SpotifyRefreshError
+
+logger = logging.getLogger(__name__)
+
+# Client errors worth retrying: request timeout and rate limiting.
+TRANSIENT_CLIENT_STATUSES = frozenset({408, 429})
+
+
+class ReshuffleJobService:
+    """Bulk reshuffles run by the ``run_reshuffle_jobs`` worker instead of inside the request.
+
+    A job stores its target playlists as ``reshuffle_job_items`` when it is
+    enqueued. The worker takes pending items in chunks of whole accounts,
+    about ``HISTORY_COMMIT_PLAYLISTS`` playlists each, and marks them done in
+    the same commit that writes their history, so a job picked up again
+    after a crash skips every playlist already reshuffled.
+
+    A playlist Spotify refuses for good (a 4xx other than 408/429, e.g. it
+    was deleted) or whose account can no longer refresh its token is
+    recorded on its item with ``failed_at`` and ``error``, counted in the
+    job's ``failed`` and checkpointed past, so the rest of the job goes on.
+
+    While a job runs its heartbeat is refreshed every third of
+    ``RESHUFFLE_JOB_LEASE_SECONDS``. A run that raises anything else
+    (Spotify 5xx, network or database errors) puts the job back in the
+    queue with exponential backoff from ``RESHUFFLE_JOB_RETRY_SECONDS``;
+    after ``RESHUFFLE_JOB_MAX_ATTEMPTS`` failed runs without progress it is
+    marked ``failed``.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+
+    async def enqueue(self, db: AsyncSession, request: PlaylistBulkReshuffleRequest) -> ReshuffleJob:
+        query = select(Playlist.id, Playlist.account_id).join(SpotifyAccount, SpotifyAccount.id == Playlist.account_id)
+        if request.mode == "account":
+            query = query.where(Playlist.account_id == request.account_id)
+        elif request.mode == "selected":
+            query = query.where(Playlist.id.in_(request.playlist_ids or []))
+        targets = (await db.execute(query)).all()
+        job = ReshuffleJob(
+            mode=request.mode,
+            account_id=request.account_id,
+            seed=request.seed,
+            minimize_overlap=request.minimize_overlap,
+            total=len(targets),
+        )
+        db.add(job)
+        await db.flush()
+        if targets:
+            await db.execute(
+                insert(ReshuffleJobItem),
+                [{"job_id": job.id, "playlist_id": playlist_id, "account_id": account_id} for playlist_id, account_id in targets],
+            )
+        await db.commit()
+        return job
+
+    @staticmethod
+    def describe(job: ReshuffleJob, now: Optional[datetime] = None) -> ReshuffleJobRead:
+        now = now or datetime.utcnow()
+        rate = eta = None
+        if job.started_at is not None and job.completed:
+            elapsed = ((job.finished_at or job.heartbeat_at or now) - job.started_at).total_seconds()
+            if elapsed > 0:
+                rate = job.completed / elapsed
+                remaining = job.total - job.completed - (job.failed or 0)
+                eta = int(remaining / rate) if job.status != "completed" else 0
+        return ReshuffleJobRead(
+            id=job.id,
+            status=job.status,
+            mode=job.mode,
+            total=job.total,
+            completed=job.completed,
+            failed=job.failed or 0,
+            error=job.error,
+            attempts=job.attempts or 0,
+            next_attempt_at=job.next_attempt_at,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            playlists_per_minute=round(rate * 60, 2) if rate is not None else None,
+            eta_seconds=eta,
+        )
+
+    async def run_next(self, db: Session) -> Dict[str, Any]:
+        """Claim the oldest queued job, or a running one whose worker stopped heartbeating, and finish it."""
+        job = self._claim(db)
+        if job is None:
+            return {"status": "idle"}
+        job_id, progress_before = job.id, job.completed + job.failed
+        try:
+            async with self._heartbeat(job_id):
+                while True:
+                    chunk = self._pending(db, job_id)
+                    if not chunk:
+                        break
+                    await self._run_chunk(db, job, chunk)
+        except Exception as exc:
+            logger.exception("Reshuffle job %s failed", job_id)
+            db.rollback()
+            return self._retry_or_fail(db, job_id, progress_before, exc)
+        job.status = "completed"
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        return {"job_id": str(job_id), "status": "completed", "completed": job.completed, "failed": job.failed}
+
+    def _retry_or_fail(self, db: Session, job_id: UUID, progress_before: int, exc: Exception) -> Dict[str, Any]:
+        job = db.get(ReshuffleJob, job_id)
+        # A run that moved the job forward starts a fresh series of attempts.
+        attempts = 1 if job.completed + job.failed > progress_before else job.attempts + 1
+        now = datetime.utcnow()
+        job.attempts = attempts
+        job.error = str(exc)
+        if attempts >= self.settings.reshuffle_job_max_attempts:
+            job.status = "failed"
+            job.finished_at = now
+            job.next_attempt_at = None
+        else:
+            job.status = "queued"
+            job.next_attempt_at = now + timedelta(
+                seconds=self.settings.reshuffle_job_retry_seconds * 2 ** (attempts - 1)
+            )
+        db.commit()
+        return {"job_id": str(job_id), "status": job.status, "attempts": attempts}
+
+    @asynccontextmanager
+    async def _heartbeat(self, job_id: UUID) -> AsyncIterator[None]:
+        """Refresh ``heartbeat_at`` while the job runs, so a long chunk is not claimed a second time."""
+        interval = max(self.settings.reshuffle_job_lease_seconds / 3, 1.0)
+
+        async def beat() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    # Own connection on a thread: never joins the job's transaction or blocks the loop.
+                    await asyncio.to_thread(self._touch, job_id)
+                except SQLAlchemyError as exc:
+                    logger.warning("Heartbeat of reshuffle job %s failed: %s", job_id, exc)
+
+        task = asyncio.create_task(beat())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    @staticmethod
+    def _touch(job_id: UUID) -> None:
+        with SessionLocal() as own:
+            own.execute(
+                update(ReshuffleJob)
+                .where(ReshuffleJob.id == job_id, ReshuffleJob.status == "running")
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            own.commit()
+
+    async def _run_chunk(self, db: Session, job: ReshuffleJob, chunk: List[UUID]) -> None:
+        playlists = db.query(Playlist).filter(Playlist.id.in_(chunk)).all()
+        accounts = {
+            account.id: account
+            for account in db.query(SpotifyAccount).filter(
+                SpotifyAccount.id.in_({playlist.account_id for playlist in playlists})
+            )
+        }
+        playlists = [playlist for playlist in playlists if playlist.account_id in accounts]
+        # Playlists or accounts removed since the job was enqueued count as done.
+        gone = set(chunk) - {playlist.id for playlist in playlists}
+        if gone:
+            self._checkpoint(db, job.id, list(gone))
+            db.commit()
+        if not playlists:
+            return
+        selections = await sampler_service.select_tracks_many_async(
+            db,
+            playlists,
+            self.settings.playlist_size,
+            self.settings.cooldown_days,
+            self.settings.artist_cap,
+            seed=job.seed,
+            minimize_overlap=job.minimize_overlap,
+        )
+        failures: Dict[UUID, str] = {}
+
+        def skip(playlist: Playlist, exc: Exception) -> bool:
+            if not self._is_item_error(exc):
+                return False
+            logger.warning("Reshuffle job %s skips playlist %s: %s", job.id, playlist.id, exc)
+            failures[playlist.id] = str(exc)
+            return True
+
+        try:
+            await playlist_service.reshuffle_many(
+                db,
+                playlists,
+                accounts,
+                selections,
+                self.settings.reshuffle_interval_days,
+                checkpoint=lambda session, ids: self._checkpoint(session, job.id, ids),
+                on_error=skip,
+            )
+        finally:
+            # Recorded even when a later playlist hit a transient error, so a retry skips them.
+            if failures:
+                self._fail_items(db, job.id, failures)
+                db.commit()
+
+    @staticmethod
+    def _is_item_error(exc: Exception) -> bool:
+        """Whether ``exc`` only concerns one playlist, so retrying the job would not help."""
+        if isinstance(exc, SpotifyRefreshError):
+            return True
+        if isinstance(exc, httpx.HTTPStatusError):
+            status = exc.response.status_code
+            return 400 <= status < 500 and status not in TRANSIENT_CLIENT_STATUSES
+        return False
+
+    def _claim(self, db: Session) -> Optional[ReshuffleJob]:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.settings.reshuffle_job_lease_seconds)
+        job = (
+            db.query(ReshuffleJob)
+            .filter(
+                or_(
+                    and_(
+                        ReshuffleJob.status == "queued",
+                        or_(ReshuffleJob.next_attempt_at.is_(None), ReshuffleJob.next_attempt_at <= now),
+                    ),
+                    and_(ReshuffleJob.status == "running", ReshuffleJob.heartbeat_at < stale),
+                )
+            )
+            .order_by(ReshuffleJob.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == "running":
+            logger.info("Resuming reshuffle job %s at %s/%s", job.id, job.completed, job.total)
+        job.status = "running"
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        job.next_attempt_at = None
+        db.commit()
+        return job
+
+    def _pending(self, db: Session, job_id: UUID) -> List[UUID]:
+        """Pending playlists of the next whole accounts, up to ``HISTORY_COMMIT_PLAYLISTS`` of them.
+
+        An account is never split across chunks, so ``minimize_overlap`` deals
+        all of its playlists in one pass; an account above the limit makes a
+        chunk of its own.
+        """
+        limit = max(self.settings.history_commit_playlists, 1)
+        pending = (ReshuffleJobItem.job_id == job_id, ReshuffleJobItem.done_at.is_(None))
+        counts = db.execute(
+            select(ReshuffleJobItem.account_id, func.count())
+            .where(*pending)
+            .group_by(ReshuffleJobItem.account_id)
+            .order_by(ReshuffleJobItem.account_id)
+        ).all()
+        accounts: List[UUID] = []
+        size = 0
+        for account_id, count in counts:
+            if accounts and size + count > limit:
+                break
+            accounts.append(account_id)
+            size += count
+        if not accounts:
+            return []
+        return list(
+            db.scalars(
+                select(ReshuffleJobItem.playlist_id)
+                .where(*pending, ReshuffleJobItem.account_id.in_(accounts))
+                .order_by(ReshuffleJobItem.account_id, ReshuffleJobItem.playlist_id)
+            )
+        )
+
+    @staticmethod
+    def _checkpoint(db: Session, job_id: UUID, playlist_ids: List[UUID]) -> None:
+        now = datetime.utcnow()
+        db.execute(
+            update(ReshuffleJobItem)
+            .where(ReshuffleJobItem.job_id == job_id, ReshuffleJobItem.playlist_id.in_(playlist_ids))
+            .values(done_at=now)
+        )
+        db.execute(
+            update(ReshuffleJob)
+            .where(ReshuffleJob.id == job_id)
+            .values(completed=ReshuffleJob.completed + len(playlist_ids), heartbeat_at=now)
+        )
+
+    @staticmethod
+    def _fail_items(db: Session, job_id: UUID, failures: Dict[UUID, str]) -> None:
+        now = datetime.utcnow()
+        for playlist_id, error in failures.items():
+            db.execute(
+                update(ReshuffleJobItem)
+                .where(ReshuffleJobItem.job_id == job_id, ReshuffleJobItem.playlist_id == playlist_id)
+                .values(done_at=now, failed_at=now, error=error)
+            )
+        db.execute(
+            update(ReshuffleJob)
+            .where(ReshuffleJob.id == job_id)
+            .values(failed=ReshuffleJob.failed + len(failures), heartbeat_at=now)
+        )
+
+
+reshuffle_job_service = ReshuffleJobService()
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+EVICT_EVERY = 500
+TOUCH_FLUSH_EVERY = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    body TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_responses_last_access ON responses (last_access);
+"""
+
+
+class CachedResponse(NamedTuple):
+    body: Any
+    etag: Optional[str]
+    fresh: bool
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    coalesced: int = 0
+    stores: int = 0
+    evicted: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = asdict(self)
+        served = self.hits + self.revalidated + self.coalesced
+        lookups = served + self.misses
+        stats["local_ratio"] = round(served / lookups, 4) if lookups else None
+        return stats
+
+
+class ResponseCache:
+    """SQLite-backed cache of Spotify catalog GET responses.
+
+    Entries are keyed by the full request URL, so every page of a paginated
+    listing is cached on its own. Fresh entries are served without a request;
+    stale entries that carried an ``ETag`` are revalidated with
+    ``If-None-Match`` and refreshed on ``304``. Least recently read entries
+    are evicted past ``SPOTIFY_CACHE_MAX_ENTRIES``; read times are kept in
+    memory and written in one batch every ``TOUCH_FLUSH_EVERY`` hits or
+    before an eviction, so a hit is a single ``SELECT``.
+
+    The file is opened in WAL mode, so the API and Celery processes that
+    share ``backend/`` also share the cache. Async callers use the
+    ``*_async`` methods, which run the SQLite I/O on a worker thread so a
+    busy writer in another process never blocks the event loop.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self.stats = CacheStats()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stores_since_evict = 0
+        self._touched: Dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.spotify_cache_enabled
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT etag, body, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._touched[key] = now
+                if len(self._touched) >= TOUCH_FLUSH_EVERY:
+                    self._flush_touches(conn)
+        except (sqlite3.Error, OSError) as exc:
+            self._failed(exc)
+            return None
+        etag, body, expires_at = row
+        return CachedResponse(body=json.loads(body), etag=etag, fresh=expires_at > now)
+
+    def put(self, key: str, body: Any, etag: Optional[str]) -> None:
+        now = time.time()
+        expires_at = now + self.settings.spotify_cache_ttl_seconds
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, etag, body, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, etag, json.dumps(body, separators=(",", ":")), expires_at, now),
+                )
+                self.stats.stores += 1
+                self._stores_since_evict += 1
+                if self._stores_since_evict >= EVICT_EVERY:
+                    self._stores_since_evict = 0
+                    self._evict(conn)
+        except (sqlite3.Error, OSError) as exc:
+            self._failed(exc)
+
+    def touch(self, key: str) -> None:
+        """Extend a revalidated entry for another TTL."""
+        now = time.time()
+        try:
+            with self._lock:
+                self._touched.pop(key, None)
+                self._connection().execute(
+                    "UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?",
+                    (now + self.settings.spotify_cache_ttl_seconds, now, key),
+                )
+        except (sqlite3.Error, OSError) as exc:
+            self._failed(exc)
+
+    async def get_async(self, key: str) -> Optional[CachedResponse]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: str, body: Any, etag: Optional[str]) -> None:
+        await asyncio.to_thread(self.put, key, body, etag)
+
+    async def touch_async(self, key: str) -> None:
+        await asyncio.to_thread(self.touch, key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.stats.as_dict()
+
+    def _flush_touches(self, conn: sqlite3.Connection) -> None:
+        touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?", [(at, key) for key, at in touched.items()]
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        self._flush_touches(conn)
+        (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.settings.spotify_cache_max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.evicted += overflow
+
+    def _failed(self, exc: Exception) -> None:
+        # The cache is an optimisation; callers fall back to the network.
+        logger.warning("Spotify response cache unavailable: %s", exc)
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            path = Path(self.settings.spotify_cache_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+
+response_cache = ResponseCache()
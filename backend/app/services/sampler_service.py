@@ -1,16 +1,88 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import List
+import asyncio
+import logging
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
 
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.models import Playlist, PlaylistEntryHistory, Track
-from app.utils.random_utils import pick_many, shuffle
+from app.core.config import get_settings
+from app.db.models import Playlist
+from app.db.session import DbSession, run_sync
+from app.services.catalog_service import CatalogSnapshot, CatalogTrack, catalog_service
+from app.services.cooldown_index import cooldown_index
+from app.services.feature_index import feature_index
+from app.utils.random_utils import derive_seed
+from app.utils.sampling_utils import (
+    ArtistGroups,
+    deal_artist_capped,
+    sample_artist_capped,
+    sample_weighted_capped,
+    take_artist_capped,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SampleJob(NamedTuple):
+    size: int
+    excluded: np.ndarray
+    seed: int
+
+
+_worker_catalog: Optional[Tuple[np.ndarray, ArtistGroups, Optional[np.ndarray]]] = None
+
+
+def _init_worker(artist_codes: np.ndarray, groups: ArtistGroups, cumulative: Optional[np.ndarray]) -> None:
+    global _worker_catalog
+    _worker_catalog = (artist_codes, groups, cumulative)
+
+
+def _run_job(
+    artist_codes: np.ndarray,
+    groups: ArtistGroups,
+    cumulative: Optional[np.ndarray],
+    job: SampleJob,
+    artist_cap: int,
+) -> np.ndarray:
+    rng = np.random.default_rng(job.seed)
+    if cumulative is not None:
+        return sample_weighted_capped(cumulative, artist_codes, job.size, artist_cap, excluded=job.excluded, rng=rng)
+    return sample_artist_capped(groups, artist_codes, job.size, artist_cap, excluded=job.excluded, rng=rng)
+
+
+def _run_jobs_in_worker(jobs: List[SampleJob], artist_cap: int) -> List[np.ndarray]:
+    assert _worker_catalog is not None
+    artist_codes, groups, cumulative = _worker_catalog
+    return [_run_job(artist_codes, groups, cumulative, job, artist_cap) for job in jobs]
 
 
 class SamplerService:
+    """Cooldown- and artist-cap-aware track selection.
+
+    Every playlist draws from its own RNG stream derived from ``(seed,
+    playlist.id)``, so a seeded run is reproducible regardless of batch
+    composition or of how many pool workers the batch is split across.
+    Random-mode draws are uniform across artists unless ``popularity_exponent``
+    or ``recency_half_life_days`` is set, in which case tracks are drawn in
+    proportion to the catalog's cached weights.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._pool_lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_key: Optional[Tuple[int, int]] = None
+        self._pool_users: Dict[ProcessPoolExecutor, int] = {}
+
     def select_tracks(
         self,
         db: Session,
@@ -18,58 +90,219 @@ class SamplerService:
         size: int,
         cooldown_days: int,
         artist_cap: int,
-    ) -> List[Track]:
-        candidates = (
-            db.query(Track)
-            .filter(Track.is_usable.is_(True))
-            .order_by(Track.popularity.desc().nulls_last())
-            .all()
-        )
-        if not candidates:
+        seed: Optional[object] = None,
+    ) -> List[CatalogTrack]:
+        catalog = catalog_service.get(db)
+        if not len(catalog):
             return []
+        recent = cooldown_index.recent_positions(db, catalog, [playlist.id], cooldown_days)
+        if playlist.vibe:
+            selected = self._select_similar(db, catalog, playlist, recent[playlist.id], size, artist_cap)
+            if selected is not None:
+                return catalog.tracks(selected)
+        job = SampleJob(size, recent[playlist.id], self._playlist_seed(seed, playlist.id))
+        return catalog.tracks(
+            _run_job(catalog.artist_codes, catalog.artist_groups, self._weights(catalog), job, artist_cap)
+        )
+
+    def select_tracks_many(
+        self,
+        db: Session,
+        playlists: Sequence[Playlist],
+        default_size: int,
+        cooldown_days: int,
+        artist_cap: int,
+        seed: Optional[object] = None,
+        minimize_overlap: bool = False,
+    ) -> Dict[UUID, List[CatalogTrack]]:
+        """Sample every playlist against one catalog snapshot and one cooldown query.
+
+        With ``minimize_overlap`` the random-mode playlists of each account are
+        dealt together so siblings share as few tracks as possible; the RNG
+        stream is then per ``(seed, account)`` rather than per playlist.
+        """
+        catalog = catalog_service.get(db)
+        if not len(catalog) or not playlists:
+            return {playlist.id: [] for playlist in playlists}
+        recent = cooldown_index.recent_positions(
+            db, catalog, [playlist.id for playlist in playlists], cooldown_days
+        )
+        selections: Dict[UUID, List[CatalogTrack]] = {}
+        random_playlists: List[Playlist] = []
+        for playlist in playlists:
+            similar = None
+            if playlist.vibe:
+                similar = self._select_similar(
+                    db, catalog, playlist, recent[playlist.id], playlist.size or default_size, artist_cap
+                )
+            if similar is None:
+                random_playlists.append(playlist)
+            else:
+                selections[playlist.id] = catalog.tracks(similar)
+        if minimize_overlap:
+            by_account: Dict[UUID, List[Playlist]] = {}
+            for playlist in random_playlists:
+                by_account.setdefault(playlist.account_id, []).append(playlist)
+            for account_id, siblings in by_account.items():
+                dealt = deal_artist_capped(
+                    catalog.artist_groups,
+                    catalog.artist_codes,
+                    [playlist.size or default_size for playlist in siblings],
+                    artist_cap,
+                    excluded=[recent[playlist.id] for playlist in siblings],
+                    rng=np.random.default_rng(self._playlist_seed(seed, account_id)),
+                    cumulative=self._weights(catalog),
+                )
+                for playlist, selected in zip(siblings, dealt):
+                    selections[playlist.id] = catalog.tracks(selected)
+        else:
+            jobs = [
+                SampleJob(playlist.size or default_size, recent[playlist.id], self._playlist_seed(seed, playlist.id))
+                for playlist in random_playlists
+            ]
+            results = self._run_jobs(catalog, jobs, artist_cap)
+            for playlist, selected in zip(random_playlists, results):
+                selections[playlist.id] = catalog.tracks(selected)
+        return {playlist.id: selections[playlist.id] for playlist in playlists}
+
+    async def select_tracks_async(
+        self,
+        db: DbSession,
+        playlist: Playlist,
+        size: int,
+        cooldown_days: int,
+        artist_cap: int,
+        seed: Optional[object] = None,
+    ) -> List[CatalogTrack]:
+        return await run_sync(db, self.select_tracks, playlist, size, cooldown_days, artist_cap, seed)
+
+    async def select_tracks_many_async(
+        self,
+        db: DbSession,
+        playlists: Sequence[Playlist],
+        default_size: int,
+        cooldown_days: int,
+        artist_cap: int,
+        seed: Optional[object] = None,
+        minimize_overlap: bool = False,
+    ) -> Dict[UUID, List[CatalogTrack]]:
+        """Run ``select_tracks_many`` without blocking the event loop on its queries.
+
+        A sync ``Session`` runs it in a worker thread. An ``AsyncSession`` runs
+        it on the session's greenlet bridge, so catalog and cooldown loads
+        await asyncpg; large batches still go to the process pool.
+        """
+        args = (playlists, default_size, cooldown_days, artist_cap, seed, minimize_overlap)
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(self.select_tracks_many, *args)
+        return await asyncio.to_thread(self.select_tracks_many, db, *args)
+
+    def check_vibe(self, db: Session, vibe: Dict[str, Any]) -> None:
+        """Raise ``ValueError`` if ``vibe`` cannot seed a similarity search."""
+        catalog = catalog_service.get(db)
+        feature_index.nearest(db, catalog, 1, **self._vibe_query(vibe))
+
+    async def check_vibe_async(self, db: DbSession, vibe: Dict[str, Any]) -> None:
+        await run_sync(db, self.check_vibe, vibe)
 
-        cutoff = datetime.utcnow() - timedelta(days=cooldown_days)
-        recent_ids = {
-            entry.track_id
-            for entry in db.query(PlaylistEntryHistory)
-            .filter(PlaylistEntryHistory.playlist_id == playlist.id)
-            .filter(PlaylistEntryHistory.added_at >= cutoff)
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_key = None
+            self._pool_users.clear()
+
+    def _weights(self, catalog: CatalogSnapshot) -> Optional[np.ndarray]:
+        return catalog.cumulative_weights(self.settings.popularity_exponent, self.settings.recency_half_life_days)
+
+    @staticmethod
+    def _playlist_seed(seed: Optional[object], playlist_id: UUID) -> int:
+        if seed is None:
+            return secrets.randbits(64)
+        return derive_seed(seed, playlist_id)
+
+    @staticmethod
+    def _vibe_query(vibe: Dict[str, Any]) -> Dict[str, Any]:
+        seed_track_id = vibe.get("seed_track_id")
+        return {
+            "seed_track_id": UUID(str(seed_track_id)) if seed_track_id else None,
+            "target": vibe.get("target"),
         }
-        filtered = [track for track in candidates if track.id not in recent_ids]
-        if len(filtered) < size:
-            filtered = candidates
-
-        grouped = defaultdict(list)
-        for track in filtered:
-            grouped[track.artist].append(track)
-
-        selected: List[Track] = []
-        artist_counts: dict[str, int] = defaultdict(int)
-        artist_cycle = shuffle(grouped.keys())
-        idx = 0
-        while len(selected) < size and artist_cycle:
-            artist = artist_cycle[idx % len(artist_cycle)]
-            pool = grouped[artist]
-            if not pool:
-                idx += 1
-                if idx > len(artist_cycle) * 5:
-                    break
-                continue
-            if artist_counts[artist] >= artist_cap:
-                idx += 1
-                continue
-            choice = pick_many(pool, 1)[0]
-            selected.append(choice)
-            artist_counts[artist] += 1
-            pool.remove(choice)
-            idx += 1
-            if idx > len(artist_cycle) * 5:
-                break
-
-        if len(selected) < size:
-            remaining = [track for track in filtered if track not in selected]
-            selected.extend(pick_many(remaining, size - len(selected)))
-        return selected[:size]
+
+    def _select_similar(
+        self,
+        db: Session,
+        catalog: CatalogSnapshot,
+        playlist: Playlist,
+        recent: np.ndarray,
+        size: int,
+        artist_cap: int,
+    ) -> Optional[np.ndarray]:
+        """Nearest neighbours of the playlist vibe, widening the search until the cap is satisfiable."""
+        if len(catalog) - len(recent) < size:
+            recent = np.empty(0, dtype=np.int64)
+        limit = (size + len(recent)) * max(artist_cap, 1) * 4
+        try:
+            while True:
+                ordered = feature_index.nearest(db, catalog, limit, **self._vibe_query(playlist.vibe))
+                exhausted = len(ordered) < limit
+                selected = take_artist_capped(
+                    ordered, catalog.artist_codes, size, artist_cap, excluded=recent, fill=exhausted
+                )
+                if len(selected) >= size:
+                    return selected
+                if exhausted:
+                    raise ValueError(f"only {len(selected)} tracks with audio features are available")
+                limit *= 4
+        except ValueError as exc:
+            logger.warning("Vibe sampling unavailable for playlist %s: %s", playlist.id, exc)
+            return None
+
+    def _run_jobs(self, catalog: CatalogSnapshot, jobs: List[SampleJob], artist_cap: int) -> List[np.ndarray]:
+        workers = self.settings.sampler_workers
+        if workers <= 1 or len(jobs) < self.settings.sampler_parallel_threshold:
+            groups = catalog.artist_groups
+            cumulative = self._weights(catalog)
+            return [_run_job(catalog.artist_codes, groups, cumulative, job, artist_cap) for job in jobs]
+        chunk_size = max(1, -(-len(jobs) // (workers * 4)))
+        chunks = [jobs[offset : offset + chunk_size] for offset in range(0, len(jobs), chunk_size)]
+        with self._pool_for(catalog, workers) as pool:
+            return list(chain.from_iterable(pool.map(_run_jobs_in_worker, chunks, [artist_cap] * len(chunks))))
+
+    @contextmanager
+    def _pool_for(self, catalog: CatalogSnapshot, workers: int) -> Iterator[ProcessPoolExecutor]:
+        """The pool initialised with ``catalog``, held for the duration of the block.
+
+        A new catalog installs a new pool; the one it replaces is shut down
+        once the last batch still mapping on it has finished, so a concurrent
+        batch never submits to a pool that was shut down under it.
+        """
+        key = (catalog.generation, catalog.version)
+        with self._pool_lock:
+            if self._pool is None or self._pool_key != key:
+                retired = self._pool
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(catalog.artist_codes, catalog.artist_groups, self._weights(catalog)),
+                )
+                self._pool_key = key
+                if retired is not None and not self._pool_users.get(retired):
+                    self._pool_users.pop(retired, None)
+                    retired.shutdown(wait=False)
+            pool = self._pool
+            self._pool_users[pool] = self._pool_users.get(pool, 0) + 1
+        try:
+            yield pool
+        finally:
+            with self._pool_lock:
+                users = self._pool_users.get(pool, 0) - 1
+                if users > 0 or pool is self._pool:
+                    self._pool_users[pool] = max(users, 0)
+                else:
+                    self._pool_users.pop(pool, None)
+                    pool.shutdown(wait=False)
 
 
 sampler_service = SamplerService()
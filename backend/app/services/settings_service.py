@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.api.v1.schemas.settings import SettingsPayload, SettingsResponse
+from app.core.config import get_settings
+from app.db.models import Setting
+
+SETTINGS_KEYS = {
+    "playlist_size": "playlist_size",
+    "reshuffle_interval_days": "reshuffle_interval_days",
+    "cooldown_days": "cooldown_days",
+    "max_playlists_per_account": "max_playlists_per_account",
+    "artist_cap": "artist_cap",
+    "default_prefix": "default_prefix",
+}
+
+
+class SettingsService:
+    """Operator settings stored in ``settings`` with environment defaults."""
+
+    @staticmethod
+    def _resolve(stored: Dict[str, str]) -> SettingsResponse:
+        defaults = get_settings()
+        return SettingsResponse(
+            playlist_size=int(stored.get("playlist_size", defaults.playlist_size)),
+            reshuffle_interval_days=int(stored.get("reshuffle_interval_days", defaults.reshuffle_interval_days)),
+            cooldown_days=int(stored.get("cooldown_days", defaults.cooldown_days)),
+            max_playlists_per_account=int(
+                stored.get("max_playlists_per_account", defaults.max_playlists_per_account)
+            ),
+            artist_cap=int(stored.get("artist_cap", defaults.artist_cap)),
+            default_prefix=stored.get("default_prefix", defaults.default_prefix),
+        )
+
+    def load(self, db: Session) -> SettingsResponse:
+        return self._resolve(dict(db.execute(select(Setting.key, Setting.value)).all()))
+
+    async def load_async(self, db: AsyncSession) -> SettingsResponse:
+        return self._resolve(dict((await db.execute(select(Setting.key, Setting.value))).all()))
+
+    async def update_async(self, db: AsyncSession, payload: SettingsPayload) -> SettingsResponse:
+        existing = {
+            setting.key: setting
+            for setting in (await db.scalars(select(Setting).where(Setting.key.in_(SETTINGS_KEYS.values()))))
+        }
+        for field, key in SETTINGS_KEYS.items():
+            value = str(getattr(payload, field))
+            if key in existing:
+                existing[key].value = value
+            else:
+                db.add(Setting(key=key, value=value))
+        await db.commit()
+        return await self.load_async(db)
+
+
+settings_service = SettingsService()
@@ -1,25 +1,245 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+import hashlib
+import logging
+import os
+import random
 import secrets
-from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import httpx
 
 from app.core.config import get_settings
+from app.services.rate_limiter import rate_limiter
+from app.services.response_cache import CachedResponse, response_cache
+from app.utils.async_utils import close_on_loop
+from app.utils.playlist_diff import MAX_ITEMS_PER_REQUEST, SyncPlan
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "PUT", "DELETE"})
+MAX_ALBUMS_PER_REQUEST = 20
+MAX_AUDIO_FEATURE_IDS = 100
+ALBUM_TRACKS_PAGE = 50
+RETRYABLE_STATUSES = frozenset({500, 502, 503, 504})
 
 
 class SpotifyAuthError(Exception):
     pass
 
 
+@dataclass
+class PoolStats:
+    """Connection reuse counters for the shared Spotify client."""
+
+    requests: int = 0
+    connections_opened: int = 0
+    tls_handshakes: int = 0
+    http2_requests: int = 0
+    clients_created: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = asdict(self)
+        reused = max(self.requests - self.connections_opened, 0)
+        stats["reused_requests"] = reused
+        stats["reuse_ratio"] = round(reused / self.requests, 4) if self.requests else None
+        return stats
+
+
 class SpotifyService:
+    """Spotify Web API calls over one long-lived, pooled ``httpx.AsyncClient``.
+
+    The client is created lazily and bound to the running event loop and
+    process. Celery worker processes run every task on one persistent loop
+    (``workers.tasks.run_async``), so they keep a single client and its
+    keep-alive connections between tasks. A client left behind by another
+    loop is closed on that loop when it is replaced. ``aclose`` is wired to
+    the FastAPI lifespan and Celery's ``worker_process_shutdown``.
+
+    ``API_BASE`` and ``AUTH_BASE`` default to Spotify and are overridden by
+    ``SPOTIFY_API_BASE`` / ``SPOTIFY_AUTH_BASE``, e.g. to point at
+    ``benchmarks.fake_spotify``.
+    """
+
     API_BASE = "https://api.spotify.com/v1"
     AUTH_BASE = "https://accounts.spotify.com"
 
     def __init__(self) -> None:
         self.settings = get_settings()
+        self.API_BASE = self.settings.spotify_api_base.rstrip("/")
+        self.AUTH_BASE = self.settings.spotify_auth_base.rstrip("/")
+        self.stats = PoolStats()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_pid: Optional[int] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._inflight_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop or self._client_pid != os.getpid():
+            # A client from another loop or a parent process cannot be reused or awaited here.
+            # The parent's sockets are shared after a fork and must stay open for it.
+            if self._client is not None and self._client_pid == os.getpid():
+                close_on_loop(self._client_loop, self._client.aclose)
+            self._client = self._build_client()
+            self._client_loop = loop
+            self._client_pid = os.getpid()
+        return self._client
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.settings.spotify_max_connections,
+            max_keepalive_connections=self.settings.spotify_max_keepalive_connections,
+            keepalive_expiry=self.settings.spotify_keepalive_expiry_seconds,
+        )
+        http2 = self.settings.spotify_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("h2 is not installed; Spotify client falls back to HTTP/1.1")
+                http2 = False
+        self.stats.clients_created += 1
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=httpx.Timeout(self.settings.spotify_timeout_seconds),
+            event_hooks={"request": [self._trace_request]},
+        )
+
+    async def _trace_request(self, request: httpx.Request) -> None:
+        self.stats.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.stats.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.stats.tls_handshakes += 1
+        elif event_name == "http2.send_request_headers.started":
+            self.stats.http2_requests += 1
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        access_token: Optional[str] = None,
+        retry: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send one Spotify request through the shared rate limiter.
+
+        429s are retried after ``Retry-After`` (every process backs off, see
+        ``RateLimiter``); 5xx responses are retried with jittered exponential
+        backoff for idempotent methods only, so a retried POST never creates a
+        second playlist. ``retry=False`` turns the 5xx retry off for calls
+        whose effect depends on the current state, such as a reorder PUT.
+        The final response is checked with ``raise_for_status`` as before.
+        """
+        account_key = hashlib.sha256(access_token.encode()).hexdigest()[:16] if access_token else None
+        if access_token:
+            kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {access_token}"
+        retries = self.settings.spotify_max_retries
+        retry_5xx = method in IDEMPOTENT_METHODS if retry is None else retry
+        attempt = 0
+        while True:
+            async with rate_limiter.slot(account_key):
+                resp = await self._http().request(method, url, **kwargs)
+            if resp.status_code == 429:
+                delay = self._retry_after(resp)
+                await rate_limiter.record_throttle(delay)
+                if attempt < retries and delay <= self.settings.spotify_max_retry_after_seconds:
+                    logger.warning("Spotify throttled %s %s; retrying in %.1fs", method, url, delay)
+                    attempt += 1
+                    continue
+            elif resp.status_code in RETRYABLE_STATUSES and retry_5xx and attempt < retries:
+                await asyncio.sleep(min(2**attempt, 30) * (0.5 + random.random()))
+                attempt += 1
+                continue
+            elif resp.status_code < 500:
+                rate_limiter.record_success()
+            if resp.status_code != httpx.codes.NOT_MODIFIED:
+                resp.raise_for_status()
+            return resp
+
+    async def _get_json(
+        self, url: str, *, access_token: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """GET a catalog resource through the response cache.
+
+        Concurrent callers asking for the same URL share one request; the
+        request runs shielded so a cancelled caller does not fail the others.
+        """
+        if not response_cache.enabled:
+            resp = await self._request("GET", url, access_token=access_token, params=params)
+            return resp.json()
+        key = str(httpx.URL(url, params=params))
+        cached = await response_cache.get_async(key)
+        if cached is not None and cached.fresh:
+            response_cache.stats.hits += 1
+            return cached.body
+        loop = asyncio.get_running_loop()
+        if self._inflight_loop is not loop:
+            self._inflight = {}
+            self._inflight_loop = loop
+        task = self._inflight.get(key)
+        if task is not None:
+            response_cache.stats.coalesced += 1
+        else:
+            task = loop.create_task(self._fetch_cached(key, access_token, cached))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_cached(self, key: str, access_token: str, cached: Optional[CachedResponse]) -> Dict[str, Any]:
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+        resp = await self._request("GET", key, access_token=access_token, headers=headers)
+        if resp.status_code == httpx.codes.NOT_MODIFIED and cached is not None:
+            response_cache.stats.revalidated += 1
+            await response_cache.touch_async(key)
+            return cached.body
+        response_cache.stats.misses += 1
+        body = resp.json()
+        await response_cache.put_async(key, body, resp.headers.get("ETag"))
+        return body
+
+    @staticmethod
+    def _retry_after(resp: httpx.Response) -> float:
+        value = resp.headers.get("Retry-After")
+        if value:
+            try:
+                return max(float(value), 0.0)
+            except ValueError:
+                try:
+                    moment = parsedate_to_datetime(value)
+                except (TypeError, ValueError):
+                    moment = None
+                if moment is not None:
+                    if moment.tzinfo is None:
+                        moment = moment.replace(tzinfo=timezone.utc)
+                    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        return 1.0
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = self.stats.as_dict()
+        stats["open"] = self._client is not None and not self._client.is_closed
+        stats["rate_limiter"] = rate_limiter.snapshot()
+        stats["response_cache"] = response_cache.snapshot()
+        return stats
+
+    async def aclose(self) -> None:
+        client, loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
 
     def _client_credentials(self) -> str:
         raw = f"{self.settings.spotify_client_id}:{self.settings.spotify_client_secret}"
@@ -45,9 +265,7 @@ class SpotifyService:
             "redirect_uri": str(self.settings.spotify_redirect_uri),
         }
         headers = {"Authorization": f"Basic {self._client_credentials()}"}
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{self.AUTH_BASE}/api/token", data=data, headers=headers, timeout=30.0)
-        resp.raise_for_status()
+        resp = await self._request("POST", f"{self.AUTH_BASE}/api/token", data=data, headers=headers)
         payload = resp.json()
         payload["expires_at"] = datetime.utcnow() + timedelta(seconds=payload.get("expires_in", 3600))
         return payload
@@ -55,99 +273,159 @@ class SpotifyService:
     async def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
         data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
         headers = {"Authorization": f"Basic {self._client_credentials()}"}
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{self.AUTH_BASE}/api/token", data=data, headers=headers, timeout=30.0)
-        resp.raise_for_status()
+        resp = await self._request("POST", f"{self.AUTH_BASE}/api/token", data=data, headers=headers)
         payload = resp.json()
         payload["expires_at"] = datetime.utcnow() + timedelta(seconds=payload.get("expires_in", 3600))
         payload.setdefault("refresh_token", refresh_token)
         return payload
 
     async def get_current_user(self, access_token: str) -> Dict[str, Any]:
-        headers = {"Authorization": f"Bearer {access_token}"}
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.API_BASE}/me", headers=headers, timeout=30.0)
-        resp.raise_for_status()
+        resp = await self._request("GET", f"{self.API_BASE}/me", access_token=access_token)
         return resp.json()
 
     async def create_playlist(
         self, access_token: str, user_id: str, name: str, description: str
     ) -> Dict[str, Any]:
         payload = {"name": name, "description": description, "public": True}
-        headers = {"Authorization": f"Bearer {access_token}"}
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{self.API_BASE}/users/{user_id}/playlists", json=payload, headers=headers, timeout=30.0
-            )
-        resp.raise_for_status()
+        resp = await self._request(
+            "POST", f"{self.API_BASE}/users/{user_id}/playlists", access_token=access_token, json=payload
+        )
         return resp.json()
 
     async def update_playlist_details(
         self, access_token: str, playlist_id: str, name: str, description: str
     ) -> None:
         payload = {"name": name, "description": description, "public": True}
-        headers = {"Authorization": f"Bearer {access_token}"}
-        async with httpx.AsyncClient() as client:
-            resp = await client.put(
-                f"{self.API_BASE}/playlists/{playlist_id}", json=payload, headers=headers, timeout=30.0
-            )
-        resp.raise_for_status()
+        await self._request("PUT", f"{self.API_BASE}/playlists/{playlist_id}", access_token=access_token, json=payload)
 
-    async def replace_playlist_items(self, access_token: str, playlist_id: str, track_uris: List[str]) -> None:
-        headers = {"Authorization": f"Bearer {access_token}"}
-        chunks = [track_uris[i : i + 100] for i in range(0, len(track_uris), 100)]
+    async def replace_playlist_items(
+        self, access_token: str, playlist_id: str, track_uris: List[str]
+    ) -> Optional[str]:
+        """Overwrite the playlist with ``track_uris``; returns the resulting ``snapshot_id``."""
+        step = MAX_ITEMS_PER_REQUEST
+        chunks = [track_uris[i : i + step] for i in range(0, len(track_uris), step)]
         if not chunks:
-            return
-        async with httpx.AsyncClient() as client:
-            first = chunks[0]
-            resp = await client.put(
-                f"{self.API_BASE}/playlists/{playlist_id}/tracks",
-                json={"uris": first},
-                headers=headers,
-                timeout=30.0,
+            return None
+        url = f"{self.API_BASE}/playlists/{playlist_id}/tracks"
+        resp = await self._request("PUT", url, access_token=access_token, json={"uris": chunks[0]})
+        for chunk in chunks[1:]:
+            resp = await self._request("POST", url, access_token=access_token, json={"uris": chunk})
+        return self._snapshot_id(resp)
+
+    async def get_playlist_snapshot(self, access_token: str, playlist_id: str) -> Optional[str]:
+        resp = await self._request(
+            "GET",
+            f"{self.API_BASE}/playlists/{playlist_id}",
+            access_token=access_token,
+            params={"fields": "snapshot_id"},
+        )
+        return self._snapshot_id(resp)
+
+    async def apply_playlist_plan(self, access_token: str, playlist_id: str, plan: SyncPlan) -> Optional[str]:
+        """Apply a ``SyncPlan`` item by item; returns the last ``snapshot_id`` Spotify reported."""
+        url = f"{self.API_BASE}/playlists/{playlist_id}/tracks"
+        snapshot_id: Optional[str] = None
+        for start in range(0, len(plan.removes), MAX_ITEMS_PER_REQUEST):
+            chunk = plan.removes[start : start + MAX_ITEMS_PER_REQUEST]
+            resp = await self._request(
+                "DELETE", url, access_token=access_token, json={"tracks": [{"uri": uri} for uri in chunk]}
             )
-            resp.raise_for_status()
-            for chunk in chunks[1:]:
-                resp = await client.post(
-                    f"{self.API_BASE}/playlists/{playlist_id}/tracks",
-                    json={"uris": chunk},
-                    headers=headers,
-                    timeout=30.0,
-                )
-                resp.raise_for_status()
+            snapshot_id = self._snapshot_id(resp) or snapshot_id
+        for range_start, insert_before in plan.moves:
+            payload = {"range_start": range_start, "insert_before": insert_before, "range_length": 1}
+            # A move Spotify applied before answering 5xx would be applied twice on retry.
+            resp = await self._request("PUT", url, access_token=access_token, retry=False, json=payload)
+            snapshot_id = self._snapshot_id(resp) or snapshot_id
+        for position, uris in plan.inserts:
+            resp = await self._request(
+                "POST", url, access_token=access_token, json={"uris": uris, "position": position}
+            )
+            snapshot_id = self._snapshot_id(resp) or snapshot_id
+        return snapshot_id
+
+    @staticmethod
+    def _snapshot_id(resp: httpx.Response) -> Optional[str]:
+        try:
+            return resp.json().get("snapshot_id")
+        except ValueError:
+            return None
 
     async def get_album_tracks(self, access_token: str, album_id: str) -> List[Dict[str, Any]]:
-        headers = {"Authorization": f"Bearer {access_token}"}
         tracks: List[Dict[str, Any]] = []
-        params = {"limit": 50}
-        async with httpx.AsyncClient() as client:
-            url = f"{self.API_BASE}/albums/{album_id}/tracks"
-            while url:
-                resp = await client.get(url, params=params, headers=headers, timeout=30.0)
-                resp.raise_for_status()
-                data = resp.json()
-                tracks.extend(data.get("items", []))
-                url = data.get("next")
-                params = None
+        params: Optional[Dict[str, Any]] = {"limit": ALBUM_TRACKS_PAGE}
+        url = f"{self.API_BASE}/albums/{album_id}/tracks"
+        while url:
+            data = await self._get_json(url, access_token=access_token, params=params)
+            tracks.extend(data.get("items", []))
+            url = data.get("next")
+            params = None
         return tracks
 
+    async def get_albums(self, access_token: str, album_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Full album objects keyed by id, with ``tracks.items`` holding every track.
+
+        Albums are fetched ``MAX_ALBUMS_PER_REQUEST`` at a time from
+        ``/albums?ids=``; track pages beyond the first embedded one are
+        requested by offset. Both run ``SPOTIFY_INGEST_CONCURRENCY`` at a
+        time. Ids Spotify does not know are left out.
+        """
+        step = MAX_ALBUMS_PER_REQUEST
+        chunks = [album_ids[i : i + step] for i in range(0, len(album_ids), step)]
+        pages = await self._gather_bounded(
+            self._get_json(f"{self.API_BASE}/albums", access_token=access_token, params={"ids": ",".join(chunk)})
+            for chunk in chunks
+        )
+        albums: Dict[str, Dict[str, Any]] = {}
+        missing: List[Tuple[str, int]] = []
+        for page in pages:
+            for album in page.get("albums", []):
+                if not album:
+                    continue
+                # Copy before extending: coalesced callers share the decoded body.
+                tracks = album.get("tracks") or {}
+                items = list(tracks.get("items", []))
+                albums[album["id"]] = {**album, "tracks": {**tracks, "items": items, "next": None}}
+                if tracks.get("next"):
+                    missing.extend(
+                        (album["id"], offset)
+                        for offset in range(len(items), tracks.get("total", 0), ALBUM_TRACKS_PAGE)
+                    )
+        rest = await self._gather_bounded(
+            self._get_json(
+                f"{self.API_BASE}/albums/{album_id}/tracks",
+                access_token=access_token,
+                params={"offset": offset, "limit": ALBUM_TRACKS_PAGE},
+            )
+            for album_id, offset in missing
+        )
+        for (album_id, _), data in zip(missing, rest):
+            albums[album_id]["tracks"]["items"].extend(data.get("items", []))
+        return albums
+
     async def get_audio_features(self, access_token: str, track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
-        headers = {"Authorization": f"Bearer {access_token}"}
+        step = MAX_AUDIO_FEATURE_IDS
+        chunks = [track_ids[i : i + step] for i in range(0, len(track_ids), step)]
+        url = f"{self.API_BASE}/audio-features"
+        pages = await self._gather_bounded(
+            self._get_json(url, access_token=access_token, params={"ids": ",".join(chunk)}) for chunk in chunks
+        )
         results: Dict[str, Dict[str, Any]] = {}
-        async with httpx.AsyncClient() as client:
-            for chunk in [track_ids[i : i + 100] for i in range(0, len(track_ids), 100)]:
-                if not chunk:
-                    continue
-                params = {"ids": ",".join(chunk)}
-                resp = await client.get(
-                    f"{self.API_BASE}/audio-features", params=params, headers=headers, timeout=30.0
-                )
-                resp.raise_for_status()
-                for feature in resp.json().get("audio_features", []):
-                    if feature:
-                        results[feature["id"]] = feature
+        for data in pages:
+            for feature in data.get("audio_features", []):
+                if feature:
+                    results[feature["id"]] = feature
         return results
 
+    async def _gather_bounded(self, calls: Iterable[Awaitable[Any]]) -> List[Any]:
+        """Await ``calls`` at most ``SPOTIFY_INGEST_CONCURRENCY`` at a time, keeping order."""
+        limit = asyncio.Semaphore(max(self.settings.spotify_ingest_concurrency, 1))
+
+        async def bounded(call: Awaitable[Any]) -> Any:
+            async with limit:
+                return await call
+
+        return await asyncio.gather(*(bounded(call) for call in calls))
+
     @staticmethod
     def build_state() -> str:
         return secrets.token_urlsafe(16)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import httpx
+from redis import asyncio as aioredis
+from redis.exceptions import LockError, RedisError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import get_settings
+from app.db.models import SpotifyAccount
+from app.db.session import AsyncSessionLocal, DbSession, SessionLocal
+from app.services.spotify_service import spotify_service
+from app.utils.async_utils import close_on_loop
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "spotify:token-refresh"
+REDIS_RETRY_SECONDS = 30.0
+TOKEN_COLUMNS = ("access_token", "refresh_token", "expires_at", "updated_at")
+
+TokenState = Dict[str, Any]
+
+
+class SpotifyRefreshError(Exception):
+    pass
+
+
+class TokenService:
+    """Keeps account access tokens refreshed ahead of ``expires_at``.
+
+    ``refresh_due`` loads every active account whose token expires before
+    the next pass (plus ``TOKEN_REFRESH_LEAD_SECONDS``) into a heap ordered by
+    expiry and refreshes them soonest-first, ``TOKEN_REFRESH_CONCURRENCY`` at
+    a time. ``ensure_fresh`` is the cheap check callers run before using a
+    token; it only goes to Spotify when the token is inside the lead window.
+
+    Refreshes of one account are single-flight: callers in the same process
+    share one task, and processes serialise on a Redis lock and re-read the
+    row once they hold it, so a token rotated by another process is reused
+    instead of being refreshed twice. Without Redis only the in-process
+    guard applies.
+
+    Token rows are read and written through a short-lived session of their
+    own and the new values are copied onto the caller's ``SpotifyAccount``
+    as already committed, so a refresh in the middle of a reshuffle batch or
+    outbox drain never commits, expires or dirties the caller's transaction.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_down_until = 0.0
+        self._inflight: Dict[UUID, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self.stats = {"refreshed": 0, "reused": 0, "coalesced": 0, "failed": 0}
+
+    def _lead(self) -> timedelta:
+        return timedelta(seconds=self.settings.token_refresh_lead_seconds)
+
+    def needs_refresh(self, account: SpotifyAccount, now: Optional[datetime] = None) -> bool:
+        return account.expires_at - self._lead() <= (now or datetime.utcnow())
+
+    async def ensure_fresh(self, db: DbSession, account: SpotifyAccount) -> SpotifyAccount:
+        if self.needs_refresh(account):
+            await self.refresh(db, account)
+        return account
+
+    async def refresh(self, db: DbSession, account: SpotifyAccount, force: bool = False) -> SpotifyAccount:
+        """Refresh ``account`` unless another caller already did; ``force`` skips the expiry check."""
+        self._bind()
+        task = self._inflight.get(account.id)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.get_running_loop().create_task(
+                self._refresh_locked(isinstance(db, AsyncSession), account.id, force)
+            )
+            self._inflight[account.id] = task
+            task.add_done_callback(lambda _, key=account.id: self._inflight.pop(key, None))
+        self._apply(account, await asyncio.shield(task))
+        return account
+
+    async def refresh_due(self, db: Session) -> Dict[str, int]:
+        """Refresh every active account that would expire before the next pass."""
+        now = datetime.utcnow()
+        cutoff = now + self._lead() + timedelta(seconds=self.settings.token_refresh_interval_seconds)
+        accounts = (
+            db.query(SpotifyAccount)
+            .filter(SpotifyAccount.status == "active", SpotifyAccount.expires_at <= cutoff)
+            .all()
+        )
+        heap: List[Tuple[datetime, str, SpotifyAccount]] = [
+            (account.expires_at, str(account.id), account) for account in accounts
+        ]
+        heapq.heapify(heap)
+        limit = asyncio.Semaphore(max(self.settings.token_refresh_concurrency, 1))
+        failures = 0
+
+        async def run(account: SpotifyAccount) -> None:
+            nonlocal failures
+            async with limit:
+                try:
+                    await self.refresh(db, account, force=True)
+                except (httpx.HTTPError, SpotifyRefreshError) as exc:
+                    failures += 1
+                    logger.warning("Token refresh for account %s failed: %s", account.id, exc)
+
+        tasks = []
+        while heap:
+            # Tasks start in expiry order, so the semaphore admits the most urgent first.
+            _, _, account = heapq.heappop(heap)
+            tasks.append(asyncio.create_task(run(account)))
+        await asyncio.gather(*tasks)
+        return {"due": len(tasks), "failed": failures}
+
+    async def aclose(self) -> None:
+        redis, loop = self._redis, self._loop
+        self._redis = None
+        if redis is not None and loop is asyncio.get_running_loop():
+            await redis.aclose()
+
+    async def _refresh_locked(self, use_async: bool, account_id: UUID, force: bool) -> TokenState:
+        started = datetime.utcnow()
+        async with self._lock(account_id):
+            state = await self._in_own_session(use_async, self._read, account_id)
+            # Another process refreshed while we waited for the lock.
+            if state["expires_at"] - self._lead() > started and (not force or state["updated_at"] >= started):
+                self.stats["reused"] += 1
+                return state
+            try:
+                payload = await spotify_service.refresh_token(state["refresh_token"])
+            except httpx.HTTPError:
+                self.stats["failed"] += 1
+                raise
+            if not payload.get("access_token"):
+                self.stats["failed"] += 1
+                raise SpotifyRefreshError(f"Spotify returned no access token for account {account_id}")
+            state = await self._in_own_session(use_async, self._store, account_id, payload)
+            self.stats["refreshed"] += 1
+            return state
+
+    @staticmethod
+    async def _in_own_session(use_async: bool, fn, *args: Any) -> TokenState:
+        if use_async:
+            async with AsyncSessionLocal() as own:
+                return await own.run_sync(fn, *args)
+        with SessionLocal() as own:
+            return fn(own, *args)
+
+    @staticmethod
+    def _read(db: Session, account_id: UUID) -> TokenState:
+        columns = [getattr(SpotifyAccount, name) for name in TOKEN_COLUMNS]
+        return dict(db.execute(select(*columns).where(SpotifyAccount.id == account_id)).one()._mapping)
+
+    @classmethod
+    def _store(cls, db: Session, account_id: UUID, payload: Dict[str, Any]) -> TokenState:
+        values = {"access_token": payload["access_token"]}
+        for name in ("refresh_token", "expires_at"):
+            if payload.get(name):
+                values[name] = payload[name]
+        db.execute(update(SpotifyAccount).where(SpotifyAccount.id == account_id).values(**values))
+        state = cls._read(db, account_id)
+        db.commit()
+        return state
+
+    @staticmethod
+    def _apply(account: SpotifyAccount, state: TokenState) -> None:
+        for name in TOKEN_COLUMNS:
+            set_committed_value(account, name, state[name])
+
+    @asynccontextmanager
+    async def _lock(self, account_id: UUID) -> AsyncIterator[None]:
+        redis = self._client()
+        if redis is None:
+            yield
+            return
+        timeout = self.settings.spotify_timeout_seconds * 2
+        lock = redis.lock(f"{LOCK_PREFIX}:{account_id}", timeout=timeout, blocking_timeout=timeout)
+        try:
+            acquired = await lock.acquire()
+        except RedisError as exc:
+            self._redis_failed(exc)
+            acquired = False
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except (LockError, RedisError) as exc:
+                    logger.warning("Could not release token refresh lock for %s: %s", account_id, exc)
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._pid != os.getpid():
+            if self._redis is not None and self._pid == os.getpid():
+                close_on_loop(self._loop, self._redis.aclose)
+            self._inflight = {}
+            self._redis = None
+            self._loop = loop
+            self._pid = os.getpid()
+
+    def _client(self) -> Optional[aioredis.Redis]:
+        if time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.Redis.from_url(
+                self.settings.redis_url, socket_timeout=1.0, socket_connect_timeout=1.0
+            )
+        return self._redis
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning("Token refresh lock cannot reach Redis, deduplicating in-process only: %s", exc)
+        self._redis = None
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+token_service = TokenService()
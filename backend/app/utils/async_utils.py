@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def close_on_loop(loop: Optional[asyncio.AbstractEventLoop], close: Callable[[], Awaitable[None]]) -> None:
+    """Run ``close()`` on ``loop``, the event loop that owns a client being replaced.
+
+    A loop running in another thread gets it scheduled; an idle one runs it
+    on a short-lived thread, since the caller's own loop is already running.
+    A client of a loop that was closed can no longer be closed cleanly and is
+    left to the garbage collector.
+    """
+    if loop is None or loop.is_closed():
+        logger.debug("Dropping a client whose event loop is closed")
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(close(), loop)
+        return
+    thread = threading.Thread(target=loop.run_until_complete, args=(close(),), daemon=True)
+    thread.start()
+    thread.join()
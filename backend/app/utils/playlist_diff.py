@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Set, Tuple
+
+MAX_ITEMS_PER_REQUEST = 100
+
+
+@dataclass
+class SyncPlan:
+    """Spotify item operations that turn one track list into another.
+
+    Operations are meant to be applied in order: ``removes`` first, then
+    ``moves`` as ``(range_start, insert_before)`` single-item reorders on the
+    shortened list, then ``inserts`` as ``(position, uris)`` left to right.
+    """
+
+    removes: List[str] = field(default_factory=list)
+    moves: List[Tuple[int, int]] = field(default_factory=list)
+    inserts: List[Tuple[int, List[str]]] = field(default_factory=list)
+
+    @property
+    def requests(self) -> int:
+        removes = -(-len(self.removes) // MAX_ITEMS_PER_REQUEST)
+        return removes + len(self.moves) + len(self.inserts)
+
+
+def full_replace_requests(count: int) -> int:
+    """Calls a PUT of the first chunk plus POSTs of the rest would take."""
+    return -(-count // MAX_ITEMS_PER_REQUEST)
+
+
+def _stable_positions(sequence: Sequence[int]) -> Set[int]:
+    """Indexes of one longest increasing subsequence of ``sequence``."""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    parent = [-1] * len(sequence)
+    for index, value in enumerate(sequence):
+        slot = bisect_left(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tail_index.append(index)
+        else:
+            tails[slot] = value
+            tail_index[slot] = index
+        parent[index] = tail_index[slot - 1] if slot else -1
+    stable: Set[int] = set()
+    cursor = tail_index[-1] if tail_index else -1
+    while cursor >= 0:
+        stable.add(cursor)
+        cursor = parent[cursor]
+    return stable
+
+
+def align_to_previous(previous: Sequence[str], target: Sequence[str]) -> List[str]:
+    """The tracks of ``target``, kept ones in their old relative order followed by the new ones.
+
+    Kept tracks then need no reorders and the new tracks form one run at the
+    end, so a partial rotation syncs as removes plus one insert per 100 new
+    tracks instead of one insert per slot the sampler scattered them into.
+    """
+    kept = set(previous).intersection(target)
+    if not kept:
+        return list(target)
+    return [uri for uri in previous if uri in kept] + [uri for uri in target if uri not in kept]
+
+
+def plan_sync(current: Sequence[str], target: Sequence[str]) -> Optional[SyncPlan]:
+    """Smallest remove/reorder/insert plan from ``current`` to ``target``.
+
+    Spotify removes every occurrence of a URI, so lists with duplicates
+    return ``None`` and the caller falls back to a full replace. Reorders are
+    limited to the tracks outside a longest increasing subsequence of kept
+    tracks, which is the minimum number of single-item moves.
+    """
+    if len(set(current)) != len(current) or len(set(target)) != len(target):
+        return None
+    wanted = set(target)
+    present = set(current)
+    plan = SyncPlan(removes=[uri for uri in current if uri not in wanted])
+
+    target_rank = {uri: index for index, uri in enumerate(uri for uri in target if uri in present)}
+    working = [uri for uri in current if uri in wanted]
+    stable_at = _stable_positions([target_rank[uri] for uri in working])
+    stable = {working[index] for index in stable_at}
+    ordered = sorted(working, key=target_rank.__getitem__)
+    for rank, uri in enumerate(ordered):
+        if uri in stable:
+            continue
+        source = working.index(uri)
+        # Place right after the previous kept track in target order, which is already in place.
+        anchor = working.index(ordered[rank - 1]) + 1 if rank else 0
+        if anchor != source and anchor != source + 1:
+            plan.moves.append((source, anchor))
+        working.pop(source)
+        working.insert(anchor - 1 if anchor > source else anchor, uri)
+        stable.add(uri)
+
+    start = 0
+    run: List[str] = []
+    for position, uri in enumerate(target):
+        if uri in present:
+            continue
+        if run and (start + len(run) != position or len(run) == MAX_ITEMS_PER_REQUEST):
+            plan.inserts.append((start, run))
+            run = []
+        if not run:
+            start = position
+        run.append(uri)
+    if run:
+        plan.inserts.append((start, run))
+    return plan
@@ -1,20 +1,33 @@
 from __future__ import annotations
 
+import hashlib
 import random
-from typing import Iterable, Sequence, TypeVar
+from typing import Iterable, Optional, Sequence, TypeVar
+
+import numpy as np
 
 T = TypeVar("T")
 
 
-def pick_many(items: Sequence[T], k: int) -> list[T]:
+def pick_many(items: Sequence[T], k: int, rng: Optional[random.Random] = None) -> list[T]:
     if k <= 0:
         return []
     if len(items) <= k:
         return list(items)
-    return random.sample(list(items), k)
+    return (rng or random).sample(list(items), k)
 
 
-def shuffle(items: Iterable[T]) -> list[T]:
+def shuffle(items: Iterable[T], rng: Optional[random.Random] = None) -> list[T]:
     pool = list(items)
-    random.shuffle(pool)
+    (rng or random).shuffle(pool)
     return pool
+
+
+def derive_seed(base: object, *parts: object) -> int:
+    """Stable 64-bit seed for an independent stream, e.g. one per playlist."""
+    key = ":".join(str(part) for part in (base, *parts))
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def make_rng(base: object, *parts: object) -> np.random.Generator:
+    return np.random.default_rng(derive_seed(base, *parts))
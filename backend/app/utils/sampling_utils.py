@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+class ArtistGroups(NamedTuple):
+    """Catalog positions grouped by artist code (CSR layout)."""
+
+    members: np.ndarray
+    starts: np.ndarray
+    counts: np.ndarray
+
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+def group_by_artist(artist_codes: np.ndarray, artist_count: int) -> ArtistGroups:
+    members = np.argsort(artist_codes, kind="stable").astype(np.int64)
+    counts = np.bincount(artist_codes, minlength=artist_count).astype(np.int64)
+    starts = np.zeros(artist_count, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    return ArtistGroups(members=members, starts=starts, counts=counts)
+
+
+def sample_artist_capped(
+    groups: ArtistGroups,
+    artist_codes: np.ndarray,
+    size: int,
+    artist_cap: int,
+    excluded: Optional[np.ndarray] = None,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Pick up to ``size`` distinct catalog positions, round-robin across artists.
+
+    Artists are visited in a random turn order and each visit takes one random
+    track, so round ``r`` hands every artist its ``r``-th pick until the
+    playlist is full or every artist has reached ``artist_cap``. Remaining
+    slots are then filled uniformly from the leftover pool, ignoring the cap.
+    ``excluded`` positions (the playlist cooldown) are skipped unless honouring
+    them would leave fewer than ``size`` tracks.
+    """
+    rng = rng or np.random.default_rng()
+    total = len(artist_codes)
+    if size <= 0 or total == 0:
+        return EMPTY
+
+    skip = EMPTY
+    if excluded is not None and len(excluded):
+        skip = np.unique(excluded)
+        if total - len(skip) < size:
+            skip = EMPTY
+
+    skipped = np.bincount(artist_codes[skip], minlength=len(groups.counts))
+    available = groups.counts - skipped
+
+    turn = rng.permutation(len(groups.counts))
+    turn_available = available[turn]
+    takes = np.zeros(len(turn), dtype=np.int64)
+    remaining = size
+    for round_idx in range(max(artist_cap, 0)):
+        in_round = np.flatnonzero(turn_available > round_idx)
+        if not len(in_round):
+            break
+        if len(in_round) >= remaining:
+            takes[in_round[:remaining]] += 1
+            remaining = 0
+            break
+        takes[in_round] += 1
+        remaining -= len(in_round)
+
+    picked_turns = np.flatnonzero(takes)
+    # Artists giving a single track with nothing skipped are picked in one vectorised draw.
+    single = (takes[picked_turns] == 1) & (skipped[turn[picked_turns]] == 0)
+    single_turns = picked_turns[single]
+    single_artists = turn[single_turns]
+    offsets = (rng.random(len(single_artists)) * groups.counts[single_artists]).astype(np.int64)
+    picks = [groups.members[groups.starts[single_artists] + offsets]]
+    ranks = [single_turns.astype(np.int64)]
+    for turn_idx in picked_turns[~single].tolist():
+        artist = turn[turn_idx]
+        start = groups.starts[artist]
+        members = groups.members[start : start + groups.counts[artist]]
+        if skipped[artist]:
+            members = members[~np.isin(members, skip, assume_unique=True)]
+        count = int(takes[turn_idx])
+        if count == 1:
+            picks.append(members[rng.integers(len(members), size=1)])
+        else:
+            picks.append(rng.choice(members, count, replace=False))
+        ranks.append(np.arange(count, dtype=np.int64) * len(turn) + turn_idx)
+
+    positions = np.concatenate(picks)
+    selected = positions[np.argsort(np.concatenate(ranks), kind="stable")]
+
+    if len(selected) < size:
+        selected = np.concatenate([selected, _fill(selected, skip, total, size - len(selected), rng)])
+    return selected
+
+
+def sample_weighted_capped(
+    cumulative: np.ndarray,
+    artist_codes: np.ndarray,
+    size: int,
+    artist_cap: int,
+    excluded: Optional[np.ndarray] = None,
+    rng: Optional[np.random.Generator] = None,
+    max_rounds: int = 8,
+) -> np.ndarray:
+    """Pick up to ``size`` distinct positions with probability proportional to their weight.
+
+    ``cumulative`` is the running sum of the weights, so each draw is one
+    binary search. Draws that hit a duplicate, an ``excluded`` position or an
+    artist already at ``artist_cap`` are rejected and redrawn in the next
+    round. If weight is so concentrated on rejected tracks that ``max_rounds``
+    rounds are not enough, the rest is drawn exactly (Efraimidis-Spirakis)
+    over the eligible positions; any remaining shortfall ignores the cap.
+    """
+    rng = rng or np.random.default_rng()
+    total = len(artist_codes)
+    if size <= 0 or total == 0:
+        return EMPTY
+
+    skip = EMPTY
+    if excluded is not None and len(excluded):
+        skip = np.unique(excluded)
+        if total - len(skip) < size:
+            skip = EMPTY
+
+    total_weight = float(cumulative[total - 1])
+    selected = EMPTY
+    for _ in range(max_rounds if total_weight > 0 else 0):
+        needed = size - len(selected)
+        if needed <= 0:
+            return selected
+        draws = np.searchsorted(cumulative[:total], rng.random(2 * needed + 8) * total_weight, side="right")
+        draws = np.minimum(draws, total - 1)
+        _, first = np.unique(draws, return_index=True)
+        draws = draws[np.sort(first)]
+        draws = draws[~np.isin(draws, selected)]
+        if len(skip):
+            draws = draws[~np.isin(draws, skip, assume_unique=True)]
+        selected = take_artist_capped(
+            np.concatenate([selected, draws]), artist_codes, size, artist_cap, fill=False
+        )
+    if len(selected) >= size:
+        return selected
+
+    eligible = np.ones(total, dtype=bool)
+    eligible[skip] = False
+    eligible[selected] = False
+    eligible = np.flatnonzero(eligible)
+    weights = np.diff(cumulative[:total], prepend=0.0)[eligible]
+    with np.errstate(divide="ignore"):
+        keys = np.log(rng.random(len(eligible))) / weights
+    ordered = eligible[np.argsort(-keys, kind="stable")]
+    selected = take_artist_capped(np.concatenate([selected, ordered]), artist_codes, size, artist_cap, fill=False)
+    if len(selected) < size:
+        selected = np.concatenate([selected, _fill(selected, skip, total, size - len(selected), rng)])
+    return selected
+
+
+def _fill(
+    selected: np.ndarray,
+    skip: np.ndarray,
+    total: int,
+    needed: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    taken = np.zeros(total, dtype=bool)
+    taken[skip] = True
+    taken[selected] = True
+    leftovers = np.flatnonzero(~taken)
+    if len(leftovers) <= needed:
+        return rng.permutation(leftovers)
+    return rng.choice(leftovers, needed, replace=False)
+
+
+def take_artist_capped(
+    ordered: np.ndarray,
+    artist_codes: np.ndarray,
+    size: int,
+    artist_cap: int,
+    excluded: Optional[np.ndarray] = None,
+    fill: bool = True,
+) -> np.ndarray:
+    """Walk ``ordered`` positions (best first) keeping at most ``artist_cap`` per artist.
+
+    With ``fill`` the shortfall is topped up from the skipped positions in
+    their original order, ignoring the cap.
+    """
+    if size <= 0 or not len(ordered):
+        return EMPTY
+    if excluded is not None and len(excluded):
+        ordered = ordered[~np.isin(ordered, excluded)]
+    within_cap = _rank_within_artist(artist_codes[ordered]) < artist_cap
+    selected = ordered[within_cap][:size]
+    if fill and len(selected) < size:
+        selected = np.concatenate([selected, ordered[~within_cap][: size - len(selected)]])
+    return selected
+
+
+def _rank_within_artist(codes: np.ndarray) -> np.ndarray:
+    """0 for the first occurrence of each artist code, 1 for the second, and so on."""
+    by_artist = np.argsort(codes, kind="stable")
+    sorted_codes = codes[by_artist]
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    group_starts = np.zeros(len(codes), dtype=np.int64)
+    group_starts[boundaries] = boundaries
+    np.maximum.accumulate(group_starts, out=group_starts)
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[by_artist] = np.arange(len(codes)) - group_starts
+    return rank
+
+
+def deal_artist_capped(
+    groups: ArtistGroups,
+    artist_codes: np.ndarray,
+    sizes: Sequence[int],
+    artist_cap: int,
+    excluded: Optional[Sequence[np.ndarray]] = None,
+    rng: Optional[np.random.Generator] = None,
+    max_probes: int = 64,
+    cumulative: Optional[np.ndarray] = None,
+) -> List[np.ndarray]:
+    """Fill several playlists together so they share as few tracks as possible.
+
+    Tracks are dealt one slot at a time, round-robin across playlists, from a
+    deck drawn with ``sample_artist_capped`` over the least-used tracks. A
+    track is only reused once every other track has been dealt as often, so
+    overlap stays minimal; with ``cumulative`` weights the deck is drawn by
+    ``sample_weighted_capped`` so heavier tracks are dealt first within each
+    usage level. A candidate one playlist rejects (cooldown, artist
+    cap, already present) is offered to the next playlists first. Cost is
+    linear in the total number of slots. A playlist that cannot place a track
+    within ``max_probes`` candidates is topped up from its least-used leftovers
+    within the cap, then from anything left. ``excluded`` holds one cooldown
+    array per playlist, relaxed like in ``sample_artist_capped``.
+    """
+    rng = rng or np.random.default_rng()
+    total = len(artist_codes)
+    count = len(sizes)
+    if total == 0 or count == 0:
+        return [EMPTY for _ in range(count)]
+
+    targets = [min(max(size, 0), total) for size in sizes]
+    skips: List[set] = []
+    for index in range(count):
+        skip = excluded[index] if excluded is not None else EMPTY
+        skip = np.unique(skip) if len(skip) else EMPTY
+        skips.append(set(skip.tolist()) if total - len(skip) >= targets[index] else set())
+
+    chosen: List[List[int]] = [[] for _ in range(count)]
+    members: List[set] = [set() for _ in range(count)]
+    per_artist: List[Dict[int, int]] = [{} for _ in range(count)]
+    usage = np.zeros(total, dtype=np.int64)
+    level = 0
+    deck: List[int] = []
+    pending: Deque[int] = deque()
+    stalled: List[int] = []
+    remaining = sum(targets)
+
+    def accepts(index: int, position: int) -> bool:
+        return (
+            position not in members[index]
+            and position not in skips[index]
+            and per_artist[index].get(int(artist_codes[position]), 0) < artist_cap
+        )
+
+    def next_from_deck() -> int:
+        nonlocal deck, level
+        if not deck:
+            used = np.flatnonzero(usage > level)
+            if total - len(used) == 0:
+                level += 1
+                used = np.flatnonzero(usage > level)
+            budget = min(total - len(used), max(2 * remaining, 1024))
+            if cumulative is None:
+                drawn = sample_artist_capped(groups, artist_codes, budget, budget, excluded=used, rng=rng)
+            else:
+                drawn = sample_weighted_capped(cumulative, artist_codes, budget, budget, excluded=used, rng=rng)
+            deck = drawn.tolist()
+            deck.reverse()
+        return deck.pop()
+
+    active = [index for index in range(count) if targets[index] > 0]
+    while active:
+        still_active = []
+        for index in active:
+            placed = None
+            for _ in range(min(len(pending), 8)):
+                position = pending.popleft()
+                if accepts(index, position):
+                    placed = position
+                    break
+                pending.append(position)
+            probes = 0
+            while placed is None and probes < max_probes:
+                position = next_from_deck()
+                probes += 1
+                if accepts(index, position):
+                    placed = position
+                else:
+                    pending.append(position)
+            if placed is None:
+                stalled.append(index)
+                continue
+            chosen[index].append(placed)
+            members[index].add(placed)
+            artist = int(artist_codes[placed])
+            per_artist[index][artist] = per_artist[index].get(artist, 0) + 1
+            usage[placed] += 1
+            remaining -= 1
+            if len(chosen[index]) < targets[index]:
+                still_active.append(index)
+        active = still_active
+
+    results = [np.asarray(picks, dtype=np.int64) for picks in chosen]
+    for index in stalled:
+        needed = targets[index] - len(chosen[index])
+        skip = np.fromiter(skips[index], dtype=np.int64, count=len(skips[index]))
+        extra = _fill_capped(results[index], skip, artist_codes, needed, artist_cap, usage, rng)
+        usage[extra] += 1
+        results[index] = np.concatenate([results[index], extra])
+    return results
+
+
+def _fill_capped(
+    selected: np.ndarray,
+    skip: np.ndarray,
+    artist_codes: np.ndarray,
+    needed: int,
+    artist_cap: int,
+    usage: np.ndarray,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Least-used leftovers within the artist cap, then anything left ignoring the cap."""
+    total = len(artist_codes)
+    taken = np.zeros(total, dtype=bool)
+    taken[skip] = True
+    taken[selected] = True
+    artist_counts = np.bincount(artist_codes[selected], minlength=int(artist_codes.max()) + 1)
+    leftovers = np.flatnonzero(~taken)
+    ordered = leftovers[np.lexsort((rng.random(len(leftovers)), usage[leftovers]))]
+    codes = artist_codes[ordered]
+    picks = ordered[_rank_within_artist(codes) + artist_counts[codes] < artist_cap][:needed]
+    if len(picks) < needed:
+        taken[picks] = True
+        picks = np.concatenate([picks, _fill(EMPTY, np.flatnonzero(taken), total, needed - len(picks), rng)])
+    return picks
@@ -9,3 +9,23 @@ def utc_now() -> datetime:
 
 def add_days(value: datetime, days: int) -> datetime:
     return value + timedelta(days=days)
+
+
+def epoch_seconds(value: datetime) -> float:
+    """Seconds since the Unix epoch; naive datetimes are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Start of the ``hour``, ``day`` or ISO ``week`` (Monday) containing ``value``."""
+    hour = value.replace(minute=0, second=0, microsecond=0)
+    if granularity == "hour":
+        return hour
+    day = hour.replace(hour=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown granularity {granularity}")
@@ -0,0 +1,532 @@
+"""Local stand-in for the Spotify Web API with latency and fault injection.
+
+Usage::
+
+    python -m benchmarks.fake_spotify --port 8900 \\
+        --latency lognormal:40:0.5 --rate-429 0.01 --rate-5xx 0.005
+
+then point the backend at it with ``SPOTIFY_API_BASE=http://127.0.0.1:8900/v1``
+and ``SPOTIFY_AUTH_BASE=http://127.0.0.1:8900``. Albums, tracks and audio
+features are derived from the requested ids and ``--seed``, so any album id
+resolves and repeated runs see the same catalog. Playlists live in memory
+until the process exits or ``POST /_fake/reset`` is called; injected faults
+and per-route counts are reported at ``GET /_fake/stats``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import secrets
+import string
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlencode
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse
+from starlette.datastructures import URL
+
+ALPHABET = string.digits + string.ascii_letters
+MAX_ALBUM_PAGE = 50
+MAX_PLAYLIST_PAGE = 100
+MAX_ITEMS_PER_REQUEST = 100
+MAX_AUDIO_FEATURE_IDS = 100
+MAX_ALBUM_IDS = 20
+SERVER_ERRORS = (500, 502, 503)
+FEATURE_RANGES = {
+    "danceability": (0.0, 1.0),
+    "energy": (0.0, 1.0),
+    "valence": (0.0, 1.0),
+    "acousticness": (0.0, 1.0),
+    "instrumentalness": (0.0, 1.0),
+    "liveness": (0.0, 1.0),
+    "speechiness": (0.0, 1.0),
+    "tempo": (60.0, 190.0),
+    "loudness": (-30.0, 0.0),
+}
+
+
+@dataclass(frozen=True)
+class LatencySpec:
+    """Per-request delay in milliseconds, parsed from ``kind[:a[:b]]``.
+
+    ``none``, ``fixed:MS``, ``uniform:LO:HI``, ``normal:MEAN:SD``,
+    ``lognormal:MEDIAN:SIGMA`` and ``exp:MEAN`` are supported.
+    """
+
+    kind: str = "none"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, value: str) -> "LatencySpec":
+        kind, *args = value.split(":")
+        arity = {"none": 0, "fixed": 1, "exp": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in arity or len(args) != arity[kind]:
+            raise ValueError(f"invalid latency spec {value!r}")
+        numbers = [float(arg) for arg in args] + [0.0, 0.0]
+        return cls(kind=kind, a=numbers[0], b=numbers[1])
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.a
+        elif self.kind == "uniform":
+            value = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            value = rng.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            value = self.a * math.exp(rng.gauss(0.0, self.b)) if self.a > 0 else 0.0
+        elif self.kind == "exp":
+            value = rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        else:
+            value = 0.0
+        return max(value, 0.0)
+
+
+@dataclass
+class FakeSpotifyConfig:
+    latency: LatencySpec = field(default_factory=LatencySpec)
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after_seconds: int = 1
+    rate_limit_per_second: float = 0.0
+    rate_limit_burst: int = 20
+    tracks_per_album: Tuple[int, int] = (8, 24)
+    artists_per_album: int = 3
+    seed: int = 7
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 when admitted, else seconds until one is free."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+def _spotify_id(*parts: Any) -> str:
+    digest = int.from_bytes(hashlib.sha1(":".join(map(str, parts)).encode()).digest(), "big")
+    chars = []
+    for _ in range(22):
+        digest, index = divmod(digest, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return "".join(chars)
+
+
+class FakeCatalog:
+    """Deterministic albums and audio features keyed by id and seed."""
+
+    def __init__(self, config: FakeSpotifyConfig) -> None:
+        self.config = config
+        self._albums: Dict[str, List[Dict[str, Any]]] = {}
+        self._album_meta: Dict[str, Dict[str, Any]] = {}
+        self._features: Dict[str, Dict[str, Any]] = {}
+
+    def album_tracks(self, album_id: str) -> List[Dict[str, Any]]:
+        tracks = self._albums.get(album_id)
+        if tracks is None:
+            rng = random.Random(f"{self.config.seed}:album:{album_id}")
+            low, high = self.config.tracks_per_album
+            artists = [
+                {"id": _spotify_id(self.config.seed, album_id, "artist", i), "name": f"Artist {album_id[:6]}-{i}"}
+                for i in range(max(self.config.artists_per_album, 1))
+            ]
+            album = {
+                "id": album_id,
+                "name": f"Album {album_id[:8]}",
+                "uri": f"spotify:album:{album_id}",
+                "artists": artists[:1],
+            }
+            tracks = []
+            for number in range(1, rng.randint(low, max(low, high)) + 1):
+                track_id = _spotify_id(self.config.seed, album_id, number)
+                tracks.append(
+                    {
+                        "id": track_id,
+                        "uri": f"spotify:track:{track_id}",
+                        "name": f"Track {number}",
+                        "track_number": number,
+                        "duration_ms": rng.randint(120_000, 360_000),
+                        # Simplified tracks carry neither field on Spotify; ingest reads both.
+                        "popularity": rng.randint(0, 100),
+                        "album": album,
+                        "artists": [rng.choice(artists)],
+                    }
+                )
+            self._albums[album_id] = tracks
+            self._album_meta[album_id] = album
+        return tracks
+
+    def album(self, album_id: str) -> Dict[str, Any]:
+        self.album_tracks(album_id)
+        return self._album_meta[album_id]
+
+    def audio_features(self, track_id: str) -> Dict[str, Any]:
+        features = self._features.get(track_id)
+        if features is None:
+            rng = random.Random(f"{self.config.seed}:features:{track_id}")
+            features = {name: round(rng.uniform(low, high), 4) for name, (low, high) in FEATURE_RANGES.items()}
+            features.update(id=track_id, uri=f"spotify:track:{track_id}", type="audio_features")
+            self._features[track_id] = features
+        return features
+
+
+@dataclass
+class FakePlaylist:
+    id: str
+    owner: str
+    name: str
+    description: str
+    public: bool
+    uris: List[str] = field(default_factory=list)
+    version: int = 0
+
+    @property
+    def snapshot_id(self) -> str:
+        return _spotify_id(self.id, "snapshot", self.version)
+
+    def bump(self) -> Dict[str, str]:
+        self.version += 1
+        return {"snapshot_id": self.snapshot_id}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "public": self.public,
+            "owner": {"id": self.owner},
+            "snapshot_id": self.snapshot_id,
+            "tracks": {"total": len(self.uris)},
+            "uri": f"spotify:playlist:{self.id}",
+        }
+
+
+def _page(url: URL, items: List[Any], offset: int, limit: int) -> Dict[str, Any]:
+    def link(start: int) -> str:
+        return str(url.include_query_params(offset=start, limit=limit))
+
+    end = offset + limit
+    return {
+        "href": link(offset),
+        "items": items[offset:end],
+        "limit": limit,
+        "offset": offset,
+        "total": len(items),
+        "next": link(end) if end < len(items) else None,
+        "previous": link(max(offset - limit, 0)) if offset > 0 else None,
+    }
+
+
+def _etagged(request: Request, body: Dict[str, Any]) -> Response:
+    payload = json.dumps(body, separators=(",", ":")).encode()
+    etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+
+def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": {"status": status, "message": message}}, status_code=status, headers=headers)
+
+
+def create_app(config: Optional[FakeSpotifyConfig] = None) -> FastAPI:
+    config = config or FakeSpotifyConfig()
+    app = FastAPI(title="Fake Spotify Web API")
+    rng = random.Random(config.seed)
+    catalog = FakeCatalog(config)
+    bucket: Optional[_TokenBucket] = None
+    if config.rate_limit_per_second > 0:
+        bucket = _TokenBucket(config.rate_limit_per_second, config.rate_limit_burst)
+    state: Dict[str, Any] = {}
+    stats: Counter = Counter()
+
+    def reset() -> None:
+        state["playlists"] = {}
+        state["tokens"] = {}
+        stats.clear()
+
+    reset()
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next: Any) -> Response:
+        if request.url.path.startswith("/_fake"):
+            return await call_next(request)
+        stats["requests"] += 1
+        delay = config.latency.sample_ms(rng)
+        if delay:
+            await asyncio.sleep(delay / 1000.0)
+        wait = bucket.take() if bucket is not None else 0.0
+        if wait:
+            stats["rate_limited"] += 1
+            return _error(429, "API rate limit exceeded", {"Retry-After": str(max(math.ceil(wait), 1))})
+        if config.rate_429 and rng.random() < config.rate_429:
+            stats["injected_429"] += 1
+            return _error(429, "API rate limit exceeded", {"Retry-After": str(config.retry_after_seconds)})
+        if config.rate_5xx and rng.random() < config.rate_5xx:
+            stats["injected_5xx"] += 1
+            status = rng.choice(SERVER_ERRORS)
+            return _error(status, "Injected server error")
+        response = await call_next(request)
+        route = request.scope.get("route")
+        stats[f"{request.method} {getattr(route, 'path', request.url.path)}"] += 1
+        return response
+
+    def user_for(authorization: Optional[str]) -> str:
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="No token provided")
+        token = authorization[len("Bearer ") :]
+        return state["tokens"].get(token) or f"user-{hashlib.sha1(token.encode()).hexdigest()[:10]}"
+
+    def playlist_for(playlist_id: str) -> FakePlaylist:
+        playlist = state["playlists"].get(playlist_id)
+        if playlist is None:
+            raise HTTPException(status_code=404, detail="Not found.")
+        return playlist
+
+    def check_batch(uris: Sequence[Any]) -> None:
+        if len(uris) > MAX_ITEMS_PER_REQUEST:
+            raise HTTPException(status_code=400, detail=f"Too many ids requested, max {MAX_ITEMS_PER_REQUEST}")
+
+    @app.get("/authorize")
+    async def authorize(redirect_uri: str, state_: str = Query("", alias="state")) -> RedirectResponse:
+        query = urlencode({"code": secrets.token_urlsafe(12), "state": state_})
+        return RedirectResponse(f"{redirect_uri}?{query}")
+
+    @app.post("/api/token")
+    async def token(request: Request) -> Dict[str, Any]:
+        # Parsed by hand so the stand-in does not need python-multipart.
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        grant_type = form.get("grant_type")
+        refresh_token = form.get("refresh_token")
+        if grant_type not in {"authorization_code", "refresh_token"}:
+            raise HTTPException(status_code=400, detail="unsupported_grant_type")
+        refresh = refresh_token or f"fake-refresh-{secrets.token_urlsafe(12)}"
+        access = f"fake-access-{secrets.token_urlsafe(12)}"
+        state["tokens"][access] = f"user-{hashlib.sha1(refresh.encode()).hexdigest()[:10]}"
+        payload = {"access_token": access, "token_type": "Bearer", "expires_in": 3600, "scope": ""}
+        if grant_type == "authorization_code":
+            payload["refresh_token"] = refresh
+        return payload
+
+    @app.get("/v1/me")
+    async def me(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+        user_id = user_for(authorization)
+        return {"id": user_id, "display_name": user_id, "email": f"{user_id}@example.invalid"}
+
+    @app.post("/v1/users/{user_id}/playlists", status_code=201)
+    async def create_playlist(
+        user_id: str,
+        request: Request,
+        authorization: Optional[str] = Header(None),
+    ) -> Dict[str, Any]:
+        user_for(authorization)
+        body = await request.json()
+        playlist = FakePlaylist(
+            id=_spotify_id("playlist", secrets.token_hex(8)),
+            owner=user_id,
+            name=body.get("name", ""),
+            description=body.get("description", ""),
+            public=bool(body.get("public", True)),
+        )
+        state["playlists"][playlist.id] = playlist
+        return playlist.as_dict()
+
+    @app.get("/v1/users/{user_id}/playlists")
+    async def list_playlists(
+        user_id: str,
+        request: Request,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=50),
+        authorization: Optional[str] = Header(None),
+    ) -> Dict[str, Any]:
+        user_for(authorization)
+        owned = [playlist.as_dict() for playlist in state["playlists"].values() if playlist.owner == user_id]
+        return _page(request.url, owned, offset, limit)
+
+    @app.get("/v1/playlists/{playlist_id}")
+    async def get_playlist(playlist_id: str, authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+        user_for(authorization)
+        return playlist_for(playlist_id).as_dict()
+
+    @app.put("/v1/playlists/{playlist_id}")
+    async def update_playlist(
+        playlist_id: str,
+        request: Request,
+        authorization: Optional[str] = Header(None),
+    ) -> Response:
+        user_for(authorization)
+        playlist = playlist_for(playlist_id)
+        body = await request.json()
+        playlist.name = body.get("name", playlist.name)
+        playlist.description = body.get("description", playlist.description)
+        playlist.public = bool(body.get("public", playlist.public))
+        return Response(status_code=200)
+
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    async def get_playlist_items(
+        playlist_id: str,
+        request: Request,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(MAX_PLAYLIST_PAGE, ge=1, le=MAX_PLAYLIST_PAGE),
+        authorization: Optional[str] = Header(None),
+    ) -> Dict[str, Any]:
+        user_for(authorization)
+        items = [{"track": {"uri": uri, "id": uri.rsplit(":", 1)[-1]}} for uri in playlist_for(playlist_id).uris]
+        return _page(request.url, items, offset, limit)
+
+    @app.put("/v1/playlists/{playlist_id}/tracks")
+    async def replace_or_reorder(
+        playlist_id: str,
+        request: Request,
+        authorization: Optional[str] = Header(None),
+    ) -> Dict[str, Any]:
+        user_for(authorization)
+        playlist = playlist_for(playlist_id)
+        body = await request.json()
+        if "uris" in body:
+            check_batch(body["uris"])
+            playlist.uris = list(body["uris"])
+            return playlist.bump()
+        start = int(body["range_start"])
+        length = int(body.get("range_length", 1))
+        before = int(body["insert_before"])
+        if not (0 <= start and start + length <= len(playlist.uris) and 0 <= before <= len(playlist.uris)):
+            raise HTTPException(status_code=400, detail="Index out of bounds")
+        moved = playlist.uris[start : start + length]
+        rest = playlist.uris[:start] + playlist.uris[start + length :]
+        target = before if before <= start else before - length
+        playlist.uris = rest[:target] + moved + rest[target:]
+        return playlist.bump()
+
+    @app.post("/v1/playlists/{playlist_id}/tracks", status_code=201)
+    async def add_items(
+        playlist_id: str,
+        request: Request,
+        authorization: Optional[str] = Header(None),
+    ) -> Dict[str, Any]:
+        user_for(authorization)
+        playlist = playlist_for(playlist_id)
+        body = await request.json()
+        uris = list(body.get("uris", []))
+        check_batch(uris)
+        position = body.get("position")
+        position = len(playlist.uris) if position is None else min(int(position), len(playlist.uris))
+        playlist.uris[position:position] = uris
+        return playlist.bump()
+
+    @app.delete("/v1/playlists/{playlist_id}/tracks")
+    async def remove_items(
+        playlist_id: str,
+        request: Request,
+        authorization: Optional[str] = Header(None),
+    ) -> Dict[str, Any]:
+        user_for(authorization)
+        playlist = playlist_for(playlist_id)
+        body = await request.json()
+        removed = {item["uri"] for item in body.get("tracks", [])}
+        check_batch(list(removed))
+        playlist.uris = [uri for uri in playlist.uris if uri not in removed]
+        return playlist.bump()
+
+    @app.get("/v1/albums")
+    async def albums(request: Request, ids: str, authorization: Optional[str] = Header(None)) -> Response:
+        user_for(authorization)
+        album_ids = [album_id for album_id in ids.split(",") if album_id]
+        if len(album_ids) > MAX_ALBUM_IDS:
+            raise HTTPException(status_code=400, detail=f"Too many ids requested, max {MAX_ALBUM_IDS}")
+        found = []
+        for album_id in album_ids:
+            tracks = catalog.album_tracks(album_id)
+            page_url = URL(str(request.url_for("album_tracks", album_id=album_id)))
+            found.append({**catalog.album(album_id), "tracks": _page(page_url, tracks, 0, MAX_ALBUM_PAGE)})
+        return _etagged(request, {"albums": found})
+
+    @app.get("/v1/albums/{album_id}/tracks")
+    async def album_tracks(
+        album_id: str,
+        request: Request,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=MAX_ALBUM_PAGE),
+        authorization: Optional[str] = Header(None),
+    ) -> Response:
+        user_for(authorization)
+        return _etagged(request, _page(request.url, catalog.album_tracks(album_id), offset, limit))
+
+    @app.get("/v1/audio-features")
+    async def audio_features(request: Request, ids: str, authorization: Optional[str] = Header(None)) -> Response:
+        user_for(authorization)
+        track_ids = [track_id for track_id in ids.split(",") if track_id]
+        if len(track_ids) > MAX_AUDIO_FEATURE_IDS:
+            raise HTTPException(status_code=400, detail=f"Too many ids requested, max {MAX_AUDIO_FEATURE_IDS}")
+        return _etagged(request, {"audio_features": [catalog.audio_features(track_id) for track_id in track_ids]})
+
+    @app.get("/_fake/stats")
+    async def fake_stats() -> Dict[str, Any]:
+        return {"playlists": len(state["playlists"]), "counts": dict(stats)}
+
+    @app.post("/_fake/reset")
+    async def fake_reset() -> Dict[str, str]:
+        reset()
+        return {"status": "ok"}
+
+    return app
+
+
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument(
+        "--latency",
+        type=LatencySpec.parse,
+        default=LatencySpec(),
+        help="none | fixed:MS | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA | exp:MEAN",
+    )
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of an injected 429 per request")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Probability of an injected 5xx per request")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Token-bucket requests per second, 0 disables")
+    parser.add_argument("--burst", type=int, default=20, help="Token-bucket capacity for --rate-limit")
+    parser.add_argument("--tracks-per-album", type=int, nargs=2, default=(8, 24), metavar=("MIN", "MAX"))
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import uvicorn
+
+    args = _parse_args(argv)
+    config = FakeSpotifyConfig(
+        latency=args.latency,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after_seconds=args.retry_after,
+        rate_limit_per_second=args.rate_limit,
+        rate_limit_burst=args.burst,
+        tracks_per_album=tuple(args.tracks_per_album),
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import json
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.engine import Engine
+
+from app.db.models import Album, Playlist, PlaylistEntryHistory, Setting, SpotifyAccount, Track
+from app.db.session import Base
+
+DATASET_KEY = "benchmark_dataset"
+INSERT_CHUNK = 20_000
+TRACKS_PER_ALBUM = 12
+FEATURE_RANGES = {
+    "danceability": (0.0, 1.0),
+    "energy": (0.0, 1.0),
+    "valence": (0.0, 1.0),
+    "acousticness": (0.0, 1.0),
+    "instrumentalness": (0.0, 1.0),
+    "liveness": (0.0, 1.0),
+    "speechiness": (0.0, 1.0),
+    "tempo": (60.0, 190.0),
+    "loudness": (-30.0, 0.0),
+}
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Shape of a synthetic catalog plus its playlist history."""
+
+    tracks: int
+    artists: int
+    artist_skew: float = 1.1
+    playlists: int = 200
+    vibe_playlists: int = 20
+    playlist_size: int = 50
+    reshuffle_interval_days: int = 7
+    history_days: int = 730
+    seed: int = 7
+
+    @classmethod
+    def for_catalog(cls, tracks: int, **overrides: Any) -> "DatasetSpec":
+        overrides.setdefault("artists", max(1, tracks // 8))
+        return cls(tracks=tracks, **overrides)
+
+    @property
+    def history_rows(self) -> int:
+        batches = -(-self.history_days // self.reshuffle_interval_days)
+        return (self.playlists + self.vibe_playlists) * batches * self.playlist_size
+
+    def fingerprint(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+def _uuids(rng: np.random.Generator, count: int) -> List[uuid.UUID]:
+    raw = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    return [uuid.UUID(bytes=row.tobytes(), version=4) for row in raw]
+
+
+def _artist_assignments(rng: np.random.Generator, spec: DatasetSpec) -> np.ndarray:
+    """Zipf-like artist per track: a handful of artists own a large share of the catalog."""
+    weights = 1.0 / np.arange(1, spec.artists + 1, dtype=np.float64) ** spec.artist_skew
+    return rng.choice(spec.artists, size=spec.tracks, p=weights / weights.sum())
+
+
+def _audio_features(rng: np.random.Generator, count: int) -> np.ndarray:
+    low = np.array([bounds[0] for bounds in FEATURE_RANGES.values()])
+    high = np.array([bounds[1] for bounds in FEATURE_RANGES.values()])
+    return low + rng.beta(2.0, 2.0, size=(count, len(FEATURE_RANGES))) * (high - low)
+
+
+def _insert(engine: Engine, table, rows: List[Dict[str, Any]]) -> None:
+    with engine.begin() as conn:
+        for start in range(0, len(rows), INSERT_CHUNK):
+            conn.execute(table.insert(), rows[start : start + INSERT_CHUNK])
+
+
+def is_loaded(engine: Engine, spec: DatasetSpec) -> bool:
+    if not inspect(engine).has_table(Setting.__tablename__):
+        return False
+    with engine.connect() as conn:
+        value = conn.execute(select(Setting.value).where(Setting.key == DATASET_KEY)).scalar()
+    return value == spec.fingerprint()
+
+
+def forget(engine: Engine) -> None:
+    """Mark the loaded dataset as dirty so the next run regenerates it."""
+    with engine.begin() as conn:
+        conn.execute(delete(Setting.__table__).where(Setting.key == DATASET_KEY))
+
+
+def generate(engine: Engine, spec: DatasetSpec) -> Dict[str, Any]:
+    """Drop and recreate every table in ``engine``'s database, then fill it per ``spec``.
+
+    Returns the ids the benchmark needs to drive the samplers.
+    """
+    rng = np.random.default_rng(spec.seed)
+    now = datetime.utcnow()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    account_id = uuid.uuid4()
+    _insert(
+        engine,
+        SpotifyAccount.__table__,
+        [
+            {
+                "id": account_id,
+                "display_name": "Benchmark",
+                "spotify_user_id": "benchmark",
+                "prefix": "Bench",
+                "access_token": "-",
+                "refresh_token": "-",
+                "expires_at": now + timedelta(days=365),
+                "playlists_count": spec.playlists + spec.vibe_playlists,
+                "status": "active",
+                "created_at": now,
+                "updated_at": now,
+            }
+        ],
+    )
+
+    artist_of = _artist_assignments(rng, spec)
+    album_count = -(-spec.tracks // TRACKS_PER_ALBUM)
+    album_ids = _uuids(rng, album_count)
+    album_of = np.arange(spec.tracks) // TRACKS_PER_ALBUM
+    album_artist = np.zeros(album_count, dtype=np.int64)
+    album_artist[album_of] = artist_of
+    _insert(
+        engine,
+        Album.__table__,
+        [
+            {
+                "id": album_ids[index],
+                "spotify_id": f"album{index:09d}",
+                "name": f"Album {index}",
+                "artist": f"Artist {album_artist[index]}",
+                "track_count": TRACKS_PER_ALBUM,
+                "added_at": now,
+            }
+            for index in range(album_count)
+        ],
+    )
+
+    track_ids = _uuids(rng, spec.tracks)
+    popularity = np.clip(rng.normal(35, 20, size=spec.tracks), 0, 100).astype(int)
+    has_popularity = rng.random(spec.tracks) > 0.05
+    features = _audio_features(rng, spec.tracks)
+    has_features = rng.random(spec.tracks) > 0.1
+    created_offsets = rng.integers(0, spec.history_days * 86_400, size=spec.tracks)
+    names = list(FEATURE_RANGES)
+    rows = []
+    for index in range(spec.tracks):
+        rows.append(
+            {
+                "id": track_ids[index],
+                "spotify_id": f"track{index:010d}",
+                "name": f"Track {index}",
+                "artist": f"Artist {artist_of[index]}",
+                "popularity": int(popularity[index]) if has_popularity[index] else None,
+                "album_id": album_ids[album_of[index]],
+                "audio_features": dict(zip(names, features[index].round(4).tolist()))
+                if has_features[index]
+                else None,
+                "is_usable": True,
+                "created_at": now - timedelta(seconds=int(created_offsets[index])),
+            }
+        )
+        if len(rows) == INSERT_CHUNK:
+            _insert(engine, Track.__table__, rows)
+            rows = []
+    _insert(engine, Track.__table__, rows)
+
+    playlist_ids = _uuids(rng, spec.playlists)
+    vibe_playlist_ids = _uuids(rng, spec.vibe_playlists)
+    playlist_rows = []
+    for index, playlist_id in enumerate(playlist_ids + vibe_playlist_ids):
+        vibe = None
+        if index >= spec.playlists:
+            vibe = {"seed_track_id": None, "target": {"energy": float(rng.random()), "valence": float(rng.random())}}
+        playlist_rows.append(
+            {
+                "id": playlist_id,
+                "name": f"Bench {index + 1}",
+                "prefix": "Bench",
+                "account_id": account_id,
+                "size": spec.playlist_size,
+                "last_reshuffled_at": now,
+                "next_reshuffle_at": now + timedelta(days=spec.reshuffle_interval_days),
+                "vibe": vibe,
+                "created_at": now - timedelta(days=spec.history_days),
+                "updated_at": now,
+            }
+        )
+    _insert(engine, Playlist.__table__, playlist_rows)
+
+    batch_size = min(spec.playlist_size, spec.tracks)
+    history = []
+    for playlist_id in playlist_ids + vibe_playlist_ids:
+        for age in range(0, spec.history_days, spec.reshuffle_interval_days):
+            added_at = now - timedelta(days=age)
+            batch_tag = added_at.strftime("%Y-%m-%d")
+            for position in rng.choice(spec.tracks, size=batch_size, replace=False).tolist():
+                history.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "playlist_id": playlist_id,
+                        "track_id": track_ids[position],
+                        "added_at": added_at,
+                        "batch_tag": batch_tag,
+                    }
+                )
+            if len(history) >= INSERT_CHUNK:
+                _insert(engine, PlaylistEntryHistory.__table__, history)
+                history = []
+    _insert(engine, PlaylistEntryHistory.__table__, history)
+
+    _insert(
+        engine,
+        Setting.__table__,
+        [{"id": uuid.uuid4(), "key": DATASET_KEY, "value": spec.fingerprint(), "updated_at": now}],
+    )
+    return load_ids(engine)
+
+
+def load_ids(engine: Engine) -> Dict[str, Any]:
+    with engine.connect() as conn:
+        rows = conn.execute(select(Playlist.id, Playlist.vibe).order_by(Playlist.name)).all()
+    return {
+        "playlists": [str(playlist_id) for playlist_id, vibe in rows if not vibe],
+        "vibe_playlists": [str(playlist_id) for playlist_id, vibe in rows if vibe],
+    }
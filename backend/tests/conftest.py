@@ -0,0 +1,76 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import time. Tests get a throwaway SQLite database
+# unless TEST_DATABASE_URL names another one (PostgreSQL for the
+# ``postgres``-marked tests); a DATABASE_URL from the shell is never used.
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="vibe-tests-"), "test.db"
+)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "test")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "test")
+
+from sqlalchemy.dialects.postgresql import UUID  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+
+
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kwargs) -> str:
+    return "CHAR(32)"
+
+
+def _redis_reachable() -> bool:
+    import redis
+
+    try:
+        return bool(redis.Redis.from_url(os.environ["REDIS_URL"], socket_connect_timeout=0.5).ping())
+    except redis.RedisError:
+        return False
+
+
+def pytest_collection_modifyitems(config, items):
+    skips = {}
+    if not os.environ["DATABASE_URL"].startswith("postgresql"):
+        skips["postgres"] = pytest.mark.skip(reason="needs TEST_DATABASE_URL pointing at PostgreSQL")
+    if any(item.get_closest_marker("redis") for item in items) and not _redis_reachable():
+        skips["redis"] = pytest.mark.skip(reason="needs a Redis server at REDIS_URL")
+    for item in items:
+        for marker, skip in skips.items():
+            if item.get_closest_marker(marker):
+                item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def schema():
+    import app.db.models  # noqa: F401
+    from app.db.session import Base, engine
+
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def db(schema):
+    """A sync session on an empty schema; every table and the process-wide catalog are cleared afterwards."""
+    from app.db.session import Base, SessionLocal, async_engine
+    from app.services.catalog_service import catalog_service
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        catalog_service.invalidate()
+        # Pooled aiosqlite connections belong to the event loop of the test that opened them.
+        asyncio.run(async_engine.dispose())
+        with schema.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
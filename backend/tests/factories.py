@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Album, Playlist, SpotifyAccount, Track
+
+
+def add_tracks(db: Session, count: int, artists: int = 10) -> List[Track]:
+    album = Album(spotify_id=f"album-{count}-{artists}", name="Album", artist="Artist")
+    db.add(album)
+    db.flush()
+    tracks = [
+        Track(spotify_id=f"track-{index}", name=f"Track {index}", artist=f"Artist {index % artists}", album_id=album.id)
+        for index in range(count)
+    ]
+    db.add_all(tracks)
+    db.commit()
+    return tracks
+
+
+def add_account(db: Session, name: str, playlists: int = 0, size: int = 5) -> SpotifyAccount:
+    account = SpotifyAccount(
+        display_name=name,
+        spotify_user_id=name,
+        access_token="access",
+        refresh_token="refresh",
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+        playlists_count=playlists,
+    )
+    db.add(account)
+    db.flush()
+    for index in range(playlists):
+        db.add(
+            Playlist(
+                account_id=account.id,
+                name=f"{name} {index}",
+                prefix=name,
+                size=size,
+                spotify_playlist_id=f"{name}-{index}",
+            )
+        )
+    db.commit()
+    return account
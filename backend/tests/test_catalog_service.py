@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import numpy as np
+from sqlalchemy import text
+
+from app.db.models import Album, Track
+from app.db.session import AsyncSessionLocal
+from app.services.catalog_service import CatalogService, CatalogTrack
+from app.services.feature_index import AUDIO_FEATURES, FeatureIndex
+
+DEADLOCK_TIMEOUT = 10.0
+
+
+def features(value: float) -> dict:
+    return {name: value for name in AUDIO_FEATURES}
+
+
+def add_tracks(db, count: int, artists: int = 5) -> None:
+    album = Album(spotify_id="album", name="Album", artist="Artist")
+    db.add(album)
+    db.flush()
+    for index in range(count):
+        db.add(
+            Track(
+                spotify_id=f"track-{index}",
+                name=f"Track {index}",
+                artist=f"Artist {index % artists}",
+                popularity=index % 100,
+                album_id=album.id,
+                audio_features=features(index / count),
+            )
+        )
+    db.commit()
+
+
+def run_concurrently(*calls):
+    """Run ``session.run_sync(call)`` for every call at once, each on its own ``AsyncSession``.
+
+    The loop runs on a helper thread: a deadlock blocks the loop thread
+    itself, so ``asyncio.wait_for`` would never fire.
+    """
+    results = []
+
+    async def main():
+        # SQLAlchemy runs a new pool's first connect under a mutex of its own; open it before racing.
+        async with AsyncSessionLocal() as session:
+            await session.execute(text("SELECT 1"))
+
+        async def one(call):
+            async with AsyncSessionLocal() as session:
+                return await session.run_sync(call)
+
+        results.extend(await asyncio.gather(*(one(call) for call in calls)))
+
+    thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    thread.join(DEADLOCK_TIMEOUT)
+    assert not thread.is_alive(), "concurrent loads deadlocked the event loop"
+    return results
+
+
+def test_concurrent_async_loads_do_not_deadlock(db):
+    add_tracks(db, 50)
+    catalog = CatalogService()
+    first, second = run_concurrently(catalog.get, catalog.get)
+    assert len(first) == len(second) == 50
+    assert catalog.current() in (first, second)
+
+
+def test_concurrent_feature_loads_do_not_deadlock(db):
+    add_tracks(db, 50)
+    snapshot = CatalogService().get(db)
+    index = FeatureIndex()
+    first, second = run_concurrently(
+        lambda session: index.get(session, snapshot), lambda session: index.get(session, snapshot)
+    )
+    assert len(first) == len(second) == 50
+    assert first.present.all()
+
+
+def test_unchanged_reload_keeps_the_generation(db):
+    add_tracks(db, 20)
+    catalog = CatalogService()
+    loaded = catalog.get(db)
+    catalog.settings.catalog_refresh_seconds, ttl = 1, catalog.settings.catalog_refresh_seconds
+    try:
+        loaded.loaded_at -= 10
+        assert catalog.get(db) is loaded
+        db.query(Track).filter(Track.spotify_id == "track-3").update({"artist": "Renamed"})
+        db.commit()
+        loaded.loaded_at -= 10
+        reloaded = catalog.get(db)
+    finally:
+        catalog.settings.catalog_refresh_seconds = ttl
+    assert reloaded.generation == loaded.generation
+    assert reloaded.version == loaded.version + 1
+    changed = db.query(Track.id).filter(Track.spotify_id == "track-3").scalar()
+    assert reloaded.track(reloaded.positions[changed]).artist == "Renamed"
+
+
+def test_added_tracks_extend_the_feature_matrix(db):
+    add_tracks(db, 10)
+    catalog = CatalogService()
+    index = FeatureIndex()
+    matrix = index.get(db, catalog.get(db))
+    album = db.query(Album).one()
+    extra = Track(spotify_id="extra", name="Extra", artist="New", album_id=album.id, audio_features=features(1.0))
+    db.add(extra)
+    db.commit()
+    catalog.add_tracks([CatalogTrack(id=extra.id, spotify_id="extra", artist="New", popularity=None)])
+    extended = index.get(db, catalog.current())
+    assert extended is matrix
+    assert len(extended) == 11
+    assert np.count_nonzero(extended.present) == 11
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.rate_limiter import RateLimiter
+from app.services.spotify_service import SpotifyService, spotify_service
+from app.services.token_service import TokenService
+
+
+class ClosableClient:
+    def __init__(self) -> None:
+        self.closed_on = None
+
+    async def aclose(self) -> None:
+        self.closed_on = asyncio.get_running_loop()
+
+
+async def current_client(service: SpotifyService):
+    return service._http()
+
+
+def test_replaced_client_is_closed_on_the_loop_that_owns_it():
+    service = SpotifyService()
+    old_loop = asyncio.new_event_loop()
+    try:
+        first = old_loop.run_until_complete(current_client(service))
+        second = asyncio.run(current_client(service))
+    finally:
+        old_loop.close()
+    assert second is not first
+    assert first.is_closed
+    assert not second.is_closed
+
+
+def test_worker_tasks_share_one_client_until_shutdown():
+    import app.api  # noqa: F401  metrics_service and the API package import each other
+
+    # ``workers`` sits next to ``backend``; containers that mount only the backend skip this.
+    tasks = pytest.importorskip("workers.tasks")
+
+    first = tasks.run_async(current_client(spotify_service))
+    second = tasks.run_async(current_client(spotify_service))
+    assert first is second
+    tasks.close_event_loop()
+    assert first.is_closed
+    assert spotify_service._client is None
+
+
+def test_rebinding_closes_the_previous_redis_clients():
+    limiter = RateLimiter()
+    tokens = TokenService()
+    old_loop = asyncio.new_event_loop()
+
+    async def bind() -> None:
+        limiter._bind()
+        tokens._bind()
+
+    try:
+        old_loop.run_until_complete(bind())
+        limiter_redis, token_redis = ClosableClient(), ClosableClient()
+        limiter._redis, tokens._redis = limiter_redis, token_redis
+        asyncio.run(bind())
+    finally:
+        old_loop.close()
+    assert limiter_redis.closed_on is old_loop
+    assert token_redis.closed_on is old_loop
+    assert limiter._redis is None and tokens._redis is None
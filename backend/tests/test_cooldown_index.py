@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.models import Album, Playlist, PlaylistEntryHistory, PlaylistHistoryBatch, Track
+from app.services.catalog_service import catalog_service
+from app.services.cooldown_index import CooldownIndex
+from app.services.history_writer import pack_track_ids
+from tests.factories import add_account, add_tracks
+
+
+@pytest.fixture
+def setup(db):
+    tracks = add_tracks(db, 10)
+    add_account(db, "a", playlists=2)
+    first, second = db.query(Playlist).order_by(Playlist.name).all()
+    return catalog_service.get(db), tracks, first, second
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = CooldownIndex()
+    monkeypatch.setattr(index.settings, "cooldown_index_refresh_seconds", 300)
+    return index
+
+
+def add_history(db, playlist, tracks, days_ago: float, packed: bool = False) -> None:
+    added_at = datetime.utcnow() - timedelta(days=days_ago)
+    if packed:
+        ids = [track.id for track in tracks]
+        db.add(
+            PlaylistHistoryBatch(
+                playlist_id=playlist.id,
+                added_at=added_at,
+                batch_tag="t",
+                track_count=len(ids),
+                track_ids=pack_track_ids(ids),
+            )
+        )
+    else:
+        db.add_all(
+            PlaylistEntryHistory(playlist_id=playlist.id, track_id=track.id, added_at=added_at, batch_tag="t")
+            for track in tracks
+        )
+    db.commit()
+
+
+def recent(index, db, catalog, playlist, days: int = 7) -> list:
+    positions = index.recent_positions(db, catalog, [playlist.id], days)[playlist.id]
+    return sorted(catalog.tracks(positions), key=lambda track: track.id) if len(positions) else []
+
+
+def ids(tracks) -> list:
+    return sorted(track.id for track in tracks)
+
+
+def test_loads_rows_and_packed_batches_inside_the_window(db, index, setup):
+    catalog, tracks, first, second = setup
+    add_history(db, first, tracks[:2], days_ago=1)
+    add_history(db, first, tracks[2:4], days_ago=2, packed=True)
+    add_history(db, first, tracks[4:6], days_ago=10)
+    add_history(db, second, tracks[6:7], days_ago=1)
+    positions = index.recent_positions(db, catalog, [first.id, second.id], 7)
+    assert ids(catalog.tracks(positions[first.id])) == ids(tracks[:4])
+    assert ids(catalog.tracks(positions[second.id])) == ids(tracks[6:7])
+
+
+def test_record_updates_a_loaded_entry_without_a_reload(db, index, setup):
+    catalog, tracks, first, _ = setup
+    add_history(db, first, tracks[:1], days_ago=1)
+    assert ids(recent(index, db, catalog, first)) == ids(tracks[:1])
+    # Written by another process: not seen until the entry is reloaded.
+    add_history(db, first, tracks[1:2], days_ago=0.5)
+    index.record(catalog, first.id, [tracks[2].id], datetime.utcnow())
+    assert ids(recent(index, db, catalog, first)) == ids([tracks[0], tracks[2]])
+
+
+def test_record_ignores_playlists_not_loaded(db, index, setup):
+    catalog, tracks, first, _ = setup
+    index.record(catalog, first.id, [tracks[0].id], datetime.utcnow())
+    assert recent(index, db, catalog, first) == []
+
+
+def test_entries_reload_after_the_refresh_interval(db, index, setup):
+    catalog, tracks, first, _ = setup
+    assert recent(index, db, catalog, first) == []
+    add_history(db, first, tracks[:1], days_ago=1)
+    index._entries[first.id].loaded_at -= 301
+    assert ids(recent(index, db, catalog, first)) == ids(tracks[:1])
+
+
+def test_a_longer_cooldown_than_loaded_reloads(db, index, setup):
+    catalog, tracks, first, _ = setup
+    add_history(db, first, tracks[:1], days_ago=10)
+    assert recent(index, db, catalog, first, days=7) == []
+    assert ids(recent(index, db, catalog, first, days=14)) == ids(tracks[:1])
+
+
+def test_reads_trim_positions_past_the_cooldown(db, index, setup):
+    catalog, tracks, first, _ = setup
+    add_history(db, first, tracks[:1], days_ago=5)
+    add_history(db, first, tracks[1:2], days_ago=1)
+    assert len(recent(index, db, catalog, first, days=7)) == 2
+    assert ids(recent(index, db, catalog, first, days=3)) == ids(tracks[1:2])
+    assert len(index._entries[first.id].positions) == 1
+
+
+def test_a_new_catalog_generation_reloads_and_drops_stale_records(db, index, setup):
+    catalog, tracks, first, _ = setup
+    add_history(db, first, tracks[:1], days_ago=1)
+    recent(index, db, catalog, first)
+    album = db.query(Album).first()
+    db.add(Track(spotify_id="late", name="Late", artist="Artist 0", album_id=album.id))
+    db.commit()
+    catalog_service.invalidate()
+    newer = catalog_service.get(db)
+    assert newer.generation != catalog.generation
+    # Positions recorded against the old snapshot go away with its entry; the reload reads history.
+    index.record(catalog, first.id, [tracks[1].id], datetime.utcnow())
+    assert ids(recent(index, db, newer, first)) == ids(tracks[:1])
+    assert index._entries[first.id].generation == newer.generation
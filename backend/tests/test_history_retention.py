@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text
+
+from app.db.models import Playlist, PlaylistEntryHistory, PlaylistHistoryBatch, TrackUsageSummary
+from app.services import history_retention as module
+from app.services.history_retention import HISTORY_TABLE, history_retention, month_start, next_month, partition_name
+from app.services.history_writer import pack_track_ids
+from tests.factories import add_account, add_tracks
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+@pytest.fixture
+def retention(monkeypatch):
+    monkeypatch.setattr(history_retention.settings, "history_retention_days", 30)
+    monkeypatch.setattr(history_retention.settings, "cooldown_days", 5)
+    monkeypatch.setattr(history_retention.settings, "history_partition_months_ahead", 2)
+    return history_retention
+
+
+@pytest.fixture
+def library(db):
+    tracks = add_tracks(db, 3)
+    add_account(db, "a", playlists=1)
+    return db.query(Playlist).one(), tracks
+
+
+def add_entries(db, playlist, track, *days_ago: int) -> None:
+    for days in days_ago:
+        db.add(
+            PlaylistEntryHistory(
+                playlist_id=playlist.id, track_id=track.id, added_at=NOW - timedelta(days=days), batch_tag="t"
+            )
+        )
+    db.commit()
+
+
+def summary(db, track) -> TrackUsageSummary:
+    db.expire_all()
+    return db.get(TrackUsageSummary, track.id)
+
+
+def test_cutoff_never_cuts_into_the_cooldown_window(retention, monkeypatch):
+    assert retention.cutoff(NOW) == NOW - timedelta(days=30)
+    monkeypatch.setattr(retention.settings, "cooldown_days", 45)
+    assert retention.cutoff(NOW) == NOW - timedelta(days=46)
+    monkeypatch.setattr(retention.settings, "history_retention_days", 0)
+    assert retention.cutoff(NOW) is None
+
+
+def test_month_helpers_roll_over_the_year():
+    assert month_start(date(2026, 12, 31)) == date(2026, 12, 1)
+    assert next_month(date(2026, 12, 1)) == date(2027, 1, 1)
+    assert partition_name(date(2027, 1, 1)) == f"{HISTORY_TABLE}_p2027_01"
+
+
+def test_expired_rows_fold_into_the_summary_and_are_deleted(db, retention, library):
+    playlist, (first, second, _) = library
+    add_entries(db, playlist, first, 90, 40, 10)
+    add_entries(db, playlist, second, 5)
+    result = retention.maintain(db, NOW)
+    assert result == {"partitioned": False, "compacted_rows": 2, "compacted_batches": 0}
+    assert db.query(PlaylistEntryHistory).count() == 2
+    folded = summary(db, first)
+    assert folded.placements == 2
+    assert (folded.first_added_at, folded.last_added_at) == (NOW - timedelta(days=90), NOW - timedelta(days=40))
+    assert summary(db, second) is None
+
+
+def test_a_second_pass_adds_to_the_existing_summary(db, retention, library):
+    playlist, (track, _, _) = library
+    add_entries(db, playlist, track, 40)
+    retention.maintain(db, NOW)
+    add_entries(db, playlist, track, 100, 35)
+    assert retention.maintain(db, NOW)["compacted_rows"] == 2
+    folded = summary(db, track)
+    assert folded.placements == 3
+    assert (folded.first_added_at, folded.last_added_at) == (NOW - timedelta(days=100), NOW - timedelta(days=35))
+
+
+def test_packed_batches_compact_in_chunks(db, retention, library, monkeypatch):
+    monkeypatch.setattr(module, "COMPACT_BATCH_CHUNK", 2)
+    playlist, tracks = library
+    ids = [track.id for track in tracks]
+    for days in (60, 50, 45, 40, 35, 1):
+        packed = pack_track_ids(ids if days != 60 else ids[:1])
+        db.add(
+            PlaylistHistoryBatch(
+                playlist_id=playlist.id,
+                added_at=NOW - timedelta(days=days),
+                batch_tag="t",
+                track_count=len(packed) // 16,
+                track_ids=packed,
+            )
+        )
+    db.commit()
+    assert retention.maintain(db, NOW)["compacted_batches"] == 5
+    assert db.query(PlaylistHistoryBatch).count() == 1
+    assert summary(db, tracks[0]).placements == 5
+    assert summary(db, tracks[1]).placements == 4
+    assert summary(db, tracks[2]).first_added_at == NOW - timedelta(days=50)
+
+
+def test_disabled_retention_keeps_everything(db, retention, library, monkeypatch):
+    monkeypatch.setattr(retention.settings, "history_retention_days", 0)
+    playlist, (track, _, _) = library
+    add_entries(db, playlist, track, 400)
+    assert retention.maintain(db, NOW)["compacted_rows"] == 0
+    assert db.query(PlaylistEntryHistory).count() == 1
+
+
+@pytest.fixture
+def partitioned(db, schema):
+    """Rebuilds history as migration 0006 does; the plain table is restored afterwards."""
+    with schema.begin() as connection:
+        connection.execute(text(f"DROP TABLE {HISTORY_TABLE}"))
+        connection.execute(
+            text(
+                f"""
+                CREATE TABLE {HISTORY_TABLE} (
+                    id uuid NOT NULL,
+                    playlist_id uuid NOT NULL REFERENCES playlists (id) ON DELETE CASCADE,
+                    track_id uuid NOT NULL REFERENCES tracks (id) ON DELETE CASCADE,
+                    added_at timestamp without time zone NOT NULL DEFAULT now(),
+                    batch_tag varchar(64) NOT NULL,
+                    PRIMARY KEY (id, added_at)
+                ) PARTITION BY RANGE (added_at)
+                """
+            )
+        )
+        connection.execute(text(f"CREATE TABLE {HISTORY_TABLE}_default PARTITION OF {HISTORY_TABLE} DEFAULT"))
+        old = date(2026, 3, 1)
+        connection.execute(
+            text(
+                f"CREATE TABLE {partition_name(old)} PARTITION OF {HISTORY_TABLE} "
+                f"FOR VALUES FROM ('{old.isoformat()}') TO ('{next_month(old).isoformat()}')"
+            )
+        )
+    yield
+    db.rollback()
+    with schema.begin() as connection:
+        connection.execute(text(f"DROP TABLE {HISTORY_TABLE} CASCADE"))
+    PlaylistEntryHistory.__table__.create(schema)
+
+
+def insert_raw(db, playlist, track, added_at: datetime) -> None:
+    db.execute(
+        text(
+            f"INSERT INTO {HISTORY_TABLE} (id, playlist_id, track_id, added_at, batch_tag) "
+            "VALUES (:id, :playlist_id, :track_id, :added_at, 't')"
+        ),
+        {"id": str(uuid4()), "playlist_id": str(playlist.id), "track_id": str(track.id), "added_at": added_at},
+    )
+    db.commit()
+
+
+def partition_rows(db, name: str) -> int:
+    return db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+
+
+@pytest.mark.postgres
+def test_partition_maintenance(db, retention, library, partitioned):
+    playlist, (track, _, _) = library
+    insert_raw(db, playlist, track, datetime(2026, 3, 10))  # expired partition
+    insert_raw(db, playlist, track, datetime(2026, 4, 2))  # expired, in the default partition
+    insert_raw(db, playlist, track, datetime(2026, 6, 1))  # current month, in the default partition
+
+    result = retention.maintain(db, NOW)
+    assert result["partitioned"] is True
+    assert result["created"] == [partition_name(date(2026, month, 1)) for month in (6, 7, 8)]
+    assert result["dropped"] == [partition_name(date(2026, 3, 1))]
+    assert result["compacted_rows"] == 1
+
+    # The current month's row moved out of the default partition when its partition was attached.
+    assert partition_rows(db, partition_name(date(2026, 6, 1))) == 1
+    assert partition_rows(db, f"{HISTORY_TABLE}_default") == 0
+    assert db.execute(text("SELECT to_regclass(:name)"), {"name": partition_name(date(2026, 3, 1))}).scalar() is None
+    folded = summary(db, track)
+    assert folded.placements == 2
+    assert folded.first_added_at.replace(tzinfo=None) == datetime(2026, 3, 10)
+
+    again = retention.maintain(db, NOW)
+    assert (again["created"], again["dropped"], again["compacted_rows"]) == ([], [], 0)
+    assert summary(db, track).placements == 2
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+import pytest
+
+from app.services.history_writer import pack_track_ids, unpack_track_ids
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 50, 500])
+def test_pack_round_trip(count):
+    track_ids = [uuid4() for _ in range(count)]
+    packed = pack_track_ids(track_ids)
+    assert len(packed) == 16 * count
+    assert unpack_track_ids(packed) == track_ids
+
+
+def test_pack_keeps_order_and_duplicates():
+    first, second = uuid4(), uuid4()
+    assert unpack_track_ids(pack_track_ids([second, first, second])) == [second, first, second]
+
+
+def test_unpack_accepts_driver_buffers():
+    # psycopg2 returns bytea columns as memoryview.
+    track_ids = [uuid4() for _ in range(3)]
+    assert unpack_track_ids(memoryview(pack_track_ids(track_ids))) == track_ids
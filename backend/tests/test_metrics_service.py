@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.api  # noqa: F401  metrics_service and the API package import each other
+from app.db.models import MetricRollup, MetricSnapshot, Playlist
+from app.services.metrics_service import metrics_service
+from app.utils.time_utils import bucket_start
+from tests.factories import add_account
+
+MONDAY = datetime(2026, 6, 15)
+
+
+@pytest.mark.parametrize(
+    ("value", "granularity", "expected"),
+    [
+        (datetime(2026, 6, 17, 14, 59, 30), "hour", datetime(2026, 6, 17, 14)),
+        (datetime(2026, 6, 17, 14, 59, 30), "day", datetime(2026, 6, 17)),
+        (datetime(2026, 6, 17, 14, 59, 30), "week", MONDAY),
+        (datetime(2026, 6, 21, 23, 59), "week", MONDAY),
+        (MONDAY, "week", MONDAY),
+        (datetime(2026, 1, 1, 8), "week", datetime(2025, 12, 29)),
+    ],
+)
+def test_bucket_start(value, granularity, expected):
+    assert bucket_start(value, granularity) == expected
+
+
+def test_bucket_start_rejects_unknown_granularity():
+    with pytest.raises(ValueError):
+        bucket_start(MONDAY, "month")
+
+
+def reshuffled(db, count: int, now: datetime) -> None:
+    for index, playlist in enumerate(db.query(Playlist).order_by(Playlist.name)):
+        playlist.last_reshuffled_at = now - timedelta(hours=1) if index < count else None
+    db.commit()
+
+
+def rollup(db, granularity: str, start: datetime) -> MetricRollup:
+    return db.query(MetricRollup).filter_by(granularity=granularity, bucket_start=start).one()
+
+
+def test_snapshots_fold_into_hour_day_and_week_buckets(db):
+    add_account(db, "a", playlists=4)
+    samples = [
+        (MONDAY.replace(hour=10, minute=15), 3),
+        (MONDAY.replace(hour=10, minute=45), 1),
+        (MONDAY.replace(hour=11, minute=5), 2),
+        (MONDAY + timedelta(days=2, hours=9), 4),
+    ]
+    for now, count in samples:
+        reshuffled(db, count, now)
+        metrics_service.record_snapshot(db, now)
+
+    ten = rollup(db, "hour", MONDAY.replace(hour=10))
+    assert (ten.samples, ten.reshuffles_last_24h, ten.playlists_count) == (2, 3, 4)
+    assert rollup(db, "hour", MONDAY.replace(hour=11)).samples == 1
+    monday = rollup(db, "day", MONDAY)
+    assert (monday.samples, monday.reshuffles_last_24h) == (3, 3)
+    week = rollup(db, "week", MONDAY)
+    assert (week.samples, week.reshuffles_last_24h) == (4, 4)
+    assert db.query(MetricRollup).filter_by(granularity="hour").count() == 3
+    assert db.query(MetricRollup).filter_by(granularity="day").count() == 2
+
+
+def test_rollups_keep_the_latest_counts(db):
+    add_account(db, "a", playlists=2)
+    metrics_service.record_snapshot(db, MONDAY.replace(hour=10, minute=1))
+    add_account(db, "b", playlists=3)
+    metrics_service.record_snapshot(db, MONDAY.replace(hour=10, minute=30))
+    ten = rollup(db, "hour", MONDAY.replace(hour=10))
+    assert (ten.accounts_count, ten.playlists_count) == (2, 5)
+
+
+def test_expired_snapshots_are_pruned_but_rollups_stay(db, monkeypatch):
+    monkeypatch.setattr(metrics_service.settings, "metric_snapshot_retention_days", 30)
+    metrics_service.record_snapshot(db, MONDAY - timedelta(days=40))
+    metrics_service.record_snapshot(db, MONDAY)
+    assert [snapshot.created_at for snapshot in db.query(MetricSnapshot)] == [MONDAY]
+    assert rollup(db, "day", MONDAY - timedelta(days=40)).samples == 1
+
+
+def test_history_reads_one_granularity_in_order(db):
+    now = datetime.utcnow()
+    for hours_ago in (30, 2, 1, 200):
+        metrics_service.record_snapshot(db, now - timedelta(hours=hours_ago))
+    history = metrics_service.get_history(db, days=7, granularity="hour")
+    expected = [bucket_start(now - timedelta(hours=hours), "hour") for hours in (30, 2, 1)]
+    assert [point.timestamp for point in history] == expected
+    days = metrics_service.get_history(db, days=7, granularity="day")
+    assert [point.timestamp for point in days] == sorted({bucket_start(value, "day") for value in expected})
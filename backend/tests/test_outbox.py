@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from app.db.models import Playlist, PlaylistSyncOutbox
+from app.services.playlist_service import playlist_service
+from tests.factories import add_account
+
+
+class FakeSpotify:
+    """Stands in for the Spotify push and records how many pushes overlap."""
+
+    def __init__(self) -> None:
+        self.pushed: Dict[str, List[str]] = {}
+        self.failing: set = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def push(self, account, playlist, track_uris, description=None) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if playlist.spotify_playlist_id in self.failing:
+                request = httpx.Request("PUT", "https://api.spotify.com/v1/playlists/x/tracks")
+                raise httpx.HTTPStatusError("503", request=request, response=httpx.Response(503, request=request))
+            self.pushed[playlist.spotify_playlist_id] = list(track_uris)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def spotify(monkeypatch):
+    fake = FakeSpotify()
+    monkeypatch.setattr(playlist_service, "_push_tracks", fake.push)
+    monkeypatch.setattr(playlist_service.settings, "playlist_outbox_concurrency", 3)
+    monkeypatch.setattr(playlist_service.settings, "playlist_outbox_retry_seconds", 60)
+    monkeypatch.setattr(playlist_service.settings, "playlist_outbox_max_attempts", 3)
+    return fake
+
+
+def enqueue(db, playlist: Playlist, uris: List[str], age: int = 0, **fields) -> PlaylistSyncOutbox:
+    created = datetime.utcnow() - timedelta(seconds=age)
+    fields.setdefault("next_attempt_at", created)
+    row = PlaylistSyncOutbox(playlist_id=playlist.id, track_uris=uris, created_at=created, **fields)
+    db.add(row)
+    db.commit()
+    return row
+
+
+def drain(db) -> dict:
+    return asyncio.run(playlist_service.drain_outbox(db))
+
+
+def playlists(db, count: int) -> List[Playlist]:
+    add_account(db, "a", playlists=count)
+    return db.query(Playlist).order_by(Playlist.spotify_playlist_id).all()
+
+
+def test_rows_of_one_playlist_coalesce_into_the_newest(db, spotify):
+    (playlist,) = playlists(db, 1)
+    enqueue(db, playlist, ["old"], age=20)
+    enqueue(db, playlist, ["new"], age=10)
+    result = drain(db)
+    assert result == {"claimed": 2, "pushed": 1, "superseded": 1, "skipped": 0, "failed": 0}
+    assert spotify.pushed == {"a-0": ["new"]}
+    assert db.query(PlaylistSyncOutbox).count() == 0
+
+
+def test_a_newer_row_not_yet_due_supersedes_the_due_one(db, spotify):
+    (playlist,) = playlists(db, 1)
+    enqueue(db, playlist, ["old"], age=20)
+    newer = enqueue(db, playlist, ["new"], age=10, next_attempt_at=datetime.utcnow() + timedelta(minutes=5))
+    result = drain(db)
+    assert (result["pushed"], result["superseded"]) == (0, 1)
+    assert spotify.pushed == {}
+    assert [row.id for row in db.query(PlaylistSyncOutbox)] == [newer.id]
+
+
+def test_a_parked_newer_row_does_not_supersede(db, spotify):
+    (playlist,) = playlists(db, 1)
+    parked = enqueue(db, playlist, ["parked"], age=10, attempts=3, last_error="503")
+    enqueue(db, playlist, ["retry"], age=20, attempts=1)
+    result = drain(db)
+    assert (result["claimed"], result["pushed"], result["superseded"]) == (1, 1, 0)
+    assert spotify.pushed == {"a-0": ["retry"]}
+    assert [row.id for row in db.query(PlaylistSyncOutbox)] == [parked.id]
+
+
+def test_failed_pushes_back_off_exponentially_then_park(db, spotify):
+    (playlist,) = playlists(db, 1)
+    row = enqueue(db, playlist, ["x"])
+    spotify.failing.add("a-0")
+    for attempt in range(1, 4):
+        started = datetime.utcnow()
+        assert drain(db)["failed"] == 1
+        db.refresh(row)
+        assert row.attempts == attempt
+        assert "503" in row.last_error
+        delay = (row.next_attempt_at - started).total_seconds()
+        assert 60 * 2 ** (attempt - 1) <= delay < 60 * 2 ** (attempt - 1) + 5
+        assert drain(db)["claimed"] == 0
+        row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    # Parked after PLAYLIST_OUTBOX_MAX_ATTEMPTS: kept for an operator, never claimed again.
+    assert drain(db)["claimed"] == 0
+    assert db.query(PlaylistSyncOutbox).count() == 1
+
+
+def test_rows_without_a_spotify_playlist_are_skipped_not_pushed(db, spotify):
+    first, second = playlists(db, 2)
+    second.spotify_playlist_id = None
+    db.commit()
+    enqueue(db, first, ["x"])
+    enqueue(db, second, ["y"])
+    result = drain(db)
+    assert result == {"claimed": 2, "pushed": 1, "superseded": 0, "skipped": 1, "failed": 0}
+    assert list(spotify.pushed) == ["a-0"]
+    assert db.query(PlaylistSyncOutbox).count() == 0
+
+
+def test_pushes_respect_the_concurrency_cap(db, spotify):
+    for playlist in playlists(db, 10):
+        enqueue(db, playlist, [playlist.spotify_playlist_id])
+    result = drain(db)
+    assert result["pushed"] == 10
+    assert spotify.max_in_flight == 3
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from itertools import combinations
+from types import SimpleNamespace
+from typing import List, Sequence
+
+import pytest
+
+from app.utils.playlist_diff import (
+    MAX_ITEMS_PER_REQUEST,
+    SyncPlan,
+    _stable_positions,
+    align_to_previous,
+    full_replace_requests,
+    plan_sync,
+)
+
+
+def uris(prefix: str, count: int) -> List[str]:
+    return [f"spotify:track:{prefix}{index}" for index in range(count)]
+
+
+def apply(current: Sequence[str], plan: SyncPlan) -> List[str]:
+    """Replay ``plan`` the way Spotify applies DELETE, reorder PUT and positional POST."""
+    removed = set(plan.removes)
+    items = [uri for uri in current if uri not in removed]
+    for range_start, insert_before in plan.moves:
+        uri = items.pop(range_start)
+        items.insert(insert_before - 1 if insert_before > range_start else insert_before, uri)
+    for position, chunk in plan.inserts:
+        assert len(chunk) <= MAX_ITEMS_PER_REQUEST
+        items[position:position] = chunk
+    return items
+
+
+def longest_increasing(sequence: Sequence[int]) -> int:
+    for length in range(len(sequence), 0, -1):
+        for indexes in combinations(range(len(sequence)), length):
+            values = [sequence[index] for index in indexes]
+            if all(a < b for a, b in zip(values, values[1:])):
+                return length
+    return 0
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_stable_positions_is_a_longest_increasing_subsequence(seed):
+    rng = random.Random(seed)
+    sequence = rng.sample(range(30), rng.randint(0, 9))
+    stable = sorted(_stable_positions(sequence))
+    values = [sequence[index] for index in stable]
+    assert values == sorted(values)
+    assert len(stable) == longest_increasing(sequence)
+
+
+def test_stable_positions_of_sorted_and_reversed_input():
+    assert _stable_positions(list(range(6))) == set(range(6))
+    assert len(_stable_positions(list(range(6, 0, -1)))) == 1
+    assert _stable_positions([]) == set()
+
+
+def test_duplicates_fall_back_to_full_replace():
+    current = uris("a", 5)
+    assert plan_sync(current + current[:1], current) is None
+    assert plan_sync(current, current + current[:1]) is None
+
+
+def test_full_turnover_removes_everything_and_inserts_in_chunks():
+    current, target = uris("a", 250), uris("b", 250)
+    plan = plan_sync(current, target)
+    assert plan.removes == current
+    assert not plan.moves
+    assert [(position, len(chunk)) for position, chunk in plan.inserts] == [(0, 100), (100, 100), (200, 50)]
+    assert apply(current, plan) == target
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_pure_reorder_moves_only_tracks_outside_the_stable_run(seed):
+    current = uris("a", 40)
+    target = random.Random(seed).sample(current, len(current))
+    plan = plan_sync(current, target)
+    rank = {uri: index for index, uri in enumerate(target)}
+    assert not plan.removes and not plan.inserts
+    assert len(plan.moves) <= len(current) - len(_stable_positions([rank[uri] for uri in current]))
+    assert apply(current, plan) == target
+
+
+def test_inserts_split_at_one_hundred_items():
+    current = uris("a", 10)
+    target = current[:5] + uris("b", 230) + current[5:]
+    plan = plan_sync(current, target)
+    assert [(position, len(chunk)) for position, chunk in plan.inserts] == [(5, 100), (105, 100), (205, 30)]
+    assert apply(current, plan) == target
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_edits_replay_to_the_target(seed):
+    rng = random.Random(seed)
+    current = uris("a", rng.randint(0, 300))
+    kept = rng.sample(current, rng.randint(0, len(current)))
+    target = kept + uris("b", rng.randint(0, 300))
+    rng.shuffle(target)
+    assert apply(current, plan_sync(current, target)) == target
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_aligned_partial_rotation_beats_full_replace(seed):
+    rng = random.Random(seed)
+    current = uris("a", 500)
+    target = rng.sample(current, 450) + uris("b", 50)
+    rng.shuffle(target)
+    aligned = align_to_previous(current, target)
+    assert sorted(aligned) == sorted(target)
+    plan = plan_sync(current, aligned)
+    assert not plan.moves
+    assert plan.requests == 2
+    assert plan.requests + 1 < full_replace_requests(len(aligned))
+    assert apply(current, plan) == aligned
+
+
+def test_align_without_kept_tracks_keeps_target_order():
+    target = uris("b", 5)
+    assert align_to_previous(uris("a", 5), target) == target
+
+
+class FakeRemote:
+    """Applies plans and replacements to an in-memory playlist in place of the Spotify API."""
+
+    def __init__(self, items: List[str]) -> None:
+        self.items = list(items)
+        self.plans: List[SyncPlan] = []
+
+    async def get_playlist_snapshot(self, token, playlist_id):
+        return "snap"
+
+    async def apply_playlist_plan(self, token, playlist_id, plan):
+        self.plans.append(plan)
+        self.items = apply(self.items, plan)
+        return "snap"
+
+    async def replace_playlist_items(self, token, playlist_id, track_uris):
+        self.items = list(track_uris)
+        return "snap"
+
+
+def push(monkeypatch, current: List[str], target: List[str], keep_order: bool):
+    from app.services import playlist_service as module
+
+    remote = FakeRemote(current)
+    for name in ("get_playlist_snapshot", "apply_playlist_plan", "replace_playlist_items"):
+        monkeypatch.setattr(module.spotify_service, name, getattr(remote, name))
+    monkeypatch.setattr(module.playlist_service.settings, "playlist_diff_sync", True)
+    monkeypatch.setattr(module.playlist_service.settings, "playlist_diff_keep_order", keep_order)
+    account = SimpleNamespace(access_token="token")
+    playlist = SimpleNamespace(id="p", name="p", spotify_playlist_id="remote", snapshot_id="snap", synced_track_uris=current)
+    asyncio.run(module.playlist_service._push_tracks(account, playlist, list(target)))
+    return remote, playlist
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_push_keeps_the_sampled_order_by_default(monkeypatch, seed):
+    rng = random.Random(seed)
+    current = uris("a", 500)
+    target = rng.sample(current, 450) + uris("b", 50)
+    rng.shuffle(target)
+    remote, playlist = push(monkeypatch, current, target, keep_order=False)
+    assert remote.items == target
+    assert playlist.synced_track_uris == target
+
+
+def test_push_diff_moves_kept_tracks_into_the_sampled_order(monkeypatch):
+    current = uris("a", 1000)
+    target = current[:500] + uris("b", 20) + current[520:]
+    target[10], target[700] = target[700], target[10]
+    remote, _ = push(monkeypatch, current, target, keep_order=False)
+    assert len(remote.plans) == 1 and remote.plans[0].moves
+    assert remote.items == target
+
+
+def test_push_falls_back_to_a_full_replace_when_the_diff_costs_more(monkeypatch):
+    current = uris("a", 50)
+    target = list(reversed(current))
+    remote, _ = push(monkeypatch, current, target, keep_order=False)
+    assert remote.plans == []
+    assert remote.items == target
+
+
+def test_keep_order_setting_aligns_to_the_previous_order(monkeypatch):
+    rng = random.Random(1)
+    current = uris("a", 500)
+    target = rng.sample(current, 450) + uris("b", 50)
+    rng.shuffle(target)
+    remote, playlist = push(monkeypatch, current, target, keep_order=True)
+    assert remote.items == align_to_previous(current, target)
+    assert playlist.synced_track_uris == remote.items
+    assert remote.plans and not remote.plans[0].moves
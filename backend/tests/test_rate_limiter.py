@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rate_limiter as module
+from app.services.rate_limiter import KEY_PREFIX, RateLimiter
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    settings = RateLimiter().settings
+    monkeypatch.setattr(settings, "spotify_max_concurrency", 4)
+    monkeypatch.setattr(settings, "spotify_min_concurrency", 1)
+    limiter = RateLimiter()
+    # In-process behaviour only: the limiter treats Redis as down and fails open.
+    limiter._redis_down_until = float("inf")
+    return limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def test_throttling_halves_the_window_down_to_the_minimum(limiter):
+    for expected in (2.0, 1.0, 1.0):
+        asyncio.run(limiter.record_throttle(0))
+        assert limiter._window == expected
+    assert limiter.stats["throttled"] == 3
+
+
+def test_successes_grow_the_window_additively_up_to_the_maximum(limiter):
+    limiter._window = 1.0
+    limiter.record_success()
+    assert limiter._window == 2.0
+    limiter.record_success()
+    assert limiter._window == 2.5
+    for _ in range(50):
+        limiter.record_success()
+    assert limiter._window == 4.0
+
+
+def test_slots_admit_at_most_the_window(limiter):
+    limiter._window = 2.5
+    in_flight = []
+
+    async def request() -> None:
+        async with limiter.slot():
+            in_flight.append(limiter._in_flight)
+            await asyncio.sleep(0.01)
+
+    async def burst() -> None:
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(burst())
+    assert max(in_flight) == 2
+    assert limiter.stats["admitted"] == 6
+    assert limiter._in_flight == 0
+
+
+def test_retry_after_blocks_new_requests(limiter, clock):
+    async def throttled_then_request() -> None:
+        await limiter.record_throttle(2.0)
+        async with limiter.slot():
+            pass
+
+    asyncio.run(throttled_then_request())
+    assert 2.0 <= sum(clock.slept) <= 2.2
+    assert limiter.stats["waited_seconds"] == pytest.approx(sum(clock.slept))
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    """A limiter on the real Redis at ``REDIS_URL`` with its keys cleared before and after."""
+    settings = RateLimiter().settings
+    monkeypatch.setattr(settings, "spotify_app_rate_per_second", 10.0)
+    monkeypatch.setattr(settings, "spotify_app_burst", 3)
+    monkeypatch.setattr(settings, "spotify_rate_increase_step", 0.1)
+    monkeypatch.setattr(settings, "spotify_min_rate_scale", 0.1)
+    limiter = RateLimiter()
+
+    async def clear() -> None:
+        limiter._bind()
+        redis = limiter._client()
+        keys = [key async for key in redis.scan_iter(f"{KEY_PREFIX}:*")]
+        if keys:
+            await redis.delete(*keys)
+        await limiter.aclose()
+
+    asyncio.run(clear())
+    yield limiter
+    asyncio.run(clear())
+
+
+async def scale(limiter: RateLimiter) -> float:
+    return float(await limiter._client().get(f"{KEY_PREFIX}:scale") or 1)
+
+
+@pytest.mark.redis
+def test_the_burst_is_shared_and_then_metered(shared):
+    async def run():
+        shared._bind()
+        first = [await shared._take_tokens(None) for _ in range(3)]
+        other = RateLimiter()
+        other._bind()
+        try:
+            return first, await other._take_tokens(None)
+        finally:
+            await shared.aclose()
+            await other.aclose()
+
+    first, fourth = asyncio.run(run())
+    assert first == [0.0, 0.0, 0.0]
+    # Another process draws from the same bucket, which refills at 10/s.
+    assert 0 < fourth <= 0.1
+
+
+@pytest.mark.redis
+def test_a_throttle_blocks_every_process_and_halves_the_rate(shared):
+    async def run():
+        shared._bind()
+        await shared.record_throttle(1.0)
+        blocked = await shared._take_tokens(None)
+        halved = await scale(shared)
+        await shared.record_throttle(1.0)
+        quartered = await scale(shared)
+        await shared.aclose()
+        return blocked, halved, quartered
+
+    blocked, halved, quartered = asyncio.run(run())
+    assert 0.9 < blocked <= 1.0
+    assert (halved, quartered) == (0.5, 0.25)
+
+
+@pytest.mark.redis
+def test_admitted_requests_restore_the_rate_step_by_step(shared):
+    async def run():
+        shared._bind()
+        redis = shared._client()
+        await redis.set(f"{KEY_PREFIX}:scale", 0.5)
+        levels = []
+        for _ in range(7):
+            assert await shared._take_tokens(None) == 0.0
+            levels.append(round(await scale(shared), 2))
+            await redis.delete(f"{KEY_PREFIX}:app")
+        await shared.aclose()
+        return levels
+
+    assert asyncio.run(run()) == [0.6, 0.7, 0.8, 0.9, 1.0, 1.0, 1.0]
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from app.api.v1.schemas.playlists import PlaylistBulkReshuffleRequest
+from app.db.models import Playlist, PlaylistEntryHistory, ReshuffleJob, ReshuffleJobItem
+from app.db.session import AsyncSessionLocal
+from app.services.playlist_service import playlist_service
+from app.services.reshuffle_job_service import reshuffle_job_service
+from tests.factories import add_account, add_tracks
+
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("PUT", "https://api.spotify.com/v1/playlists/x/tracks")
+    return httpx.HTTPStatusError(f"{status}", request=request, response=httpx.Response(status, request=request))
+
+
+class FakeSpotify:
+    """Stands in for the Spotify push; ``errors`` maps a Spotify playlist id to the status it fails with."""
+
+    def __init__(self) -> None:
+        self.errors: Dict[str, int] = {}
+        self.pushed: List[str] = []
+
+    async def push(self, account, playlist, track_uris, description=None) -> None:
+        status = self.errors.get(playlist.spotify_playlist_id)
+        if status is not None:
+            raise status_error(status)
+        self.pushed.append(playlist.spotify_playlist_id)
+
+
+@pytest.fixture
+def spotify(monkeypatch):
+    fake = FakeSpotify()
+    monkeypatch.setattr(playlist_service, "_push_tracks", fake.push)
+    settings = reshuffle_job_service.settings
+    monkeypatch.setattr(settings, "playlist_sync_outbox", False)
+    monkeypatch.setattr(settings, "playlist_size", 5)
+    monkeypatch.setattr(settings, "history_commit_playlists", 3)
+    monkeypatch.setattr(settings, "reshuffle_job_max_attempts", 3)
+    return fake
+
+
+@pytest.fixture
+def job(db, spotify):
+    add_tracks(db, 60)
+    add_account(db, "a", playlists=3)
+    add_account(db, "b", playlists=3)
+
+    async def enqueue() -> ReshuffleJob:
+        async with AsyncSessionLocal() as session:
+            return await reshuffle_job_service.enqueue(session, PlaylistBulkReshuffleRequest(mode="all"))
+
+    return asyncio.run(enqueue())
+
+
+def run_next(db) -> dict:
+    return asyncio.run(reshuffle_job_service.run_next(db))
+
+
+def reload(db, job: ReshuffleJob) -> ReshuffleJob:
+    db.expire_all()
+    return db.get(ReshuffleJob, job.id)
+
+
+def test_job_reshuffles_every_playlist_once(db, spotify, job):
+    assert run_next(db)["status"] == "completed"
+    saved = reload(db, job)
+    assert (saved.total, saved.completed, saved.failed) == (6, 6, 0)
+    assert sorted(spotify.pushed) == sorted(playlist.spotify_playlist_id for playlist in db.query(Playlist))
+    assert db.query(PlaylistEntryHistory).count() == 6 * 5
+    assert db.query(ReshuffleJobItem).filter(ReshuffleJobItem.done_at.is_(None)).count() == 0
+    assert run_next(db) == {"status": "idle"}
+
+
+def test_permanent_item_failure_is_recorded_and_the_rest_completes(db, spotify, job):
+    spotify.errors["a-0"] = 404
+    result = run_next(db)
+    saved = reload(db, job)
+    assert result["status"] == "completed"
+    assert (saved.completed, saved.failed, saved.error) == (5, 1, None)
+    failed = db.query(ReshuffleJobItem).filter(ReshuffleJobItem.failed_at.isnot(None)).one()
+    assert db.get(Playlist, failed.playlist_id).spotify_playlist_id == "a-0"
+    assert failed.done_at is not None and "404" in failed.error
+    assert "a-0" not in spotify.pushed and len(spotify.pushed) == 5
+    assert db.query(PlaylistEntryHistory).filter(PlaylistEntryHistory.playlist_id == failed.playlist_id).count() == 0
+
+
+def done_names(db, job: ReshuffleJob) -> set:
+    items = db.query(ReshuffleJobItem.playlist_id).filter(
+        ReshuffleJobItem.job_id == job.id, ReshuffleJobItem.done_at.isnot(None)
+    )
+    return {playlist.spotify_playlist_id for playlist in db.query(Playlist).filter(Playlist.id.in_(items))}
+
+
+def test_transient_failure_requeues_and_the_retry_resumes_after_the_checkpoint(db, spotify, job):
+    first_chunk = set(reshuffle_job_service._pending(db, job.id))
+    second_account = db.query(Playlist).filter(Playlist.id.notin_(first_chunk)).all()
+    spotify.errors[second_account[0].spotify_playlist_id] = 503
+    assert run_next(db)["status"] == "queued"
+    saved = reload(db, job)
+    done = done_names(db, job)
+    # The first account's chunk committed before the error; nothing after the failing playlist did.
+    assert len(done) == saved.completed >= 3
+    assert second_account[0].spotify_playlist_id not in done
+    assert saved.attempts == 1
+    assert saved.next_attempt_at > datetime.utcnow()
+    assert "503" in saved.error
+    assert run_next(db) == {"status": "idle"}
+
+    spotify.errors.clear()
+    spotify.pushed.clear()
+    saved.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert run_next(db)["status"] == "completed"
+    assert set(spotify.pushed) == {playlist.spotify_playlist_id for playlist in db.query(Playlist)} - done
+    assert reload(db, job).completed == 6
+    assert db.query(PlaylistEntryHistory).count() == 6 * 5
+
+
+def test_runs_without_progress_fail_the_job_after_max_attempts(db, spotify, job):
+    spotify.errors.update({playlist.spotify_playlist_id: 503 for playlist in db.query(Playlist)})
+    for attempt in range(1, 4):
+        result = run_next(db)
+        saved = reload(db, job)
+        assert saved.attempts == attempt
+        if attempt < 3:
+            assert result["status"] == "queued"
+            saved.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.commit()
+    assert result["status"] == "failed"
+    assert saved.finished_at is not None and saved.next_attempt_at is None
+    assert saved.completed == 0
+
+
+def test_claim_resumes_a_running_job_only_after_its_lease(db, spotify, job):
+    saved = reload(db, job)
+    saved.status = "running"
+    saved.heartbeat_at = datetime.utcnow()
+    db.commit()
+    assert run_next(db) == {"status": "idle"}
+
+    lease = reshuffle_job_service.settings.reshuffle_job_lease_seconds
+    saved.heartbeat_at = datetime.utcnow() - timedelta(seconds=lease + 1)
+    db.commit()
+    assert run_next(db)["status"] == "completed"
+    assert reload(db, job).completed == 6
+
+
+def test_chunks_never_split_an_account(db, spotify, job):
+    chunk = reshuffle_job_service._pending(db, job.id)
+    accounts = {playlist.account_id for playlist in db.query(Playlist).filter(Playlist.id.in_(chunk))}
+    assert len(chunk) == 3 and len(accounts) == 1
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from app.services import response_cache as module
+from app.services.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(monkeypatch, tmp_path):
+    path = os.path.join(tmp_path, "cache", "responses.sqlite3")
+    settings = ResponseCache().settings
+    monkeypatch.setattr(settings, "spotify_cache_path", path)
+    monkeypatch.setattr(settings, "spotify_cache_ttl_seconds", 100)
+    monkeypatch.setattr(settings, "spotify_cache_max_entries", 3)
+    return path
+
+
+def test_entries_are_fresh_for_the_ttl(path, clock):
+    cache = ResponseCache()
+    assert cache.get("a") is None
+    cache.put("a", {"items": [1]}, "etag-1")
+    clock.now += 99
+    assert cache.get("a") == ({"items": [1]}, "etag-1", True)
+    clock.now += 2
+    assert cache.get("a").fresh is False
+
+
+def test_touch_extends_a_revalidated_entry(path, clock):
+    cache = ResponseCache()
+    cache.put("a", [1], "etag-1")
+    clock.now += 150
+    assert cache.get("a").fresh is False
+    cache.touch("a")
+    clock.now += 99
+    assert cache.get("a").fresh is True
+
+
+def test_the_file_is_shared_in_wal_mode(path, clock):
+    writer, reader = ResponseCache(), ResponseCache()
+    writer.put("a", "old", None)
+    raw = sqlite3.connect(path, isolation_level=None)
+    try:
+        assert raw.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        # A write transaction held by another process does not block readers.
+        raw.execute("BEGIN IMMEDIATE")
+        raw.execute("UPDATE responses SET body = '\"new\"' WHERE key = 'a'")
+        assert reader.get("a").body == "old"
+        raw.execute("COMMIT")
+    finally:
+        raw.close()
+    assert reader.get("a").body == "new"
+
+
+def test_least_recently_read_entries_are_evicted(path, clock, monkeypatch):
+    monkeypatch.setattr(module, "EVICT_EVERY", 5)
+    cache = ResponseCache()
+    for key in "abcd":
+        clock.now += 1
+        cache.put(key, key, None)
+    clock.now += 1
+    assert cache.get("a") is not None
+    clock.now += 1
+    cache.put("e", "e", None)
+    assert cache.stats.evicted == 2
+    assert [key for key in "abcde" if cache.get(key) is not None] == ["a", "d", "e"]
+
+
+def test_an_unusable_file_degrades_to_misses(monkeypatch, tmp_path):
+    blocker = os.path.join(tmp_path, "file")
+    open(blocker, "w").close()
+    monkeypatch.setattr(ResponseCache().settings, "spotify_cache_path", os.path.join(blocker, "cache.sqlite3"))
+    cache = ResponseCache()
+    cache.put("a", 1, None)
+    assert cache.get("a") is None
+
+
+def test_async_methods_share_the_store(path, clock):
+    cache = ResponseCache()
+
+    async def round_trip():
+        await cache.put_async("a", {"x": 1}, "e")
+        return await cache.get_async("a")
+
+    assert asyncio.run(round_trip()).body == {"x": 1}
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import sampler_service as module
+from app.services.sampler_service import SamplerService
+
+
+class FakePool:
+    def __init__(self, **kwargs) -> None:
+        self.shut_down = False
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        self.shut_down = True
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(module, "ProcessPoolExecutor", FakePool)
+    service = SamplerService()
+    monkeypatch.setattr(service, "_weights", lambda catalog: None)
+    return service
+
+
+def catalog(version: int) -> SimpleNamespace:
+    return SimpleNamespace(generation=1, version=version, artist_codes=None, artist_groups=None)
+
+
+def test_a_replaced_pool_outlives_the_batches_still_using_it(service):
+    with service._pool_for(catalog(1), 2) as old:
+        with service._pool_for(catalog(2), 2) as new:
+            assert new is not old
+            assert not old.shut_down
+        assert not old.shut_down
+    assert old.shut_down
+    assert not new.shut_down
+    with service._pool_for(catalog(2), 2) as again:
+        assert again is new
+
+
+def test_an_idle_pool_is_shut_down_when_replaced(service):
+    with service._pool_for(catalog(1), 2) as old:
+        pass
+    assert not old.shut_down
+    with service._pool_for(catalog(2), 2):
+        assert old.shut_down
+    assert service._pool_users == {service._pool: 0}
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import random
+from collections import defaultdict
+from typing import List, Sequence
+
+import numpy as np
+import pytest
+
+from app.services.catalog_service import CatalogSnapshot
+from app.utils.random_utils import pick_many, shuffle
+from app.utils.sampling_utils import (
+    deal_artist_capped,
+    group_by_artist,
+    sample_artist_capped,
+    sample_weighted_capped,
+)
+
+SEEDS = range(20)
+
+
+def make_catalog(track_counts: Sequence[int]) -> np.ndarray:
+    """Artist code per catalog position, artist ``i`` owning ``track_counts[i]`` tracks."""
+    codes = np.repeat(np.arange(len(track_counts), dtype=np.int32), track_counts)
+    return np.random.default_rng(0).permutation(codes)
+
+
+def per_artist(artist_codes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    return np.bincount(artist_codes[positions], minlength=int(artist_codes.max()) + 1)
+
+
+def legacy_select(
+    artist_codes: np.ndarray,
+    size: int,
+    artist_cap: int,
+    excluded: Sequence[int],
+    rng: random.Random,
+) -> List[int]:
+    """The round-robin loop ``SamplerService.select_tracks`` ran before the vectorised engine.
+
+    Ported over catalog positions; the capped branch also checks the
+    iteration limit, which the original only did for empty pools and so
+    looped forever once every artist was capped.
+    """
+    recent = set(excluded)
+    filtered = [position for position in range(len(artist_codes)) if position not in recent]
+    if len(filtered) < size:
+        filtered = list(range(len(artist_codes)))
+    grouped = defaultdict(list)
+    for position in filtered:
+        grouped[int(artist_codes[position])].append(position)
+
+    selected: List[int] = []
+    artist_counts: dict[int, int] = defaultdict(int)
+    artist_cycle = shuffle(grouped.keys(), rng)
+    idx = 0
+    while len(selected) < size and artist_cycle:
+        artist = artist_cycle[idx % len(artist_cycle)]
+        pool = grouped[artist]
+        if not pool or artist_counts[artist] >= artist_cap:
+            idx += 1
+            if idx > len(artist_cycle) * 5:
+                break
+            continue
+        choice = pick_many(pool, 1, rng)[0]
+        selected.append(choice)
+        artist_counts[artist] += 1
+        pool.remove(choice)
+        idx += 1
+        if idx > len(artist_cycle) * 5:
+            break
+
+    if len(selected) < size:
+        chosen = set(selected)
+        remaining = [position for position in filtered if position not in chosen]
+        selected.extend(pick_many(remaining, size - len(selected), rng))
+    return selected[:size]
+
+
+def sample(artist_codes: np.ndarray, size: int, artist_cap: int, seed: int, excluded=None) -> np.ndarray:
+    groups = group_by_artist(artist_codes, int(artist_codes.max()) + 1)
+    return sample_artist_capped(groups, artist_codes, size, artist_cap, excluded, np.random.default_rng(seed))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_size_without_duplicates(seed):
+    codes = make_catalog([1, 3, 7, 2, 12, 5, 1, 9, 4, 6])
+    for size in (1, 5, 17, 30, len(codes)):
+        picked = sample(codes, size, artist_cap=2, seed=seed)
+        assert len(picked) == size
+        assert len(np.unique(picked)) == size
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_size_beyond_catalog_returns_every_track(seed):
+    codes = make_catalog([2, 3, 1])
+    picked = sample(codes, 50, artist_cap=1, seed=seed)
+    assert sorted(picked.tolist()) == list(range(len(codes)))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("artist_cap", [1, 2, 3])
+def test_artist_cap_holds_when_satisfiable(seed, artist_cap):
+    codes = make_catalog([4] * 40)
+    picked = sample(codes, 30, artist_cap=artist_cap, seed=seed)
+    assert per_artist(codes, picked).max() <= artist_cap
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cooldown_positions_are_skipped(seed):
+    codes = make_catalog([5] * 40)
+    excluded = np.random.default_rng(seed).choice(len(codes), 150, replace=False)
+    picked = sample(codes, 25, artist_cap=2, seed=seed, excluded=excluded)
+    assert len(picked) == 25
+    assert not np.isin(picked, excluded).any()
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cooldown_is_relaxed_when_too_few_tracks_remain(seed):
+    codes = make_catalog([5] * 40)
+    excluded = np.random.default_rng(seed).choice(len(codes), 190, replace=False)
+    picked = sample(codes, 25, artist_cap=2, seed=seed, excluded=excluded)
+    assert len(picked) == 25
+    assert len(np.unique(picked)) == 25
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_fill_ignores_cap_only_after_every_artist_is_capped(seed):
+    track_counts = [10, 1, 6, 2]
+    codes = make_catalog(track_counts)
+    picked = sample(codes, 12, artist_cap=2, seed=seed)
+    counts = per_artist(codes, picked)
+    assert len(np.unique(picked)) == 12
+    assert (counts >= np.minimum(track_counts, 2)).all()
+
+
+def test_matches_legacy_loop():
+    codes = make_catalog([1, 1, 2, 3, 5, 8, 13, 21, 2, 4, 6, 8, 10, 12, 3, 3, 3, 1, 20, 7])
+    excluded = np.arange(0, len(codes), 9)
+    runs = 600
+    for size, artist_cap in ((15, 1), (25, 2), (40, 3)):
+        legacy = np.zeros(int(codes.max()) + 1)
+        vectorised = np.zeros_like(legacy)
+        for seed in range(runs):
+            old = np.asarray(legacy_select(codes, size, artist_cap, excluded.tolist(), random.Random(seed)))
+            new = sample(codes, size, artist_cap, seed, excluded=excluded)
+            assert len(new) == len(old)
+            assert (per_artist(codes, new) <= artist_cap).all() == (per_artist(codes, old) <= artist_cap).all()
+            legacy += per_artist(codes, old)
+            vectorised += per_artist(codes, new)
+        np.testing.assert_allclose(vectorised / runs, legacy / runs, atol=0.12)
+
+
+def deal(artist_codes: np.ndarray, sizes: Sequence[int], artist_cap: int, seed: int, **kwargs) -> List[np.ndarray]:
+    groups = group_by_artist(artist_codes, int(artist_codes.max()) + 1)
+    return deal_artist_capped(groups, artist_codes, sizes, artist_cap, rng=np.random.default_rng(seed), **kwargs)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_deal_keeps_playlists_disjoint_when_the_catalog_allows(seed):
+    codes = make_catalog([5] * 40)
+    playlists = deal(codes, [25] * 6, artist_cap=2, seed=seed)
+    assert [len(picked) for picked in playlists] == [25] * 6
+    dealt = np.concatenate(playlists)
+    assert len(np.unique(dealt)) == len(dealt)
+    assert all(per_artist(codes, picked).max() <= 2 for picked in playlists)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_deal_spreads_reuse_evenly_when_slots_exceed_the_catalog(seed):
+    codes = make_catalog([5] * 40)
+    playlists = deal(codes, [30] * 10, artist_cap=2, seed=seed)
+    usage = np.bincount(np.concatenate(playlists), minlength=len(codes))
+    assert usage.min() == 1
+    assert usage.max() == 2
+    for picked in playlists:
+        assert len(np.unique(picked)) == 30
+        assert per_artist(codes, picked).max() <= 2
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_deal_respects_each_playlist_cooldown(seed):
+    codes = make_catalog([5] * 40)
+    excluded = [np.random.default_rng(seed * 10 + index).choice(len(codes), 60, replace=False) for index in range(4)]
+    playlists = deal(codes, [25] * 4, artist_cap=2, seed=seed, excluded=excluded)
+    for picked, skipped in zip(playlists, excluded):
+        assert len(picked) == 25
+        assert not np.isin(picked, skipped).any()
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_deal_fills_past_the_cap_when_it_cannot_be_met(seed):
+    codes = make_catalog([6, 4, 5])
+    playlists = deal(codes, [10, 10], artist_cap=2, seed=seed)
+    for picked in playlists:
+        assert len(np.unique(picked)) == 10
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_weighted_deal_stays_disjoint(seed):
+    codes = make_catalog([5] * 40)
+    cumulative = np.cumsum(np.random.default_rng(seed).random(len(codes)) + 0.1)
+    dealt = np.concatenate(deal(codes, [25] * 6, artist_cap=2, seed=seed, cumulative=cumulative))
+    assert len(np.unique(dealt)) == len(dealt) == 150
+
+
+def draw_frequencies(weights: np.ndarray, draws: int, excluded=None) -> np.ndarray:
+    cumulative = np.cumsum(weights)
+    codes = np.arange(len(weights), dtype=np.int32)
+    rng = np.random.default_rng(7)
+    picks = [sample_weighted_capped(cumulative, codes, 1, 1, excluded, rng)[0] for _ in range(draws)]
+    return np.bincount(picks, minlength=len(weights)) / draws
+
+
+def test_weighted_draws_are_proportional_to_weight():
+    weights = np.arange(1, 11, dtype=np.float64)
+    np.testing.assert_allclose(draw_frequencies(weights, 10_000), weights / weights.sum(), atol=0.015)
+
+
+def test_exact_fallback_stays_proportional_among_eligible_tracks():
+    # Nearly all weight sits on an excluded track, so every rejection round fails.
+    weights = np.array([1e6, 1.0, 2.0, 3.0])
+    frequencies = draw_frequencies(weights, 10_000, excluded=np.array([0]))
+    np.testing.assert_allclose(frequencies, [0.0, 1 / 6, 2 / 6, 3 / 6], atol=0.015)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_weighted_sampling_keeps_size_cap_and_cooldown(seed):
+    codes = make_catalog([5] * 40)
+    cumulative = np.cumsum(np.random.default_rng(seed).pareto(1.5, len(codes)) + 0.01)
+    excluded = np.random.default_rng(seed).choice(len(codes), 50, replace=False)
+    picked = sample_weighted_capped(cumulative, codes, 30, 2, excluded, np.random.default_rng(seed))
+    assert len(np.unique(picked)) == 30
+    assert per_artist(codes, picked).max() <= 2
+    assert not np.isin(picked, excluded).any()
+
+
+def test_snapshot_weights_follow_popularity_and_recency():
+    day = 86_400.0
+    snapshot = CatalogSnapshot(
+        ids=[],
+        spotify_ids=[],
+        artists=["a"],
+        artist_index={"a": 0},
+        positions={},
+        artist_codes=np.zeros(3, dtype=np.int32),
+        popularity=np.array([0, 3, -1], dtype=np.int16),
+        created_at=np.array([10 * day, 10 * day, 0.0]),
+        generation=1,
+        version=0,
+    )
+    assert snapshot.cumulative_weights(0.0, 0.0) is None
+    weights = np.diff(snapshot.cumulative_weights(2.0, 10.0), prepend=0.0)
+    np.testing.assert_allclose(weights, [1.0, 16.0, 0.5])
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.db import session as module
+from app.db.models import Album, Track
+from app.db.session import READ_ONLY, AsyncSessionLocal, Base, ReplicaSet, SessionLocal, engine
+
+QUERY = select(Track.id)
+
+
+def replica_url(tmp_path, name: str) -> str:
+    return "sqlite:///" + os.path.join(tmp_path, f"{name}.db")
+
+
+@pytest.fixture
+def make_replicas(monkeypatch, tmp_path):
+    created = []
+
+    def make(*urls: str, max_lag: float = 5.0, check_seconds: float = 60.0) -> ReplicaSet:
+        replicas = ReplicaSet(urls or (replica_url(tmp_path, "one"), replica_url(tmp_path, "two")), max_lag, check_seconds)
+        monkeypatch.setattr(module, "replicas", replicas)
+        created.append(replicas)
+        return replicas
+
+    yield make
+    for replicas in created:
+        asyncio.run(replicas.dispose())
+
+
+def test_without_replicas_everything_reads_from_the_primary():
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        assert db.get_bind(clause=QUERY) is engine
+
+
+def test_read_only_sessions_route_selects_to_one_replica(make_replicas):
+    replicas = make_replicas()
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        bind = db.get_bind(clause=QUERY)
+        assert bind is replicas.replicas[0].engine
+        assert db.get_bind(clause=QUERY) is bind
+        assert db.get_bind(clause=insert(Track)) is engine
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        assert db.get_bind(clause=QUERY) is replicas.replicas[1].engine
+
+
+def test_default_sessions_read_the_primary_unless_a_query_opts_in(make_replicas):
+    replicas = make_replicas()
+    with SessionLocal() as db:
+        assert db.get_bind(clause=QUERY) is engine
+        assert db.get_bind(clause=QUERY.execution_options(replica=True)) is replicas.replicas[0].engine
+
+
+def test_async_sessions_get_the_replica_async_engine(make_replicas):
+    replicas = make_replicas()
+
+    async def bind():
+        async with AsyncSessionLocal(info={READ_ONLY: True}) as db:
+            # The lag check connects through the async driver, so it needs the greenlet bridge queries run on.
+            return await db.run_sync(lambda session: session.get_bind(clause=QUERY))
+
+    assert asyncio.run(bind()) is replicas.replicas[0].async_engine.sync_engine
+
+
+def test_lagging_replicas_fall_back_to_the_primary_until_rechecked(make_replicas):
+    # SQLite reports no lag, so a negative bound makes every replica count as behind.
+    replicas = make_replicas(max_lag=-1)
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        assert db.get_bind(clause=QUERY) is engine
+    assert [(status["healthy"], status["lag_seconds"]) for status in replicas.status()] == [(False, 0.0)] * 2
+
+    replicas.max_lag_seconds = 5
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        assert db.get_bind(clause=QUERY) is engine
+    for replica in replicas.replicas:
+        replica.checked_at = float("-inf")
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        assert db.get_bind(clause=QUERY) is replicas.replicas[0].engine
+
+
+def test_unreachable_replicas_are_skipped(make_replicas, tmp_path):
+    down = "sqlite:///" + os.path.join(tmp_path, "missing", "replica.db")
+    replicas = make_replicas(down, replica_url(tmp_path, "up"))
+    with SessionLocal(info={READ_ONLY: True}) as db:
+        assert db.get_bind(clause=QUERY) is replicas.replicas[1].engine
+    assert replicas.status()[0]["healthy"] is False and replicas.status()[0]["lag_seconds"] is None
+
+
+def test_read_only_queries_return_the_replica_rows(db, make_replicas):
+    replicas = make_replicas()
+    replica = replicas.replicas[0].engine
+    tables = [Album.__table__, Track.__table__]
+    Base.metadata.create_all(replica, tables=tables)
+    with replica.begin() as connection:
+        album = connection.execute(insert(Album).values(id=uuid4(), spotify_id="album", name="A", artist="A"))
+        connection.execute(
+            insert(Track).values(
+                id=uuid4(), spotify_id="on-replica", name="T", artist="A", album_id=album.inserted_primary_key[0]
+            )
+        )
+    with SessionLocal(info={READ_ONLY: True}) as read:
+        assert read.scalars(select(Track.spotify_id)).all() == ["on-replica"]
+    assert db.scalars(select(Track.spotify_id)).all() == []
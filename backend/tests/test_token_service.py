@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.db.models import Playlist, SpotifyAccount
+from app.services import token_service as module
+from app.services.token_service import SpotifyRefreshError, TokenService
+from tests.factories import add_account
+
+
+class FakeSpotify:
+    def __init__(self) -> None:
+        self.calls = []
+        self.payload = None
+
+    async def refresh_token(self, refresh_token: str) -> dict:
+        self.calls.append(refresh_token)
+        await asyncio.sleep(0.01)
+        if self.payload is not None:
+            return self.payload
+        return {
+            "access_token": f"access-{len(self.calls)}",
+            "refresh_token": refresh_token,
+            "expires_at": datetime.utcnow() + timedelta(hours=1),
+        }
+
+
+@pytest.fixture
+def spotify(monkeypatch):
+    fake = FakeSpotify()
+    monkeypatch.setattr(module.spotify_service, "refresh_token", fake.refresh_token)
+    return fake
+
+
+@pytest.fixture
+def tokens():
+    service = TokenService()
+    # In-process single-flight only; the Redis lock is covered where a server is available.
+    service._redis_down_until = float("inf")
+    return service
+
+
+def expiring(db, name: str = "a", minutes: int = 0) -> SpotifyAccount:
+    account = add_account(db, name)
+    account.expires_at = datetime.utcnow() + timedelta(minutes=minutes)
+    db.commit()
+    return account
+
+
+def test_concurrent_callers_share_one_refresh(db, spotify, tokens):
+    account = expiring(db)
+    copies = [account] + [SpotifyAccount(id=account.id, expires_at=account.expires_at) for _ in range(4)]
+
+    async def refresh_all():
+        await asyncio.gather(*(tokens.ensure_fresh(db, copy) for copy in copies))
+
+    asyncio.run(refresh_all())
+    assert spotify.calls == ["refresh"]
+    assert {copy.access_token for copy in copies} == {"access-1"}
+    assert tokens.stats["refreshed"] == 1 and tokens.stats["coalesced"] == 4
+    assert tokens._inflight == {}
+
+
+def test_refresh_leaves_the_callers_transaction_alone(db, spotify, tokens):
+    account = expiring(db)
+    db.add(Playlist(account_id=account.id, name="pending", prefix="a", size=5))
+    asyncio.run(tokens.ensure_fresh(db, account))
+    # The new token is committed by the service's own session and set on the caller's object as committed state.
+    assert account.access_token == "access-1"
+    assert not db.is_modified(account)
+    assert account not in db.dirty
+    db.rollback()
+    assert db.query(Playlist).count() == 0
+    assert db.get(SpotifyAccount, account.id).access_token == "access-1"
+
+
+def test_a_token_rotated_elsewhere_is_reused(db, spotify, tokens):
+    account = expiring(db)
+    stale_expiry = account.expires_at
+    db.execute(
+        update(SpotifyAccount)
+        .where(SpotifyAccount.id == account.id)
+        .values(access_token="rotated", expires_at=datetime.utcnow() + timedelta(hours=1))
+    )
+    db.commit()
+    stale = SpotifyAccount(id=account.id, expires_at=stale_expiry)
+    asyncio.run(tokens.ensure_fresh(db, stale))
+    assert spotify.calls == []
+    assert stale.access_token == "rotated"
+    assert tokens.stats["reused"] == 1
+
+
+def test_tokens_outside_the_lead_window_are_left_alone(db, spotify, tokens, monkeypatch):
+    monkeypatch.setattr(tokens.settings, "token_refresh_lead_seconds", 300)
+    account = expiring(db, minutes=30)
+    asyncio.run(tokens.ensure_fresh(db, account))
+    assert spotify.calls == []
+
+
+def test_a_failed_refresh_is_not_cached(db, spotify, tokens):
+    account = expiring(db)
+    spotify.payload = {"error": "invalid_grant"}
+    with pytest.raises(SpotifyRefreshError):
+        asyncio.run(tokens.ensure_fresh(db, account))
+    assert tokens.stats["failed"] == 1
+    spotify.payload = None
+    asyncio.run(tokens.ensure_fresh(db, account))
+    assert account.access_token == "access-2"
+
+
+def test_refresh_due_forces_accounts_expiring_before_the_next_pass(db, spotify, tokens, monkeypatch):
+    monkeypatch.setattr(tokens.settings, "token_refresh_lead_seconds", 300)
+    monkeypatch.setattr(tokens.settings, "token_refresh_interval_seconds", 600)
+    soon = expiring(db, "soon", minutes=12)
+    later = expiring(db, "later", minutes=60)
+    result = asyncio.run(tokens.refresh_due(db))
+    assert result == {"due": 1, "failed": 0}
+    db.expire_all()
+    assert db.get(SpotifyAccount, soon.id).access_token == "access-1"
+    assert db.get(SpotifyAccount, later.id).access_token == "access"
@@ -17,9 +17,21 @@ celery_app.conf.update(
             "task": "scale_playlists_daily",
             "schedule": 60 * 60 * 24,
         },
+        "maintain-history-daily": {
+            "task": "maintain_history",
+            "schedule": 60 * 60 * 24,
+        },
         "refresh-tokens": {
             "task": "refresh_tokens",
-            "schedule": 60 * 30,
+            "schedule": settings.token_refresh_interval_seconds,
+        },
+        "drain-playlist-outbox": {
+            "task": "drain_playlist_outbox",
+            "schedule": settings.playlist_outbox_interval_seconds,
+        },
+        "run-reshuffle-jobs": {
+            "task": "run_reshuffle_jobs",
+            "schedule": settings.reshuffle_job_interval_seconds,
         },
         "metrics-hourly": {
             "task": "metrics_snapshot",
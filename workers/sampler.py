@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from app.core.config import get_settings
 from app.db.session import SessionLocal
 from app.models.tables import Playlist, PlaylistEntriesHistory, Track
+from app.utils.random_utils import derive_seed
 
 settings = get_settings()
 
@@ -32,7 +33,7 @@ def _usable_tracks(session: Session, exclude_ids: set[UUID]) -> list[Track]:
     stmt = select(Track).where(Track.is_usable.is_(True))
     if exclude_ids:
         stmt = stmt.where(Track.id.notin_(list(exclude_ids)))
-    return list(session.scalars(stmt))
+    return list(session.scalars(stmt.order_by(Track.id)))
 
 
 def select_tracks_for_playlist(
@@ -53,13 +54,14 @@ def select_tracks_for_playlist(
         recent_ids = _recent_track_ids(db, playlist_id, cooldown_days)
         candidates = _usable_tracks(db, recent_ids)
 
+        # Candidates come back ordered by id, so a seeded draw is reproducible.
         rng = random.Random()
         if seed:
-            rng.seed(seed)
+            rng.seed(derive_seed(seed, playlist_id))
 
         if len(candidates) < target_size:
             # Relax cooldown if needed
-            relaxed_stmt = select(Track).where(Track.is_usable.is_(True))
+            relaxed_stmt = select(Track).where(Track.is_usable.is_(True)).order_by(Track.id)
             candidates = list(db.scalars(relaxed_stmt))
             if len(candidates) < target_size:
                 raise InsufficientTracksError("Not enough usable tracks to satisfy playlist size")
@@ -1,17 +1,64 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
-from typing import Any
+from typing import Any, Coroutine, Optional, TypeVar
 
+from celery.signals import worker_process_init, worker_process_shutdown
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.db import models as db_models
 from app.db.session import SessionLocal
+from app.services.history_retention import history_retention
 from app.services.metrics_service import metrics_service
+from app.services.playlist_service import playlist_service
+from app.services.rate_limiter import rate_limiter
+from app.services.reshuffle_job_service import reshuffle_job_service
 from app.services.sampler_service import sampler_service
+from app.services.spotify_service import spotify_service
+from app.services.token_service import token_service
 from workers import celery_app
 
+T = TypeVar("T")
+
+
+# One event loop per worker process, so the Spotify client and Redis
+# connections opened by one task are reused by the next.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    return _event_loop().run_until_complete(coro)
+
+
+async def _close_clients() -> None:
+    await spotify_service.aclose()
+    await rate_limiter.aclose()
+    await token_service.aclose()
+
+
+@worker_process_init.connect
+def open_event_loop(**_: Any) -> None:
+    _event_loop()
+
+
+@worker_process_shutdown.connect
+def close_event_loop(**_: Any) -> None:
+    if _loop is None or _loop.is_closed():
+        return
+    _loop.run_until_complete(_close_clients())
+    _loop.run_until_complete(_loop.shutdown_asyncgens())
+    _loop.close()
+
 
 @celery_app.task(name="ingest_albums_from_sources")
 def ingest_albums_from_sources() -> str:
@@ -46,8 +93,39 @@ def build_playlist_snapshot(playlist_id: str | None = None) -> dict[str, Any]:
 
 
 @celery_app.task(name="refresh_tokens")
-def refresh_tokens() -> str:
-    return "refresh_tokens queued"
+def refresh_tokens() -> dict[str, Any]:
+    session: Session = SessionLocal()
+    try:
+        return run_async(token_service.refresh_due(session))
+    finally:
+        session.close()
+
+
+@celery_app.task(name="drain_playlist_outbox")
+def drain_playlist_outbox() -> dict[str, Any]:
+    session: Session = SessionLocal()
+    try:
+        return run_async(playlist_service.drain_outbox(session))
+    finally:
+        session.close()
+
+
+@celery_app.task(name="run_reshuffle_jobs")
+def run_reshuffle_jobs() -> dict[str, Any]:
+    session: Session = SessionLocal()
+    try:
+        return run_async(reshuffle_job_service.run_next(session))
+    finally:
+        session.close()
+
+
+@celery_app.task(name="maintain_history")
+def maintain_history() -> dict[str, Any]:
+    session: Session = SessionLocal()
+    try:
+        return history_retention.maintain(session)
+    finally:
+        session.close()
 
 
 @celery_app.task(name="scale_playlists_daily")
@@ -59,7 +137,13 @@ def scale_playlists_daily() -> dict[str, Any]:
 def metrics_snapshot() -> dict[str, Any]:
     session: Session = SessionLocal()
     try:
-        overview = metrics_service.get_overview(session)
-        return overview.dict()
+        snapshot = metrics_service.record_snapshot(session)
+        return {
+            "created_at": snapshot.created_at.isoformat(),
+            "accounts": snapshot.accounts_count,
+            "playlists": snapshot.playlists_count,
+            "tracks": snapshot.tracks_count,
+            "reshuffles_last_24h": snapshot.reshuffles_last_24h,
+        }
     finally:
         session.close()